@@ -9,7 +9,7 @@ from dash.exceptions import PreventUpdate
 import os
 import logging
 
-from flask import make_response, jsonify, request
+from flask import make_response, jsonify, request, Response
 from flask_caching import Cache
 
 from crystal_toolkit import __version__ as ct_version
@@ -501,9 +501,16 @@ def mson_to_token(mson, cache):
     if not allowed_mson:
         return {"token": None, "error": "Format not recognized."}
 
-    token = str(uuid4())[0:6]
-    # set to 1 week expiration by default
+    # the same structure uploaded twice gives the same token and is only
+    # stored once, the content hash is only kept server-side so that a token
+    # cannot be derived from a structure
+    hash_key = f"crystal_toolkit_user_hash_{MPComponent.data_hash(mson)}"
+    token = cache.get(hash_key)
+    if token is None or cache.get(f"crystal_toolkit_user_{token}") is None:
+        token = str(uuid4())[0:6]
+    # set to 1 week expiration by default, uploading again restarts it
     cache.set(f"crystal_toolkit_user_{token}", mson, timeout=604_800)
+    cache.set(hash_key, token, timeout=604_800)
     return {"token": token, "error": None}
 
 
@@ -521,6 +528,49 @@ if ENABLE_API:
         else:
             return make_response(jsonify(token), 403)
 
+    @server.route("/scene/<token>", methods=["GET"])
+    def get_scene(token):
+        # the scene is streamed as it is generated, so large structures
+        # start downloading before the whole scene has been built
+        mson = token_to_mson(token, cache)
+        if mson is None:
+            return make_response(jsonify({"error": "Token not found."}), 404)
+        component = ctc.StructureMoleculeComponent
+        graph = MPComponent.from_data(mson)
+        if isinstance(graph, (Structure, Molecule)):
+            # bonds are looked up in the same cache as the component uses,
+            # large structures that have not been bonded yet are bonded with
+            # the fast fallback strategy rather than holding up the response
+            strategies = ["CrystalNN"]
+            if len(graph) > component.progressive_bonding_threshold:
+                strategies.append(component.fallback_bonding_strategy)
+            for bonding_strategy in strategies:
+                cache_key = component._get_graph_cache_key(
+                    graph, bonding_strategy=bonding_strategy
+                )
+                graph_data = cache.get(cache_key)
+                if graph_data is not None:
+                    graph = MPComponent.from_data(graph_data)
+                    break
+            else:
+                graph = component._preprocess_input_to_graph(
+                    graph, bonding_strategy=bonding_strategy
+                )
+                cache.set(
+                    cache_key,
+                    MPComponent.to_data(graph),
+                    timeout=component.graph_cache_timeout,
+                )
+        scene, _ = component.get_scene_and_legend(
+            graph, lazy=isinstance(graph, StructureGraph)
+        )
+        chunks = scene.iter_json_chunks(
+            encoding="binary" if request.args.get("encoding") == "binary" else "json",
+            bounding_boxes=True,
+            precision=component.default_scene_settings["precision"],
+        )
+        return Response(chunks, mimetype="application/json")
+
 
 # endregion
 
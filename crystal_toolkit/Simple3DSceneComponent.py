@@ -17,14 +17,16 @@ Keyword arguments:
 - settings (dict; optional): Options used for generating scene
 - toggleVisibility (dict; optional): Hide/show nodes in scene by name (key), value is 1 to show the node
 and 0 to hide it
-- downloadRequest (dict; optional): Increment to trigger a screenshot or scene download."""
+- downloadRequest (dict; optional): Increment to trigger a screenshot or scene download.
+- fullSceneRequest (number; optional): Incremented when the full scene is needed, because an update of the
+scene could not be applied as a patch"""
     @_explicitize_args
-    def __init__(self, id=Component.UNDEFINED, data=Component.UNDEFINED, settings=Component.UNDEFINED, toggleVisibility=Component.UNDEFINED, downloadRequest=Component.UNDEFINED, **kwargs):
-        self._prop_names = ['id', 'data', 'settings', 'toggleVisibility', 'downloadRequest']
+    def __init__(self, id=Component.UNDEFINED, data=Component.UNDEFINED, settings=Component.UNDEFINED, toggleVisibility=Component.UNDEFINED, downloadRequest=Component.UNDEFINED, fullSceneRequest=Component.UNDEFINED, **kwargs):
+        self._prop_names = ['id', 'data', 'settings', 'toggleVisibility', 'downloadRequest', 'fullSceneRequest']
         self._type = 'Simple3DSceneComponent'
         self._namespace = 'crystal_toolkit'
         self._valid_wildcard_attributes =            []
-        self.available_properties = ['id', 'data', 'settings', 'toggleVisibility', 'downloadRequest']
+        self.available_properties = ['id', 'data', 'settings', 'toggleVisibility', 'downloadRequest', 'fullSceneRequest']
         self.available_wildcard_properties =            []
 
         _explicit_args = kwargs.pop('_explicit_args')
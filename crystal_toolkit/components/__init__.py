@@ -9,6 +9,8 @@ from crystal_toolkit.core.scene import *
 
 from crystal_toolkit.renderables.site import Site
 from crystal_toolkit.renderables.structuregraph import StructureGraph
+from crystal_toolkit.renderables.moleculegraph import MoleculeGraph
+from crystal_toolkit.renderables.sitecollection import SiteCollection
 from crystal_toolkit.renderables.lattice import Lattice
 
 from crystal_toolkit.components.json import JSONEditor
@@ -16,6 +16,8 @@ from pymatgen.analysis.graphs import StructureGraph, MoleculeGraph
 
 from typing import Union
 
+import numpy as np
+
 
 class BondingGraphComponent(PanelComponent):
     def __init__(self, *args, **kwargs):
@@ -50,21 +52,38 @@ class BondingGraphComponent(PanelComponent):
         edges = []
 
         struct_or_mol = StructureMoleculeComponent._get_struct_or_mol(graph)
-        site_prop_types = StructureMoleculeComponent._analyze_site_props(struct_or_mol)
-        colors, _ = StructureMoleculeComponent._get_display_colors_and_legend_for_sites(
-            struct_or_mol,
-            site_prop_types,
-            color_scheme=color_scheme,
-            color_scale=color_scale,
+        colors, _ = StructureMoleculeComponent._get_display_colors_and_legend(
+            graph, color_scheme=color_scheme, color_scale=color_scale
         )
 
+        if isinstance(graph, StructureGraph):
+            # coordination numbers and bond lengths from the cached adjacency
+            # arrays of the graph, see StructureGraph.get_adjacency()
+            adjacency = graph.get_adjacency()
+            coordination = np.diff(adjacency.offsets)
+            sources = np.repeat(np.arange(len(coordination)), coordination)
+            distances = dict(
+                zip(
+                    zip(
+                        sources.tolist(),
+                        adjacency.neighbors.tolist(),
+                        map(tuple, adjacency.images.tolist()),
+                    ),
+                    adjacency.distances.tolist(),
+                )
+            )
+        else:
+            coordination = [
+                graph.get_coordination_of_site(idx) for idx in range(len(graph.graph))
+            ]
+
         for idx, node in enumerate(graph.graph.nodes()):
 
             nodes.append(
                 {
                     "id": node,
                     "title": f"{struct_or_mol[node].species_string} site "
-                    f"({graph.get_coordination_of_site(idx)} neighbors)",
+                    f"({coordination[idx]} neighbors)",
                     "color": colors[node][0],
                 }
             )
@@ -73,11 +92,11 @@ class BondingGraphComponent(PanelComponent):
 
             edge = {"from": u, "to": v, "arrows": ""}
 
-            to_jimage = d.get("to_jimage", (0, 0, 0))
+            to_jimage = tuple(d.get("to_jimage", (0, 0, 0)))
 
             # TODO: check these edge weights
             if isinstance(struct_or_mol, Structure):
-                dist = struct_or_mol.get_distance(u, v, jimage=to_jimage)
+                dist = distances[(u, v, to_jimage)]
             else:
                 dist = struct_or_mol.get_distance(u, v)
             edge["length"] = 50 * dist
@@ -108,6 +127,9 @@ class BondingGraphComponent(PanelComponent):
             raise PreventUpdate
 
         graph = self.from_data(new_store_contents)
+        if not isinstance(graph, (StructureGraph, MoleculeGraph)):
+            # no bonds to show in preview mode
+            raise PreventUpdate
         display_options = self.from_data(display_options)
 
         color_scheme = display_options.get("color_scheme")
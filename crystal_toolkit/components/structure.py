@@ -10,7 +10,9 @@ import warnings
 
 from crystal_toolkit import Simple3DSceneComponent
 from crystal_toolkit.components.core import unicodeify_species
-from crystal_toolkit.core.mpcomponent import MPComponent
+from crystal_toolkit.core.local_env import KDTreeNN
+from crystal_toolkit.core.mpcomponent import MPComponent, null_cache
+from crystal_toolkit.renderables.moleculegraph import get_covalent_bond_graph
 from crystal_toolkit.helpers.layouts import *
 
 from matplotlib.cm import get_cmap
@@ -25,16 +27,22 @@ from pymatgen.analysis.molecule_structure_comparator import CovalentRadius
 from pymatgen.vis.structure_vtk import EL_COLORS
 from pymatgen.core.structure import Structure, Molecule
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from monty.json import MontyEncoder
 
 from sklearn.preprocessing import LabelEncoder
 from palettable.colorbrewer.qualitative import Set1_9, Set2_8
 
 from typing import Dict, Union, Optional, List, Tuple
 
-from collections import defaultdict, OrderedDict
+from collections import defaultdict, Counter, OrderedDict
+from hashlib import blake2b
+from json import dumps
+from multiprocessing import Pipe, Process
+from threading import BoundedSemaphore, Thread
 
 from itertools import combinations, combinations_with_replacement, chain
 import re
+from uuid import uuid4
 
 from crystal_toolkit.core.scene import (
     Scene,
@@ -45,6 +53,9 @@ from crystal_toolkit.core.scene import (
     Convex,
     Cubes,
     Arrows,
+    InstancedSpheres,
+    InstancedCylinders,
+    diff_scene_json,
 )
 
 import numpy as np
@@ -59,6 +70,31 @@ EL_COLORS["Jmol"]["rcp"] = [255, 0, 0]
 EL_COLORS["Jmol"]["ccp"] = [255, 255, 0]
 
 
+def _get_graph_data(struct_or_mol_data, bonding_strategy, bonding_strategy_kwargs):
+    """
+    The bonding graph of a Structure or Molecule as Store contents.
+    """
+    graph = StructureMoleculeComponent._preprocess_input_to_graph(
+        MPComponent.from_data(struct_or_mol_data),
+        bonding_strategy=bonding_strategy,
+        bonding_strategy_kwargs=bonding_strategy_kwargs,
+    )
+    return MPComponent.to_data(graph)
+
+
+def _send_graph_data(
+    connection, struct_or_mol_data, bonding_strategy, bonding_strategy_kwargs
+):
+    """
+    Send the bonding graph of a Structure or Molecule over a connection, run
+    in a background process by StructureMoleculeComponent._run_bonding_job().
+    """
+    connection.send(
+        _get_graph_data(struct_or_mol_data, bonding_strategy, bonding_strategy_kwargs)
+    )
+    connection.close()
+
+
 class StructureMoleculeComponent(MPComponent):
 
     available_bonding_strategies = {
@@ -74,6 +110,51 @@ class StructureMoleculeComponent(MPComponent):
         "uniform",
     )
 
+    available_scene_encodings = ("json", "binary")
+
+    # bonding strategy to draw structures and molecules without calculating
+    # bonds, e.g. to preview large structures, see SiteCollection.get_scene()
+    preview_bonding_strategy = "preview"
+
+    # how long the last scene sent to a session is cached for, in seconds,
+    # with scene_patches the scene itself is cached too (to compute the
+    # next patch from), unless it is larger than scene_patch_max_bytes
+    scene_cache_timeout = 3600
+    scene_patch_max_bytes = 8 * 1024 ** 2
+
+    # bonds of structures with more sites than progressive_bonding_threshold
+    # are calculated in a background process while the atoms are already
+    # shown, at most bonding_processes at a time per server process, if this
+    # takes longer than bonding_time_budget seconds the process is killed and
+    # the fallback_bonding_strategy is used, see _submit_bonding_job(), the
+    # status of finished jobs is kept for bonding_status_timeout seconds
+    # during which they are not re-submitted, this needs a cache to be
+    # registered, see MPComponent.register_cache(), otherwise bonds are
+    # always calculated straight away
+    progressive_bonding_threshold = 1_000
+    bonding_processes = 2
+    bonding_time_budget = 60
+    bonding_poll_interval = 1_000
+    bonding_status_timeout = 3_600
+    fallback_bonding_strategy = "KDTreeNN"
+    _bonding_slots = None
+
+    # bonds of ordered structures with more sites than kdtree_bonding_threshold
+    # are found with KDTreeNN if CrystalNN (which takes minutes for large
+    # supercells, slabs etc.) or CutOffDictNN (which gives the same bonds) is
+    # chosen, other bonding strategies are always used as chosen
+    kdtree_bonding_threshold = 2_000
+
+    # how long bonding graphs are cached for, in seconds, see
+    # _get_graph_cache_key(), and the number of cache hits and misses of
+    # this process
+    graph_cache_timeout = 604_800
+    graph_cache_stats = Counter()
+
+    # levels of detail as (sphere segments, cylinder segments) in order of
+    # decreasing quality, the first level is the viewer's default
+    lod_segments = ((32, 8), (24, 8), (16, 6), (12, 6), (8, 4), (6, 3))
+
     # TODO ...
     available_polyhedra_rules = ("prefer_large_polyhedra", "only_same_species")
 
@@ -102,6 +183,9 @@ class StructureMoleculeComponent(MPComponent):
         "cylinderScale": 0.1,
         "defaultSurfaceOpacity": 0.5,
         "staticScene": True,
+        # precision of scene geometry sent to the browser, either a number of
+        # decimal places or "int16" to quantize, see Scene.to_json
+        "precision": 4,
     }
 
     def __init__(
@@ -116,13 +200,41 @@ class StructureMoleculeComponent(MPComponent):
         color_scale=None,
         radius_strategy="uniform",
         radius_scale=1.0,
+        ellipsoid_site_prop=None,
         draw_image_atoms=True,
         bonded_sites_outside_unit_cell=False,
         hide_incomplete_bonds=False,
+        explicitly_calculate_polyhedra_hull=True,
+        polyhedra_centers=None,
+        display_range=None,
         show_compass=False,
+        scene_encoding="json",
+        scene_patches=False,
+        triangle_budget=None,
+        impostor_threshold=None,
+        instanced_primitives=False,
         **kwargs,
     ):
 
+        # the scene formats below are off by default since they are not
+        # understood by the crystal_toolkit.min.js bundle that is shipped,
+        # only enable them with a Simple3DSceneComponent bundle rebuilt from
+        # the current Simple3DScene.js
+
+        # "binary" sends scene geometry as base64-encoded typed arrays,
+        # see Scene.to_binary(), which is much smaller and faster to parse
+        # for large structures than the default nested lists of "json"
+        if scene_encoding not in self.available_scene_encodings:
+            raise ValueError(
+                f"Unknown scene encoding {scene_encoding}, choose from: "
+                f"{', '.join(self.available_scene_encodings)}"
+            )
+        self.scene_encoding = scene_encoding
+        # send only the parts of the scene that changed on updates, see
+        # diff_scene_json(), this needs a build of Simple3DSceneComponent
+        # that can apply patches
+        self.scene_patches = scene_patches
+
         super().__init__(
             id=id, contents=struct_or_mol, origin_component=origin_component, **kwargs
         )
@@ -146,10 +258,24 @@ class StructureMoleculeComponent(MPComponent):
             "color_scale": color_scale,
             "radius_strategy": radius_strategy,
             "radius_scale": radius_scale,
+            # name of a site property of 3x3 matrices to draw atoms as
+            # ellipsoids, e.g. anisotropic displacement parameters
+            "ellipsoid_site_prop": ellipsoid_site_prop,
             "draw_image_atoms": draw_image_atoms,
             "bonded_sites_outside_unit_cell": bonded_sites_outside_unit_cell,
             "hide_incomplete_bonds": hide_incomplete_bonds,
+            # polyhedra are triangulated here rather than in the browser
+            "explicitly_calculate_polyhedra_hull": explicitly_calculate_polyhedra_hull,
+            "polyhedra_centers": polyhedra_centers,
+            "display_range": display_range,
             "show_compass": show_compass,
+            # level-of-detail hints and sphere impostors for large scenes,
+            # see _get_lod_hints(), None to always draw at full quality
+            "triangle_budget": triangle_budget,
+            "impostor_threshold": impostor_threshold,
+            # draw atoms and bonds as InstancedSpheres and InstancedCylinders,
+            # this needs a build of Simple3DSceneComponent that supports them
+            "instanced_primitives": instanced_primitives,
         }
         self.create_store("display_options", initial_data=self.initial_display_options)
 
@@ -194,66 +320,104 @@ class StructureMoleculeComponent(MPComponent):
         self.initial_legend = legend
         self.create_store("legend_data", initial_data=self.initial_legend)
 
-        self.initial_scene_data = scene.to_json()
+        self.initial_scene_data = self._encode_scene(scene)
+        self.create_store("scene_token")
 
         self.initial_graph = graph
         self.create_store("graph", initial_data=self.to_data(graph))
+        self.create_store("bonding_job")
 
     def generate_callbacks(self, app, cache):
         @app.callback(
-            Output(self.id("graph"), "data"),
+            [
+                Output(self.id("graph"), "data"),
+                Output(self.id("bonding_job"), "data"),
+                Output(self.id("bonding_poll"), "disabled"),
+                Output(self.id("bonding_status"), "children"),
+            ],
             [
                 Input(self.id("graph_generation_options"), "data"),
                 Input(self.id("unit-cell-choice"), "value"),
-                Input(self.id("repeats"), "value"),
                 Input(self.id(), "data"),
+                Input(self.id("bonding_poll"), "n_intervals"),
             ],
+            [State(self.id("bonding_job"), "data")],
         )
         def update_graph(
-            graph_generation_options, unit_cell_choice, repeats, struct_or_mol
+            graph_generation_options,
+            unit_cell_choice,
+            struct_or_mol,
+            n_intervals,
+            bonding_job,
         ):
 
-            if not struct_or_mol:
-                raise PreventUpdate
-
-            struct_or_mol = self.from_data(struct_or_mol)
-            graph_generation_options = self.from_data(graph_generation_options)
-            repeats = int(repeats)
-
-            if isinstance(struct_or_mol, Structure):
-                if unit_cell_choice != "input":
-                    if unit_cell_choice == "primitive":
-                        struct_or_mol = struct_or_mol.get_primitive_structure()
-                    elif unit_cell_choice == "conventional":
-                        sga = SpacegroupAnalyzer(struct_or_mol)
-                        struct_or_mol = sga.get_conventional_standard_structure()
-                    elif unit_cell_choice == "reduced":
-                        struct_or_mol = struct_or_mol.get_reduced_structure()
-                if repeats != 1:
-                    struct_or_mol = struct_or_mol * (repeats, repeats, repeats)
+            triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+            polling = triggered == [self.id("bonding_poll") + ".n_intervals"]
 
-            graph = self._preprocess_input_to_graph(
+            return self._update_graph(
+                graph_generation_options,
+                unit_cell_choice,
                 struct_or_mol,
-                bonding_strategy=graph_generation_options["bonding_strategy"],
-                bonding_strategy_kwargs=graph_generation_options[
-                    "bonding_strategy_kwargs"
-                ],
+                bonding_job,
+                cache,
+                polling=polling,
             )
 
-            return self.to_data(graph)
-
         @app.callback(
-            Output(self.id("scene"), "data"),
+            [Output(self.id("scene"), "data"), Output(self.id("scene_token"), "data")],
             [
                 Input(self.id("graph"), "data"),
                 Input(self.id("display_options"), "data"),
+                Input(self.id("scene"), "fullSceneRequest"),
             ],
+            [State(self.id("scene_token"), "data")],
         )
-        def update_scene(graph, display_options):
+        def update_scene(graph, display_options, full_scene_request, scene_token):
             display_options = self.from_data(display_options)
-            graph = self.from_data(graph)
+            graph = self.from_data_cached(graph)
             scene, legend = self.get_scene_and_legend(graph, **display_options)
-            return scene.to_json()
+            scene_hash = scene.content_hash
+
+            # the viewer asks for the full scene if it could not apply a
+            # patch, e.g. if the response with the scene the patch was
+            # computed from was dropped
+            triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+            full_scene = triggered == [self.id("scene") + ".fullSceneRequest"]
+
+            # the hash (and with scene_patches, the data) of the last scene
+            # sent to this session are cached so that nothing needs to be
+            # sent if the scene is unchanged, and only a patch if the scene
+            # is updated (e.g. on changing display options), the token
+            # identifies the session
+            last_scene_hash, last_scene_data = None, None
+            if scene_token:
+                last_scene_hash, last_scene_data = cache.get(
+                    self._scene_cache_key(scene_token)
+                ) or (None, None)
+            else:
+                scene_token = str(uuid4())
+
+            if scene_hash == last_scene_hash and not full_scene:
+                raise PreventUpdate
+
+            scene_data = self._encode_scene(scene)
+            patch = None
+            if self.scene_patches and last_scene_data and not full_scene:
+                patch = diff_scene_json(last_scene_data, scene_data)
+
+            cached_scene_data = None
+            if (
+                self.scene_patches
+                and len(dumps(scene_data)) <= self.scene_patch_max_bytes
+            ):
+                cached_scene_data = scene_data
+            cache.set(
+                self._scene_cache_key(scene_token),
+                (scene_hash, cached_scene_data),
+                timeout=self.scene_cache_timeout,
+            )
+
+            return patch or scene_data, scene_token
 
         @app.callback(
             Output(self.id("legend_data"), "data"),
@@ -265,12 +429,9 @@ class StructureMoleculeComponent(MPComponent):
         def update_legend(graph, display_options):
             # TODO: more cleanly split legend from scene generation
             display_options = self.from_data(display_options)
-            graph = self.from_data(graph)
-            struct_or_mol = self._get_struct_or_mol(graph)
-            site_prop_types = self._analyze_site_props(struct_or_mol)
-            colors, legend = self._get_display_colors_and_legend_for_sites(
-                struct_or_mol,
-                site_prop_types,
+            graph = self.from_data_cached(graph)
+            colors, legend = self._get_display_colors_and_legend(
+                graph,
                 color_scheme=display_options.get("color_scheme", None),
                 color_scale=display_options.get("color_scale", None),
             )
@@ -287,9 +448,8 @@ class StructureMoleculeComponent(MPComponent):
                 {"label": "VESTA", "value": "VESTA"},
                 {"label": "Colorblind-friendly", "value": "colorblind_friendly"},
             ]
-            graph = self.from_data(graph)
-            struct_or_mol = self._get_struct_or_mol(graph)
-            site_props = self._analyze_site_props(struct_or_mol)
+            graph = self.from_data_cached(graph)
+            site_props = self._get_site_prop_types(graph)
             for site_prop_type in ("scalar", "categorical"):
                 if site_prop_type in site_props:
                     for prop in site_props[site_prop_type]:
@@ -297,21 +457,70 @@ class StructureMoleculeComponent(MPComponent):
 
             return options
 
+        @app.callback(
+            Output(self.id("polyhedra_centers"), "options"),
+            [Input(self.id("graph"), "data")],
+        )
+        def update_polyhedra_centers_options(graph):
+            graph = self.from_data_cached(graph)
+            struct_or_mol = self._get_struct_or_mol(graph)
+            if not isinstance(struct_or_mol, Structure):
+                return []
+            species = sorted({site.species_string for site in struct_or_mol})
+            return [{"label": sp, "value": sp} for sp in species]
+
+        @app.callback(
+            Output(self.id("ellipsoid_site_prop"), "options"),
+            [Input(self.id("graph"), "data")],
+        )
+        def update_ellipsoid_site_prop_options(graph):
+            graph = self.from_data_cached(graph)
+            if graph is None:
+                return []
+            struct_or_mol = self._get_struct_or_mol(graph)
+            return [
+                {"label": prop, "value": prop}
+                for prop in self._get_ellipsoid_site_props(struct_or_mol)
+            ]
+
         @app.callback(
             Output(self.id("display_options"), "data"),
             [
                 Input(self.id("color-scheme"), "value"),
                 Input(self.id("radius_strategy"), "value"),
                 Input(self.id("draw_options"), "value"),
+                Input(self.id("polyhedra_centers"), "value"),
+                Input(self.id("repeats"), "value"),
+                Input(self.id("ellipsoid_site_prop"), "value"),
             ],
             [State(self.id("display_options"), "data")],
         )
         def update_display_options(
-            color_scheme, radius_strategy, draw_options, display_options
+            color_scheme,
+            radius_strategy,
+            draw_options,
+            polyhedra_centers,
+            repeats,
+            ellipsoid_site_prop,
+            display_options,
         ):
             display_options = self.from_data(display_options)
+            # repeats are drawn as periodic images of the sites of the unit
+            # cell, so bonding does not need to be re-calculated
+            display_options.update(
+                {
+                    "display_range": self._get_repeats_display_range(
+                        int(repeats),
+                        "draw_image_atoms" in draw_options,
+                        default=self.initial_display_options["display_range"],
+                    )
+                }
+            )
+            # no species chosen means they are chosen automatically
+            display_options.update({"polyhedra_centers": polyhedra_centers or None})
             display_options.update({"color_scheme": color_scheme})
             display_options.update({"radius_strategy": radius_strategy})
+            display_options.update({"ellipsoid_site_prop": ellipsoid_site_prop or None})
             display_options.update(
                 {"draw_image_atoms": "draw_image_atoms" in draw_options}
             )
@@ -389,7 +598,7 @@ class StructureMoleculeComponent(MPComponent):
                 "bonding_strategy": bonding_algorithm,
                 "bonding_strategy_kwargs": None,
             }
-            if bonding_algorithm == "CutOffDictNN":
+            if bonding_algorithm in ("CutOffDictNN", "KDTreeNN"):
                 # this is not the format CutOffDictNN expects (since that is not JSON
                 # serializable), so we store as a list of tuples instead
                 # TODO: make CutOffDictNN args JSON serializable
@@ -415,12 +624,12 @@ class StructureMoleculeComponent(MPComponent):
             if not graph:
                 raise PreventUpdate
 
-            if bonding_algorithm == "CutOffDictNN":
+            if bonding_algorithm in ("CutOffDictNN", "KDTreeNN"):
                 style = {}
             else:
                 style = {"display": "none"}
 
-            graph = self.from_data(graph)
+            graph = self.from_data_cached(graph)
             struct_or_mol = self._get_struct_or_mol(graph)
             # can't use type_of_specie because it doesn't work with disordered structures
             species = set(
@@ -437,6 +646,420 @@ class StructureMoleculeComponent(MPComponent):
             ]
             return rows, style
 
+    def _update_graph(
+        self,
+        graph_generation_options,
+        unit_cell_choice,
+        struct_or_mol,
+        bonding_job,
+        cache,
+        polling=False,
+    ):
+        """
+        Body of the update_graph callback: the bonding graph of the
+        Structure or Molecule from the graph cache, or calculated now or in
+        a background process.
+
+        :param polling: True if called to check on a background bonding job
+        :return: graph data, bonding job data, whether to disable polling
+        for the bonding job and the bonding status
+        """
+
+        if not struct_or_mol:
+            raise PreventUpdate
+
+        struct_or_mol = self.from_data(struct_or_mol)
+        graph_generation_options = self.from_data(graph_generation_options)
+        bonding_strategy = graph_generation_options["bonding_strategy"]
+        bonding_strategy_kwargs = graph_generation_options["bonding_strategy_kwargs"]
+
+        if polling:
+            # check on bonds being calculated in the background, by this or
+            # any other process sharing the cache
+            if not bonding_job:
+                raise PreventUpdate
+            graph_data, status = self._get_bonding_job_result(
+                self.from_data(bonding_job), cache
+            )
+            if graph_data is None and status is None:
+                raise PreventUpdate
+            if graph_data is None:
+                # no bonds could be calculated, keep drawing the atoms
+                if isinstance(struct_or_mol, Structure):
+                    struct_or_mol = self._get_unit_cell(struct_or_mol, unit_cell_choice)
+                graph_data = self.to_data(struct_or_mol)
+            return graph_data, None, True, status
+
+        # graphs are cached by the contents of the structure, so that the
+        # same structure with the same options is only bonded once, also
+        # across sessions and workers
+        cache_key = None
+        if isinstance(struct_or_mol, (Structure, Molecule)) and (
+            bonding_strategy != self.preview_bonding_strategy
+        ):
+            cache_key = self._get_graph_cache_key(
+                struct_or_mol,
+                unit_cell_choice=unit_cell_choice,
+                bonding_strategy=bonding_strategy,
+                bonding_strategy_kwargs=bonding_strategy_kwargs,
+            )
+            graph_data = cache.get(cache_key)
+            if graph_data is not None:
+                self.graph_cache_stats["hits"] += 1
+                return graph_data, None, True, ""
+            self.graph_cache_stats["misses"] += 1
+
+        unit_cell = struct_or_mol
+        if isinstance(struct_or_mol, Structure):
+            unit_cell = self._get_unit_cell(struct_or_mol, unit_cell_choice)
+
+        status = ""
+        if (
+            cache_key
+            and bonding_strategy == "CrystalNN"
+            and self._is_bonded_with_kdtree(unit_cell, bonding_strategy)
+        ):
+            # the bonds are found with KDTreeNN instead, and cached as such
+            status = (
+                f"Bonds calculated with KDTreeNN, {bonding_strategy} is too "
+                f"slow for structures of this size."
+            )
+            bonding_strategy = "KDTreeNN"
+            bonding_strategy_kwargs = None
+            cache_key = self._get_graph_cache_key(
+                struct_or_mol,
+                unit_cell_choice=unit_cell_choice,
+                bonding_strategy=bonding_strategy,
+            )
+            graph_data = cache.get(cache_key)
+            if graph_data is not None:
+                return graph_data, None, True, status
+
+        if (
+            cache_key
+            and MPComponent.cache is not null_cache
+            and len(unit_cell) > self.progressive_bonding_threshold
+        ):
+            # draw the atoms straight away, and the bonds once they have
+            # been calculated in a background process, which can only be
+            # read back if there is a cache
+            bonding_job = {
+                "key": cache_key,
+                "fallback_key": self._get_graph_cache_key(
+                    struct_or_mol,
+                    unit_cell_choice=unit_cell_choice,
+                    bonding_strategy=self.fallback_bonding_strategy,
+                ),
+                "fallback_bonding_strategy": self.fallback_bonding_strategy,
+                "status": status,
+            }
+            if self._submit_bonding_job(
+                bonding_job,
+                unit_cell,
+                bonding_strategy,
+                bonding_strategy_kwargs,
+                cache,
+            ):
+                return (
+                    self.to_data(unit_cell),
+                    self.to_data(bonding_job),
+                    False,
+                    "Calculating bonds…",
+                )
+            # this process is busy with other bonding jobs, so the bonds are
+            # calculated now with the (fast) fallback strategy instead
+            cache_key = bonding_job["fallback_key"]
+            bonding_strategy = self.fallback_bonding_strategy
+            bonding_strategy_kwargs = None
+            graph_data = cache.get(cache_key)
+            if graph_data is not None:
+                return graph_data, None, True, status
+        struct_or_mol = unit_cell
+
+        graph = self._preprocess_input_to_graph(
+            struct_or_mol,
+            bonding_strategy=bonding_strategy,
+            bonding_strategy_kwargs=bonding_strategy_kwargs,
+        )
+        graph_data = self.to_data(graph)
+
+        if cache_key:
+            cache.set(cache_key, graph_data, timeout=self.graph_cache_timeout)
+
+        return graph_data, None, True, status
+
+    @staticmethod
+    def _is_bonded_with_kdtree(
+        struct_or_mol, bonding_strategy, kdtree_bonding_threshold=None
+    ):
+        """
+        Whether the bonds of a Structure are found with KDTreeNN instead of
+        the chosen bonding strategy, see kdtree_bonding_threshold.
+        """
+        if kdtree_bonding_threshold is None:
+            kdtree_bonding_threshold = (
+                StructureMoleculeComponent.kdtree_bonding_threshold
+            )
+        return (
+            isinstance(struct_or_mol, Structure)
+            and bonding_strategy in ("CrystalNN", "CutOffDictNN")
+            and len(struct_or_mol) > kdtree_bonding_threshold
+            and struct_or_mol.is_ordered
+        )
+
+    @staticmethod
+    def _get_unit_cell(structure, unit_cell_choice="input"):
+        """
+        :param structure: Structure
+        :param unit_cell_choice: "input", "primitive", "conventional" or
+        "reduced"
+        :return: Structure
+        """
+        if unit_cell_choice == "primitive":
+            return structure.get_primitive_structure()
+        elif unit_cell_choice == "conventional":
+            sga = SpacegroupAnalyzer(structure)
+            return sga.get_conventional_standard_structure()
+        elif unit_cell_choice == "reduced":
+            return structure.get_reduced_structure()
+        return structure
+
+    @staticmethod
+    def _submit_bonding_job(
+        bonding_job, struct_or_mol, bonding_strategy, bonding_strategy_kwargs, cache
+    ):
+        """
+        Calculate the bonding graph of a Structure or Molecule in a background
+        process. Everything about the job is kept in the cache, so that any
+        server process sharing the cache (e.g. any gunicorn worker) can check
+        on it with _get_bonding_job_result():
+
+        * the graph is put in the cache under bonding_job["key"] once ready
+        * if it is not ready within bonding_time_budget seconds, the process
+          is killed and the graph is calculated with the fallback bonding
+          strategy (in a background process too, with the same time budget)
+          and put in the cache under bonding_job["fallback_key"]
+        * the status of the job ("running", "done", "fallback" or "failed")
+          is kept under the job key, see _bonding_job_key(), finished jobs
+          are re-submitted once their status expires after
+          bonding_status_timeout seconds, or if their graph is no longer in
+          the cache
+
+        :param bonding_job: dict of "key", "fallback_key",
+        "fallback_bonding_strategy" and the "status" to show once the job is
+        done, also stored by the update_graph callback
+        :return: True if the job is running, also if it was already running
+        or has recently finished, or False if this process already runs
+        bonding_processes jobs
+        """
+
+        job_key = StructureMoleculeComponent._bonding_job_key(bonding_job)
+        status = cache.get(job_key)
+        if status in ("running", "fallback_running", "failed"):
+            return True
+        if status == "done" and cache.get(bonding_job["key"]) is not None:
+            return True
+        if status == "fallback" and cache.get(bonding_job["fallback_key"]) is not None:
+            return True
+
+        if StructureMoleculeComponent._bonding_slots is None:
+            StructureMoleculeComponent._bonding_slots = BoundedSemaphore(
+                StructureMoleculeComponent.bonding_processes
+            )
+        slots = StructureMoleculeComponent._bonding_slots
+        if not slots.acquire(blocking=False):
+            return False
+
+        time_budget = StructureMoleculeComponent.bonding_time_budget
+        graph_cache_timeout = StructureMoleculeComponent.graph_cache_timeout
+        status_timeout = StructureMoleculeComponent.bonding_status_timeout
+        struct_or_mol_data = MPComponent.to_data(struct_or_mol)
+
+        def set_status(status, timeout=status_timeout):
+            cache.set(job_key, status, timeout=timeout)
+
+        def run():
+            try:
+                graph_data = StructureMoleculeComponent._run_bonding_job(
+                    struct_or_mol_data,
+                    bonding_strategy,
+                    bonding_strategy_kwargs,
+                    time_budget,
+                )
+                if graph_data is not None:
+                    cache.set(
+                        bonding_job["key"], graph_data, timeout=graph_cache_timeout
+                    )
+                    set_status("done")
+                    return
+                set_status("fallback_running", timeout=time_budget + 60)
+                graph_data = cache.get(bonding_job["fallback_key"])
+                if graph_data is None:
+                    graph_data = StructureMoleculeComponent._run_bonding_job(
+                        struct_or_mol_data,
+                        bonding_job["fallback_bonding_strategy"],
+                        None,
+                        time_budget,
+                    )
+                if graph_data is None:
+                    set_status("failed")
+                    return
+                cache.set(
+                    bonding_job["fallback_key"],
+                    graph_data,
+                    timeout=graph_cache_timeout,
+                )
+                set_status("fallback")
+            finally:
+                slots.release()
+
+        # running jobs expire in case this process dies while they run
+        set_status("running", timeout=2 * time_budget + 60)
+        Thread(target=run, daemon=True).start()
+
+        return True
+
+    @staticmethod
+    def _run_bonding_job(
+        struct_or_mol_data, bonding_strategy, bonding_strategy_kwargs, time_budget
+    ):
+        """
+        Calculate a bonding graph in a new process, which is killed if it
+        takes longer than the time budget.
+
+        :param struct_or_mol_data: Structure or Molecule as Store contents
+        :param time_budget: time budget in seconds
+        :return: graph as Store contents, or None if it could not be
+        calculated within the time budget
+        """
+
+        receiver, sender = Pipe(duplex=False)
+        process = Process(
+            target=_send_graph_data,
+            args=(
+                sender,
+                struct_or_mol_data,
+                bonding_strategy,
+                bonding_strategy_kwargs,
+            ),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+
+        try:
+            if receiver.poll(time_budget):
+                return receiver.recv()
+        except EOFError:
+            # the process failed before sending a graph
+            pass
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            receiver.close()
+
+        return None
+
+    @staticmethod
+    def _bonding_job_key(bonding_job):
+        return f"{bonding_job['key']}_job"
+
+    @staticmethod
+    def _get_bonding_job_result(bonding_job, cache):
+        """
+        The result of a job from _submit_bonding_job(), from any process
+        sharing the cache.
+
+        :return: graph data (or None if there is no graph) and a status
+        message, or (None, None) if the job is still running
+        """
+
+        graph_data = cache.get(bonding_job["key"])
+        if graph_data is not None:
+            return graph_data, bonding_job.get("status", "")
+
+        status = cache.get(StructureMoleculeComponent._bonding_job_key(bonding_job))
+        if status in ("running", "fallback_running"):
+            return None, None
+
+        if status == "fallback":
+            graph_data = cache.get(bonding_job["fallback_key"])
+            if graph_data is not None:
+                return (
+                    graph_data,
+                    f"Bonds calculated with "
+                    f"{bonding_job['fallback_bonding_strategy']}, the chosen "
+                    f"bonding algorithm took too long.",
+                )
+
+        # failed, or the process running the job was stopped
+        return None, "Bonds could not be calculated."
+
+    def _scene_cache_key(self, scene_token):
+        return f"crystal_toolkit_scene_{self.id()}_{scene_token}"
+
+    @staticmethod
+    def _get_graph_cache_key(
+        struct_or_mol,
+        unit_cell_choice="input",
+        bonding_strategy="CrystalNN",
+        bonding_strategy_kwargs=None,
+    ):
+        """
+        Cache key for the bonding graph of a Structure or Molecule, from a
+        hash of its contents and the options used to calculate the graph.
+        Lattices and coordinates are rounded (and fractional coordinates
+        wrapped into the unit cell) so that the same structure from different
+        sources gives the same key.
+
+        :param struct_or_mol: Structure or Molecule
+        :param unit_cell_choice: "input", "primitive", "conventional" or
+        "reduced"
+        :param bonding_strategy: name of the NearNeighbors strategy
+        :param bonding_strategy_kwargs: kwargs of the NearNeighbors strategy
+        :return: cache key
+        """
+
+        content_hash = blake2b(digest_size=16)
+
+        if isinstance(struct_or_mol, Structure):
+            # adding 0.0 replaces -0.0, which has different bytes
+            content_hash.update(np.round(struct_or_mol.lattice.matrix, 6) + 0.0)
+            coords = np.round(np.mod(struct_or_mol.frac_coords, 1), 6)
+            content_hash.update(np.mod(coords, 1) + 0.0)
+        else:
+            content_hash.update(np.round(struct_or_mol.cart_coords, 6) + 0.0)
+            content_hash.update(dumps([struct_or_mol.charge]).encode())
+
+        content_hash.update(
+            dumps(
+                [
+                    [species.as_dict() for species in struct_or_mol.species_and_occu],
+                    struct_or_mol.site_properties,
+                    unit_cell_choice,
+                    bonding_strategy,
+                    bonding_strategy_kwargs,
+                ],
+                cls=MontyEncoder,
+                sort_keys=True,
+            ).encode()
+        )
+
+        return f"crystal_toolkit_graph_{content_hash.hexdigest()}"
+
+    def _encode_scene(self, scene):
+        # bounding boxes are included so that the viewer can fit the camera
+        # to the scene without measuring it
+        precision = self.initial_scene_settings.get("precision")
+        if self.scene_encoding == "binary":
+            scene_data = scene.to_binary(bounding_boxes=True, precision=precision)
+        else:
+            scene_data = scene.to_json(bounding_boxes=True, precision=precision)
+        # patches are only applied to the scene they were computed from
+        scene_data["hash"] = scene.content_hash
+        return scene_data
+
     def _make_legend(self, legend):
 
         if legend is None or (not legend.get("colors", None)):
@@ -506,12 +1129,25 @@ class StructureMoleculeComponent(MPComponent):
     def all_layouts(self):
 
         struct_layout = html.Div(
-            Simple3DSceneComponent(
-                id=self.id("scene"),
-                data=self.initial_scene_data,
-                settings=self.initial_scene_settings,
-            ),
+            [
+                Simple3DSceneComponent(
+                    id=self.id("scene"),
+                    data=self.initial_scene_data,
+                    settings=self.initial_scene_settings,
+                ),
+                # shown while bonds are calculated in the background
+                html.Div(
+                    id=self.id("bonding_status"),
+                    style={"position": "absolute", "top": "0.5rem", "left": "0.5rem"},
+                ),
+                dcc.Interval(
+                    id=self.id("bonding_poll"),
+                    interval=self.bonding_poll_interval,
+                    disabled=True,
+                ),
+            ],
             style={
+                "position": "relative",
                 "width": "100%",
                 "height": "100%",
                 "overflow": "hidden",
@@ -547,6 +1183,8 @@ class StructureMoleculeComponent(MPComponent):
             "O'Keeffe's Algorithm": "MinimumOKeeffeNN",
             "Hoppe's ECoN Algorithm": "EconNN",
             "Brunner's Reciprocal Algorithm": "BrunnerNN_reciprocal",
+            "Fast Custom or Covalent Bonds (KD-tree)": "KDTreeNN",
+            "No Bonds (Preview)": self.preview_bonding_strategy,
         }
 
         bonding_algorithm = dcc.Dropdown(
@@ -601,6 +1239,7 @@ class StructureMoleculeComponent(MPComponent):
                                 options=[
                                     {"label": "1×1×1", "value": "1"},
                                     {"label": "2×2×2", "value": "2"},
+                                    {"label": "3×3×3", "value": "3"},
                                 ],
                                 value="1",
                                 id=self.id("repeats"),
@@ -609,8 +1248,7 @@ class StructureMoleculeComponent(MPComponent):
                             ),
                             className="mpc-control",
                         ),
-                    ],
-                    style={"display": "none"},  # hidden for now, bug(!)
+                    ]
                 ),
                 html.Div(
                     [
@@ -673,6 +1311,26 @@ class StructureMoleculeComponent(MPComponent):
                         )
                     ]
                 ),
+                html.Label("Draw atoms as ellipsoids from:", className="mpc-label"),
+                html.Div(
+                    dcc.Dropdown(
+                        options=[],
+                        value=self.initial_display_options["ellipsoid_site_prop"],
+                        placeholder="No ellipsoids",
+                        id=self.id("ellipsoid_site_prop"),
+                    ),
+                    className="mpc-control",
+                ),
+                html.Label("Draw polyhedra around:", className="mpc-label"),
+                html.Div(
+                    dcc.Dropdown(
+                        options=[],
+                        multi=True,
+                        placeholder="Automatic (no overlapping polyhedra)",
+                        id=self.id("polyhedra_centers"),
+                    ),
+                    className="mpc-control",
+                ),
                 html.Label("Hide/show:", className="mpc-label"),
                 html.Div(
                     [
@@ -713,7 +1371,24 @@ class StructureMoleculeComponent(MPComponent):
         input: Union[Structure, StructureGraph, Molecule, MoleculeGraph],
         bonding_strategy: str = "CrystalNN",
         bonding_strategy_kwargs: Optional[Dict] = None,
+        covalent_bonding_threshold: int = 2_000,
+        kdtree_bonding_threshold: Optional[int] = None,
     ) -> Union[StructureGraph, MoleculeGraph]:
+        """
+        Calculate the bonding graph of a Structure or Molecule, unless a
+        graph is given. With the preview_bonding_strategy, the Structure or
+        Molecule is returned as is and drawn without bonds.
+
+        :param covalent_bonding_threshold: bonds in molecules with more sites
+        than this are found from covalent radii with a KD-tree rather than
+        with the bonding strategy, see get_covalent_bond_graph()
+        :param kdtree_bonding_threshold: bonds in structures with more sites
+        than this are found with KDTreeNN rather than with CrystalNN or
+        CutOffDictNN, using the custom cut-offs of CutOffDictNN if given (and
+        without covalent bonds, as CutOffDictNN), defaults to the class
+        attribute kdtree_bonding_threshold; disordered structures are always
+        bonded with KDTreeNN with custom cut-offs only
+        """
 
         if isinstance(input, Structure):
 
@@ -728,15 +1403,47 @@ class StructureMoleculeComponent(MPComponent):
                 site["abc"] = np.mod(site["abc"], 1)
             input = Structure.from_dict(input)
 
-            if not input.is_ordered:
-                # calculating bonds in disordered structures is currently very flaky
-                bonding_strategy = "CutOffDictNN"
+            if (
+                not input.is_ordered
+                and bonding_strategy
+                != StructureMoleculeComponent.preview_bonding_strategy
+            ):
+                # calculating bonds in disordered structures is currently very
+                # flaky, so only custom cut-offs are used, for disordered sites
+                # the largest cut-off of any of their species, see KDTreeNN
+                bonding_strategy_kwargs = {
+                    "cut_off_dict": (bonding_strategy_kwargs or {}).get("cut_off_dict"),
+                    "use_covalent_radii": False,
+                }
+                bonding_strategy = "KDTreeNN"
+
+            if StructureMoleculeComponent._is_bonded_with_kdtree(
+                input, bonding_strategy, kdtree_bonding_threshold
+            ):
+                # strategies that find the neighbors of one site at a time
+                # take minutes for large supercells, slabs etc.
+                if bonding_strategy == "CutOffDictNN":
+                    # as with CutOffDictNN, pairs of species without a
+                    # cut-off are not bonded
+                    bonding_strategy_kwargs = {
+                        **(bonding_strategy_kwargs or {}),
+                        "use_covalent_radii": False,
+                    }
+                else:
+                    bonding_strategy_kwargs = None
+                bonding_strategy = "KDTreeNN"
 
         # we assume most uses of this class will give a structure as an input argument,
         # meaning we have to calculate the graph for bonding information, however if
         # the graph is already known and supplied, we will use that
         if isinstance(input, StructureGraph) or isinstance(input, MoleculeGraph):
             graph = input
+        elif bonding_strategy == StructureMoleculeComponent.preview_bonding_strategy:
+            # no graph, the sites are drawn directly
+            graph = input
+        elif isinstance(input, Molecule) and len(input) > covalent_bonding_threshold:
+            # local_env strategies take minutes for proteins, clusters etc.
+            graph = get_covalent_bond_graph(input)
         else:
             if (
                 bonding_strategy
@@ -751,7 +1458,8 @@ class StructureMoleculeComponent(MPComponent):
                     )
                 )
             else:
-                bonding_strategy_kwargs = bonding_strategy_kwargs or {}
+                # copied, so that the options passed in are not modified
+                bonding_strategy_kwargs = dict(bonding_strategy_kwargs or {})
                 if bonding_strategy == "CutOffDictNN":
                     if "cut_off_dict" in bonding_strategy_kwargs:
                         # TODO: remove this hack by making args properly JSON serializable
@@ -765,7 +1473,10 @@ class StructureMoleculeComponent(MPComponent):
                     **bonding_strategy_kwargs
                 )
                 try:
-                    if isinstance(input, Structure):
+                    if isinstance(bonding_strategy, KDTreeNN):
+                        # bonds of all sites at once
+                        graph = bonding_strategy.get_bonded_structure(input)
+                    elif isinstance(input, Structure):
                         graph = StructureGraph.with_local_env_strategy(
                             input, bonding_strategy
                         )
@@ -802,15 +1513,35 @@ class StructureMoleculeComponent(MPComponent):
         return dict(site_prop_names)
 
     @staticmethod
-    def _get_origin(struct_or_mol):
+    def _get_repeats_display_range(repeats, draw_image_atoms=True, default=None):
+        """
+        Display range to draw a repeats x repeats x repeats supercell from the
+        periodic images of the sites of the unit cell, see
+        StructureGraph.get_scene().
+
+        :param repeats: number of repeats along each lattice vector
+        :param draw_image_atoms: also draw images of sites within 0.05
+        (fractional) of the boundary of the supercell
+        :param default: display range to use if repeats is 1
+        :return: display range
+        """
+        if repeats == 1:
+            return default
+        if draw_image_atoms:
+            return [[-0.05, repeats + 0.05]] * 3
+        # the display range includes its upper bound, which would otherwise
+        # also draw images of sites on the lower boundary
+        return [[0, repeats - 1e-6]] * 3
+
+    @staticmethod
+    def _get_origin(struct_or_mol, display_range=None):
 
         if isinstance(struct_or_mol, Structure):
-            # display_range = [0.5, 0.5, 0.5]
-            # x_center = 0.5 * (max(display_range[0]) - min(display_range[0]))
-            # y_center = 0.5 * (max(display_range[1]) - min(display_range[1]))
-            # z_center = 0.5 * (max(display_range[2]) - min(display_range[2]))
+            # center on the range of sites being drawn, the unit cell by default
+            if display_range is None:
+                display_range = [[0, 1], [0, 1], [0, 1]]
             geometric_center = struct_or_mol.lattice.get_cartesian_coords(
-                (0.5, 0.5, 0.5)
+                np.mean(display_range, axis=1)
             )
         elif isinstance(struct_or_mol, Molecule):
             geometric_center = np.average(struct_or_mol.cart_coords, axis=0)
@@ -819,15 +1550,186 @@ class StructureMoleculeComponent(MPComponent):
 
         return geometric_center
 
+    @staticmethod
+    def _get_lod_hints(
+        scene, triangle_budget=1_000_000, impostor_threshold=20_000, counts=None
+    ):
+        """
+        Choose the level of detail to draw a scene with so that it stays
+        responsive in the browser: sphere and cylinder segment counts are
+        lowered until the estimated number of triangles fits in the budget,
+        and if there are more spheres than impostor_threshold (or the budget
+        cannot be met otherwise) spheres are drawn as point-sprite impostors.
+
+        :param scene: Scene
+        :param triangle_budget: approximate maximum number of triangles to
+        draw, or None to always draw at full quality
+        :param impostor_threshold: number of spheres above which impostors are
+        used, or None to never use impostors
+        :param counts: dict of the numbers of "spheres" and "cylinders" in the
+        scene, if known, e.g. for a lazy Scene whose primitives cannot be
+        counted without consuming them, otherwise they are counted
+        :return: dict of level-of-detail hints for Scene.lod, or None if the
+        scene can be drawn at full quality
+        """
+
+        if triangle_budget is None:
+            return None
+
+        def count_instances(primitives):
+            for primitive in primitives:
+                if isinstance(primitive, Scene):
+                    count_instances(primitive.contents)
+                elif isinstance(primitive, (Spheres, InstancedSpheres)):
+                    counts["spheres"] += len(primitive.positions)
+                elif isinstance(primitive, (Cylinders, InstancedCylinders, Arrows)):
+                    counts["cylinders"] += len(primitive.positionPairs)
+
+        if counts is None:
+            counts = defaultdict(int)
+            count_instances(scene.contents)
+        else:
+            counts = defaultdict(int, counts)
+
+        # approximate triangle counts for a sphere and a (closed) cylinder
+        def num_triangles(sphere_segments, cylinder_segments):
+            return (
+                counts["spheres"] * 2 * sphere_segments ** 2
+                + counts["cylinders"] * 4 * cylinder_segments
+            )
+
+        use_impostors = (
+            impostor_threshold is not None and counts["spheres"] > impostor_threshold
+        )
+
+        for idx, (sphere_segments, cylinder_segments) in enumerate(
+            StructureMoleculeComponent.lod_segments
+        ):
+            if use_impostors:
+                sphere_segments = 0
+            if num_triangles(sphere_segments, cylinder_segments) <= triangle_budget:
+                break
+        else:
+            if impostor_threshold is not None:
+                use_impostors = True
+
+        if idx == 0 and not use_impostors:
+            return None
+
+        hints = {"cylinderSegments": cylinder_segments}
+        if use_impostors:
+            hints["sphereImpostors"] = True
+        else:
+            hints["sphereSegments"] = sphere_segments
+
+        return hints
+
+    @staticmethod
+    def _get_site_prop_types(graph):
+        """
+        Types of the site properties of a graph, see _analyze_site_props(),
+        memoized for graphs from MPComponent.from_data_cached().
+        """
+        return MPComponent.derived_from_data(
+            graph,
+            ("site_prop_types",),
+            lambda: StructureMoleculeComponent._analyze_site_props(
+                StructureMoleculeComponent._get_struct_or_mol(graph)
+            ),
+        )
+
+    @staticmethod
+    def _get_display_colors_and_legend(graph, color_scheme="Jmol", color_scale=None):
+        """
+        Colors and legend of the sites of a graph, see
+        _get_display_colors_and_legend_for_sites(), memoized for graphs from
+        MPComponent.from_data_cached().
+        """
+        return MPComponent.derived_from_data(
+            graph,
+            ("colors_and_legend", color_scheme, repr(color_scale)),
+            lambda: StructureMoleculeComponent._get_display_colors_and_legend_for_sites(
+                StructureMoleculeComponent._get_struct_or_mol(graph),
+                StructureMoleculeComponent._get_site_prop_types(graph),
+                color_scheme=color_scheme,
+                color_scale=color_scale,
+            ),
+        )
+
+    @staticmethod
+    def _get_display_radii(
+        graph, radius_strategy="specified_or_average_ionic", radius_scale=1.0
+    ):
+        """
+        Radii of the sites of a graph, see _get_display_radii_for_sites(),
+        memoized for graphs from MPComponent.from_data_cached().
+        """
+        return MPComponent.derived_from_data(
+            graph,
+            ("radii", radius_strategy, radius_scale),
+            lambda: StructureMoleculeComponent._get_display_radii_for_sites(
+                StructureMoleculeComponent._get_struct_or_mol(graph),
+                radius_strategy=radius_strategy,
+                radius_scale=radius_scale,
+            ),
+        )
+
+    @staticmethod
+    def _with_display_properties(graph, **site_properties):
+        """
+        A copy of a graph (or of a Structure or Molecule in preview mode)
+        with the given site properties added, without modifying the graph,
+        which can be shared by callbacks, see MPComponent.from_data_cached(). Only
+        the Structure or Molecule is copied, the bonds are shared.
+        """
+
+        struct_or_mol = StructureMoleculeComponent._get_struct_or_mol(graph)
+        struct_or_mol = struct_or_mol.copy()
+        for name, values in site_properties.items():
+            struct_or_mol.add_site_property(name, values)
+
+        if isinstance(graph, (Structure, Molecule)):
+            return struct_or_mol
+
+        if isinstance(graph, StructureGraph):
+            # create the cached adjacency and polyhedra of the graph first, so
+            # that they are shared with the copy, see get_adjacency()
+            graph._get_polyhedron_hulls(())
+
+        # a shallow copy, copy.copy() would re-create the graph from its dict
+        display_graph = object.__new__(type(graph))
+        display_graph.__dict__.update(graph.__dict__)
+        if isinstance(graph, StructureGraph):
+            display_graph.structure = struct_or_mol
+        else:
+            display_graph.molecule = struct_or_mol
+
+        return display_graph
+
     @staticmethod
     def _get_struct_or_mol(graph) -> Union[Structure, Molecule]:
         if isinstance(graph, StructureGraph):
             return graph.structure
         elif isinstance(graph, MoleculeGraph):
             return graph.molecule
+        elif isinstance(graph, (Structure, Molecule)):
+            # in preview mode, see preview_bonding_strategy
+            return graph
         else:
             raise ValueError
 
+    @staticmethod
+    def _get_ellipsoid_site_props(struct_or_mol):
+        """
+        Names of the site properties that can be drawn as ellipsoids, i.e.
+        with a 3x3 matrix for every site, see get_ellipsoids().
+        """
+        return [
+            prop
+            for prop, values in sorted(struct_or_mol.site_properties.items())
+            if all(np.shape(value) == (3, 3) for value in values)
+        ]
+
     @staticmethod
     def _compass_from_lattice(
         lattice,
@@ -1144,7 +2046,7 @@ class StructureMoleculeComponent(MPComponent):
 
     @staticmethod
     def get_scene_and_legend(
-        graph: Union[StructureGraph, MoleculeGraph],
+        graph: Union[StructureGraph, MoleculeGraph, Structure, Molecule],
         name="StructureMoleculeComponent",
         color_scheme="Jmol",
         color_scale=None,
@@ -1155,8 +2057,14 @@ class StructureMoleculeComponent(MPComponent):
         bonded_sites_outside_unit_cell=True,
         hide_incomplete_bonds=False,
         explicitly_calculate_polyhedra_hull=False,
+        polyhedra_centers=None,
+        display_range=None,
         scene_additions=None,
         show_compass=True,
+        triangle_budget=None,
+        impostor_threshold=None,
+        instanced_primitives=False,
+        lazy=False,
     ) -> Tuple[Scene, Dict[str, str]]:
 
         scene = Scene(name=name)
@@ -1164,27 +2072,23 @@ class StructureMoleculeComponent(MPComponent):
         if graph is None:
             return scene, {}
 
-        struct_or_mol = StructureMoleculeComponent._get_struct_or_mol(graph)
-        site_prop_types = StructureMoleculeComponent._analyze_site_props(struct_or_mol)
-
-        radii = StructureMoleculeComponent._get_display_radii_for_sites(
-            struct_or_mol, radius_strategy=radius_strategy, radius_scale=radius_scale
+        radii = StructureMoleculeComponent._get_display_radii(
+            graph, radius_strategy=radius_strategy, radius_scale=radius_scale
         )
-        colors, legend = StructureMoleculeComponent._get_display_colors_and_legend_for_sites(
-            struct_or_mol,
-            site_prop_types,
-            color_scale=color_scale,
-            color_scheme=color_scheme,
+        colors, legend = StructureMoleculeComponent._get_display_colors_and_legend(
+            graph, color_scheme=color_scheme, color_scale=color_scale
         )
 
         # TODO: add set_display_color option, set_display_radius, set_ellipsoid
         # call it "set_display_options" ?
         # sets legend too! display_legend
 
-        struct_or_mol.add_site_property("display_radius", radii)
-        struct_or_mol.add_site_property("display_color", colors)
+        graph = StructureMoleculeComponent._with_display_properties(
+            graph, display_radius=radii, display_color=colors
+        )
+        struct_or_mol = StructureMoleculeComponent._get_struct_or_mol(graph)
 
-        origin = StructureMoleculeComponent._get_origin(struct_or_mol)
+        origin = StructureMoleculeComponent._get_origin(struct_or_mol, display_range)
 
         scene = graph.get_scene(
             draw_image_atoms=draw_image_atoms,
@@ -1192,20 +2096,52 @@ class StructureMoleculeComponent(MPComponent):
             hide_incomplete_bonds=hide_incomplete_bonds,
             explicitly_calculate_polyhedra_hull=explicitly_calculate_polyhedra_hull,
             origin=origin,
+            instanced=instanced_primitives,
+            lazy=lazy,
+            display_range=display_range,
+            polyhedra_centers=polyhedra_centers,
+            ellipsoid_site_prop=ellipsoid_site_prop,
         )
 
         scene.name = name
         # TODO: ...
-        scene.origin = StructureMoleculeComponent._get_origin(struct_or_mol)
+        scene.origin = StructureMoleculeComponent._get_origin(
+            struct_or_mol, display_range
+        )
 
-        if show_compass:
+        if show_compass and isinstance(struct_or_mol, Structure):
             scene.contents.append(
-                StructureMoleculeComponent._compass_from_lattice(
-                    struct_or_mol.lattice, origin=origin
+                Scene(
+                    name="compass",
+                    contents=StructureMoleculeComponent._compass_from_lattice(
+                        struct_or_mol.lattice, origin=origin
+                    ),
                 )
             )
 
         if scene_additions:
             scene.contents.append(scene_additions)
 
+        counts = None
+        if lazy:
+            # counting primitives would consume the generators of a lazy
+            # scene, so they are estimated from the sites and bonds instead,
+            # with each bond drawn as two cylinders
+            num_images = 1
+            if display_range is not None and isinstance(struct_or_mol, Structure):
+                num_images = max(np.prod(np.ptp(display_range, axis=1)), 1)
+            num_bonds = 0
+            if isinstance(graph, (StructureGraph, MoleculeGraph)):
+                num_bonds = graph.graph.number_of_edges()
+            counts = {
+                "spheres": len(struct_or_mol) * num_images,
+                "cylinders": 2 * num_bonds * num_images,
+            }
+        scene.lod = StructureMoleculeComponent._get_lod_hints(
+            scene,
+            triangle_budget=triangle_budget,
+            impostor_threshold=impostor_threshold,
+            counts=counts,
+        )
+
         return scene, legend
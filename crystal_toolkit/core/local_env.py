@@ -0,0 +1,262 @@
+import numpy as np
+from pymatgen.analysis.graphs import StructureGraph, MoleculeGraph
+from pymatgen.analysis.local_env import NearNeighbors
+from pymatgen.analysis.molecule_structure_comparator import CovalentRadius
+from pymatgen.core.sites import PeriodicSite
+from scipy.spatial import cKDTree
+
+from crystal_toolkit.renderables.sitecollection import get_image_sites_in_range
+
+
+class KDTreeNN(NearNeighbors):
+    """
+    Bonds between all pairs of sites closer than a cut-off distance for their
+    species, found for all sites at once with a KD-tree over the sites of the
+    cell and the periodic images within the largest cut-off. This scales to
+    structures of 100k sites, where the strategies that find the neighbors of
+    each site in turn are too slow.
+
+    With a cut_off_dict, only the listed pairs of species are bonded, as in
+    CutOffDictNN, otherwise sites are bonded if closer than the sum of their
+    covalent radii plus a tolerance (unless use_covalent_radii is False, in
+    which case nothing is bonded, again as in CutOffDictNN). For disordered
+    sites the largest cut-off of any of their species is used.
+    """
+
+    def __init__(self, cut_off_dict=None, tolerance=0.45, use_covalent_radii=True):
+        """
+        :param cut_off_dict: maximum bond lengths in Å for pairs of species,
+        e.g. {("Fe", "O"): 2.0}, or as a list of (species, species, distance)
+        tuples; pairs with a cut-off of 0 are not bonded
+        :param tolerance: tolerance in Å added to the sum of covalent radii,
+        if no cut_off_dict is given
+        :param use_covalent_radii: bond by covalent radii if no cut_off_dict
+        is given
+        """
+
+        if isinstance(cut_off_dict, dict):
+            cut_off_dict = [(a, b, dist) for (a, b), dist in cut_off_dict.items()]
+        self.cut_off_dict = {
+            (a, b): float(dist) for a, b, dist in cut_off_dict or [] if float(dist) > 0
+        }
+        self.tolerance = tolerance
+        self.use_covalent_radii = use_covalent_radii
+
+    @property
+    def structures_allowed(self):
+        return True
+
+    @property
+    def molecules_allowed(self):
+        return True
+
+    @property
+    def extend_structure_molecules(self):
+        return False
+
+    def _get_cut_offs(self, structure):
+        """
+        Cut-off distances between all pairs of sites, as the index of the
+        species of each site of shape (n,) into a symmetric matrix of cut-offs
+        between species of shape (k, k), nan if not bonded.
+        """
+
+        # sites with the same species share an index
+        keys, site_species = {}, []
+        for species in structure.species_and_occu:
+            key = tuple(sorted(str(sp) for sp in species))
+            if key not in keys:
+                keys[key] = len(keys)
+                site_species.append(list(species))
+        species_indices = np.array(
+            [
+                keys[tuple(sorted(str(sp) for sp in species))]
+                for species in structure.species_and_occu
+            ],
+            dtype=int,
+        )
+
+        if self.cut_off_dict or not self.use_covalent_radii:
+            lookup = {}
+            for (a, b), dist in self.cut_off_dict.items():
+                lookup[(a, b)] = lookup[(b, a)] = dist
+            # fmax ignores nan as nanmax does, i.e. pairs of species without
+            # a cut-off, without warning if all are nan
+            cut_offs = np.array(
+                [
+                    [
+                        np.fmax.reduce(
+                            [lookup.get((a, b), np.nan) for a in sp1 for b in sp2]
+                        )
+                        for sp2 in keys
+                    ]
+                    for sp1 in keys
+                ]
+            ).reshape(len(keys), len(keys))
+        else:
+            # sites of unknown elements (e.g. dummy species) are not bonded,
+            # fmax ignores nan as nanmax does, without warning if all are nan
+            radii = np.array(
+                [
+                    np.fmax.reduce(
+                        [CovalentRadius.radius.get(sp.symbol, np.nan) for sp in species]
+                    )
+                    for species in site_species
+                ]
+            )
+            cut_offs = radii[:, np.newaxis] + radii[np.newaxis, :] + self.tolerance
+
+        return species_indices, cut_offs
+
+    def get_neighbors(self, structure, indices=None):
+        """
+        Find the neighbors of the given sites, for all of them at once.
+
+        :param structure: Structure or Molecule
+        :param indices: indices of the sites to find the neighbors of, all
+        sites if None
+        :return: indices of the sites of shape (m,), indices of their
+        neighbors of shape (m,), the images of the neighbors relative to the
+        sites of shape (m, 3) and the bond lengths of shape (m,)
+        """
+
+        if indices is None:
+            indices = np.arange(len(structure))
+        indices = np.asarray(indices, dtype=int).reshape(-1)
+
+        species_indices, cut_offs = self._get_cut_offs(structure)
+        if not len(structure) or not np.any(np.isfinite(cut_offs)):
+            return (
+                np.zeros(0, dtype=int),
+                np.zeros(0, dtype=int),
+                np.zeros((0, 3), dtype=int),
+                np.zeros(0),
+            )
+        max_dist = np.nanmax(cut_offs)
+
+        lattice = getattr(structure, "lattice", None)
+        if lattice is None:
+            coords = structure.cart_coords
+            points, point_sites = coords, np.arange(len(structure))
+            point_images = np.zeros((len(structure), 3), dtype=int)
+        else:
+            # images are found for coordinates wrapped into the cell, and
+            # given relative to the unwrapped coordinates of the structure
+            frac_coords = structure.frac_coords
+            cells = np.floor(frac_coords).astype(int)
+            frac_coords = frac_coords - cells
+            coords = lattice.get_cartesian_coords(frac_coords)
+            # every point within max_dist of the cell, the distance between
+            # lattice planes is the inverse of the reciprocal lattice vectors
+            padding = max_dist * np.array(
+                lattice.reciprocal_lattice_crystallographic.abc
+            )
+            point_sites, point_images = get_image_sites_in_range(
+                frac_coords, np.stack([-padding, 1 + padding], axis=1)
+            )
+            points = lattice.get_cartesian_coords(
+                frac_coords[point_sites] + point_images
+            )
+
+        pairs = cKDTree(coords[indices]).sparse_distance_matrix(
+            cKDTree(points), max_dist, output_type="ndarray"
+        )
+        sites, neighbors = indices[pairs["i"]], point_sites[pairs["j"]]
+        images, distances = point_images[pairs["j"]], pairs["v"]
+        if lattice is not None:
+            images = images - cells[neighbors] + cells[sites]
+
+        # sites are not bonded to themselves, nor if their cut-off is nan
+        bonded = (
+            distances < cut_offs[species_indices[sites], species_indices[neighbors]]
+        )
+        bonded &= (sites != neighbors) | np.any(images != 0, axis=1)
+        order = np.lexsort((neighbors[bonded], sites[bonded]))
+
+        return (
+            sites[bonded][order],
+            neighbors[bonded][order],
+            images[bonded][order],
+            distances[bonded][order],
+        )
+
+    def get_nn_info(self, structure, n):
+        """
+        Get all near-neighbor sites of the site with index n, see
+        get_neighbors().
+
+        :param structure: Structure or Molecule
+        :param n: index of the site
+        :return: list of dicts of the neighboring site, its image, weight
+        (the bond length) and site index
+        """
+
+        _, neighbors, images, distances = self.get_neighbors(structure, [n])
+
+        nn_info = []
+        for neighbor, image, distance in zip(neighbors, images, distances):
+            site = structure[int(neighbor)]
+            if hasattr(structure, "lattice"):
+                site = PeriodicSite(
+                    site.species,
+                    site.frac_coords + image,
+                    structure.lattice,
+                    properties=site.properties,
+                )
+            nn_info.append(
+                {
+                    "site": site,
+                    "image": tuple(image.tolist()),
+                    "weight": float(distance),
+                    "site_index": int(neighbor),
+                }
+            )
+
+        return nn_info
+
+    def get_bonded_structure(self, structure, decorate=False, weights=True, **kwargs):
+        """
+        A StructureGraph or MoleculeGraph with the bonds from get_neighbors(),
+        built from the arrays of bonds of all sites at once.
+
+        :param structure: Structure or Molecule
+        :param decorate: add the coordination numbers as a site property,
+        see NearNeighbors.get_bonded_structure()
+        :param weights: use the bond lengths as the weights of the edges
+        :return: StructureGraph or MoleculeGraph
+        """
+
+        if decorate:
+            return super().get_bonded_structure(
+                structure, decorate=decorate, weights=weights, **kwargs
+            )
+
+        sites, neighbors, images, distances = self.get_neighbors(structure)
+
+        # each bond is found from both of its sites, keep the one from the
+        # site with the lower index (or in a positive image, for bonds to
+        # periodic images of the same site) as in StructureGraph.add_edge()
+        nonzero = images != 0
+        first = np.argmax(nonzero, axis=1)
+        positive = images[np.arange(len(images)), first] > 0
+        keep = (sites < neighbors) | ((sites == neighbors) & positive)
+
+        periodic = hasattr(structure, "lattice")
+        graph = (StructureGraph if periodic else MoleculeGraph).with_empty_graph(
+            structure, edge_weight_name="bond_length", edge_weight_units="Å"
+        )
+
+        edges = []
+        for site, neighbor, image, distance in zip(
+            sites[keep].tolist(),
+            neighbors[keep].tolist(),
+            images[keep].tolist(),
+            distances[keep].tolist(),
+        ):
+            data = {"weight": distance} if weights else {}
+            if periodic:
+                data["to_jimage"] = tuple(image)
+            edges.append((site, neighbor, data))
+        graph.graph.add_edges_from(edges)
+
+        return graph
@@ -1,7 +1,10 @@
 import logging
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime
+from hashlib import blake2b
 from json import dumps, loads
+from threading import RLock
 from time import mktime
 from warnings import warn
 
@@ -23,6 +26,18 @@ class MPComponent(ABC):
     app = None
     cache = null_cache
 
+    # objects decoded with from_data_cached() from Stores of at least
+    # decode_cache_min_bytes are kept in a least-recently-used cache of at
+    # most decode_cache_max_bytes (of JSON) per process, so that the callbacks
+    # that fire on a change of the same Store only decode it once
+    decode_cache_min_bytes = 65_536
+    decode_cache_max_bytes = 256 * 1024 ** 2
+    # hash of Store contents -> [object, size in bytes, derived values]
+    _decode_cache = OrderedDict()
+    _decode_cache_bytes = 0
+    _decode_cache_hashes = {}
+    _decode_cache_lock = RLock()
+
     @staticmethod
     def register_app(app):
         MPComponent.app = app
@@ -132,15 +147,93 @@ class MPComponent(ABC):
             # return {'token': token}
         return data_str
 
+    @staticmethod
+    def data_hash(data):
+        """
+        A hash of the contents of a dcc.Store created by to_data, e.g. to use
+        as a cache key or to check if a Store has changed. Since to_data is
+        deterministic, equal objects give equal hashes.
+        :param data: contents of a dcc.Store created by to_data
+        :return: hash as a hexadecimal string, or None if data is None
+        """
+        if data is None:
+            return None
+        if not isinstance(data, str):
+            data = dumps(data, sort_keys=True, separators=(",", ":"))
+        return blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
     @staticmethod
     def from_data(data):
         """
         Converts the contents of a dcc.Store back into a Python object.
+
         :param data: contents of a dcc.Store created by to_data
         :return: a Python object
         """
         return loads(data, cls=MontyDecoder)
 
+    @staticmethod
+    def from_data_cached(data):
+        """
+        As from_data(), but large Stores are only decoded once while they are
+        in the decode cache, so the same object is returned to every callback
+        that reads the same Store contents: it must not be modified, make a
+        copy first. Only use this in callbacks that are known not to modify
+        the object.
+        :param data: contents of a dcc.Store created by to_data
+        :return: a Python object
+        """
+        if not isinstance(data, str) or len(data) < MPComponent.decode_cache_min_bytes:
+            return MPComponent.from_data(data)
+
+        data_hash = MPComponent.data_hash(data)
+        with MPComponent._decode_cache_lock:
+            entry = MPComponent._decode_cache.get(data_hash)
+            if entry is not None:
+                MPComponent._decode_cache.move_to_end(data_hash)
+                return entry[0]
+
+        obj = MPComponent.from_data(data)
+
+        with MPComponent._decode_cache_lock:
+            if data_hash not in MPComponent._decode_cache:
+                MPComponent._decode_cache[data_hash] = [obj, len(data), {}]
+                MPComponent._decode_cache_hashes[id(obj)] = data_hash
+                MPComponent._decode_cache_bytes += len(data)
+            # evict least recently used objects, but always keep the newest
+            while (
+                MPComponent._decode_cache_bytes > MPComponent.decode_cache_max_bytes
+                and len(MPComponent._decode_cache) > 1
+            ):
+                _, (evicted, size, _) = MPComponent._decode_cache.popitem(last=False)
+                del MPComponent._decode_cache_hashes[id(evicted)]
+                MPComponent._decode_cache_bytes -= size
+            return MPComponent._decode_cache[data_hash][0]
+
+    @staticmethod
+    def derived_from_data(obj, key, compute):
+        """
+        Memoize a value derived from an object returned by from_data_cached(), e.g.
+        an analysis of a decoded Structure, for as long as the object is in
+        the decode cache. Like the object, the value must not be modified.
+        :param obj: object returned by from_data_cached()
+        :param key: hashable key for the value, including any options that
+        the value depends on
+        :param compute: function without arguments to compute the value
+        :return: the value
+        """
+        with MPComponent._decode_cache_lock:
+            data_hash = MPComponent._decode_cache_hashes.get(id(obj))
+            if data_hash is None:
+                return compute()
+            derived = MPComponent._decode_cache[data_hash][2]
+            if key in derived:
+                return derived[key]
+        value = compute()
+        with MPComponent._decode_cache_lock:
+            derived[key] = value
+        return value
+
     def attach_from(
         self, origin_component, origin_store_name="default", this_store_name="default"
     ):
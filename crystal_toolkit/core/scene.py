@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
-from itertools import chain
+from base64 import b64encode, b64decode
+from dataclasses import dataclass, field, fields, is_dataclass, replace
+from functools import lru_cache
+from hashlib import blake2b
+from io import BytesIO
+from operator import attrgetter
+from json import dumps
+from typing import List, Optional, Dict, Any, Union
 from collections import defaultdict
-from warnings import warn
+
+import numpy as np
 
 
 """
@@ -12,22 +18,632 @@ Simple3DSceneComponent. To use, create a Scene whose contents can either be a
 a list of any of the geometric primitives defined below (e.g. Spheres,
 Cylinders, etc.) or can be another Scene. Then use scene_to_json() to convert
 the Scene to the JSON format to pass to Simple3DSceneComponent's data attribute.
+
+Geometry (positions, position pairs, normals, ellipsoid rotations and scales)
+is stored column-wise as contiguous NumPy arrays, one array per primitive, so
+that scenes can be built, merged and serialized on whole arrays at a time.
+Lists of lists are still accepted as input and are converted on construction.
 """
 
 
+def _as_vectors(values, shape=(3,)):
+    """
+    Convert a list of vectors (or list of pairs of vectors) to a contiguous
+    float64 array of shape (n, *shape). An empty input gives an array of
+    shape (0, *shape).
+    :param values: array-like of vectors
+    :param shape: shape of a single entry, e.g. (3,) for a position or (2, 3)
+    for a position pair
+    :return: np.ndarray
+    """
+    return np.ascontiguousarray(values, dtype=np.float64).reshape(-1, *shape)
+
+
+def _as_ellipsoids(ellipsoids):
+    """
+    Convert the "rotations" and "scales" of an ellipsoids dict to arrays.
+    Rotations are kept as given, either directions of shape (n, 3) or
+    quaternions of shape (n, 4).
+    """
+    if ellipsoids is None:
+        return None
+    return {
+        k: _as_vectors(v, shape=np.shape(v)[-1:] if len(v) else (3,))
+        for k, v in ellipsoids.items()
+    }
+
+
+def _quaternions_from_z(directions):
+    """
+    Unit quaternions (x, y, z, w) that rotate (0, 0, 1) onto each direction,
+    equivalent to THREE.Quaternion.setFromUnitVectors in Simple3DScene.
+
+    :param directions: array of shape (n, 3), need not be normalized
+    :return: array of shape (n, 4)
+    """
+    norms = np.linalg.norm(directions, axis=1, keepdims=True)
+    directions = directions / np.where(norms > 0, norms, 1)
+    # the half-way quaternion (z x b, 1 + z . b), normalized
+    quaternions = np.stack(
+        [
+            -directions[:, 1],
+            directions[:, 0],
+            np.zeros(len(directions)),
+            1 + directions[:, 2],
+        ],
+        axis=-1,
+    )
+    # rotate by pi about x if the direction is -z
+    antiparallel = np.isclose(quaternions[:, 3], 0)
+    quaternions[antiparallel] = (1, 0, 0, 0)
+    return quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+
+
+def _as_colors(colors):
+    """
+    Convert a list of hexadecimal color strings (e.g. #ff0000) or of RGB
+    values between 0 and 1 to an array of shape (n, 3).
+    """
+    if colors is None:
+        return None
+    if len(colors) and isinstance(colors[0], str):
+        colors = [_hex_to_rgb(color) for color in colors]
+    return _as_vectors(colors)
+
+
+def _hex_to_rgb(color):
+    return [int(color[idx : idx + 2], 16) / 255 for idx in (1, 3, 5)]
+
+
+def _is_hex_color(color):
+    return isinstance(color, str) and len(color) == 7 and color.startswith("#")
+
+
+# mapping of NumPy dtypes to the JavaScript typed array used to decode them
+TYPED_ARRAYS = {
+    "float32": "Float32Array",
+    "uint8": "Uint8Array",
+    "uint16": "Uint16Array",
+    "uint32": "Uint32Array",
+    "int16": "Int16Array",
+    "int32": "Int32Array",
+}
+
+
+def encode_typed_array(array, dtype="float32"):
+    """
+    Encode an array as a base64 string of its raw little-endian bytes, together
+    with a small header describing how to decode it in JavaScript, e.g.
+    {"typedArray": "Float32Array", "shape": [2, 3], "data": "AAAAAAAA..."}.
+    :param array: array-like
+    :param dtype: one of the keys of TYPED_ARRAYS
+    :return: dict
+    """
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {
+        "typedArray": TYPED_ARRAYS[dtype],
+        "shape": list(array.shape),
+        "data": b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def decode_typed_array(encoded):
+    """
+    Inverse of encode_typed_array, also decodes quantized arrays, see
+    quantize_array.
+    :param encoded: dict as returned by encode_typed_array
+    :return: np.ndarray
+    """
+    if "values" in encoded:
+        array = np.array(encoded["values"])
+    else:
+        dtype = {v: k for k, v in TYPED_ARRAYS.items()}[encoded["typedArray"]]
+        array = np.frombuffer(
+            b64decode(encoded["data"]), dtype=np.dtype(dtype).newbyteorder("<")
+        ).reshape(encoded["shape"])
+    if "offset" in encoded:
+        array = array * np.array(encoded["scale"]) + np.array(encoded["offset"])
+    return array
+
+
+def quantize_array(array, dtype="int16"):
+    """
+    Quantize an array of vectors to integers relative to its own bounding
+    box, i.e. value = quantized * scale + offset with a separate scale and
+    offset for each component (x, y and z for positions). With int16, the
+    error is at most 1/65535 of the extent of the array along each axis.
+    :param array: array of shape (..., k), e.g. (n, 3) for positions
+    :param dtype: integer dtype to quantize to
+    :return: quantized array, offset and scale, each of shape (k,)
+    """
+    info = np.iinfo(dtype)
+    vectors = array.reshape(-1, array.shape[-1])
+    lower, upper = vectors.min(axis=0), vectors.max(axis=0)
+    scale = (upper - lower) / (int(info.max) - int(info.min))
+    scale[scale == 0] = 1.0
+    quantized = np.round((array - lower) / scale) + info.min
+    offset = lower - info.min * scale
+    return quantized.astype(dtype), offset, scale
+
+
+# maximum number of instances in a primitive merged while writing a Scene
+MERGE_SIZE = 65536
+
+
+@lru_cache(maxsize=None)
+def _field_names(cls):
+    """
+    Names of the fields of a Scene or primitive, in order. This is computed
+    once per class rather than once per object serialized.
+    """
+    return tuple(f.name for f in fields(cls))
+
+
+def _array_to_list(array):
+    return array.tolist()
+
+
+# how geometry arrays are serialized for each scene encoding
+ARRAY_ENCODERS = {"json": _array_to_list, "binary": encode_typed_array}
+
+
+def _get_array_encoder(encoding="json", precision=None):
+    """
+    Function used to serialize geometry arrays.
+    :param encoding: "json" or "binary", see ARRAY_ENCODERS
+    :param precision: None to serialize arrays as they are, an integer
+    number of decimal places to round to, or "int16" to quantize arrays
+    relative to their bounding box, see quantize_array
+    :return: function
+    """
+    encode = ARRAY_ENCODERS[encoding]
+
+    if precision is None:
+        return encode
+
+    elif precision == "int16":
+
+        def encode_quantized(array):
+            if not array.size:
+                return encode(array)
+            quantized, offset, scale = quantize_array(array)
+            if encoding == "binary":
+                encoded = encode_typed_array(quantized, dtype="int16")
+            else:
+                encoded = {"shape": list(quantized.shape), "values": quantized.tolist()}
+            encoded["offset"] = offset.tolist()
+            encoded["scale"] = scale.tolist()
+            return encoded
+
+        return encode_quantized
+
+    elif isinstance(precision, int):
+        return lambda array: encode(np.round(array, precision))
+
+    raise ValueError(
+        f"Unknown precision {precision}, choose from None, an integer number "
+        f"of decimal places or int16"
+    )
+
+
+def _serialize(obj, encode_array, bounding_boxes=False):
+    """
+    Convert a Scene, primitive or a list or dict of these into JSON-compatible
+    Python types in a single pass. Fields that are None are assumed to take
+    their default value and are omitted to reduce the size of the JSON.
+    :param obj: object to serialize
+    :param encode_array: function used to serialize geometry arrays, one of
+    ARRAY_ENCODERS
+    :param bounding_boxes: if True, add the bounding box of every Scene as
+    "bbox", see Scene.bounding_box
+    :return: JSON-compatible Python object
+    """
+    if isinstance(obj, np.ndarray):
+        # only geometry is encoded, a 1D array such as the origin is always
+        # sent as a plain list
+        return encode_array(obj) if obj.ndim > 1 else obj.tolist()
+    elif isinstance(obj, (list, tuple)):
+        return [_serialize(item, encode_array, bounding_boxes) for item in obj]
+    elif isinstance(obj, dict):
+        return {
+            k: _serialize(v, encode_array, bounding_boxes)
+            for k, v in obj.items()
+            if v is not None
+        }
+    elif is_dataclass(obj):
+        serialized = {}
+        for name, v in _get_items(obj, bounding_boxes):
+            if v is not None:
+                serialized[name] = _serialize(v, encode_array, bounding_boxes)
+        return serialized
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def _write_json(obj, write, encode_array, bounding_boxes=False, merge_size=None):
+    """
+    As _serialize, but writes UTF-8 encoded JSON bytes using the supplied
+    write function instead of returning a Python object, see _iter_json().
+    """
+    for chunk in _iter_json(obj, encode_array, bounding_boxes, merge_size):
+        write(chunk)
+
+
+def _iter_json(obj, encode_array, bounding_boxes=False, merge_size=None):
+    """
+    As _serialize, but yields UTF-8 encoded JSON bytes piece by piece instead
+    of returning a Python object. The contents of Scenes are merged as they
+    are written, see Scene.iter_merged_primitives(), so that the contents of
+    a Scene can also be a generator that is only consumed here.
+    """
+    if isinstance(obj, np.ndarray):
+        yield _dumps(_serialize(obj, encode_array))
+    elif isinstance(obj, Scene):
+        yield from _iter_scene_json(obj, encode_array, bounding_boxes, merge_size)
+    elif isinstance(obj, (list, tuple)):
+        yield b"["
+        for idx, item in enumerate(obj):
+            if idx:
+                yield b","
+            yield from _iter_json(item, encode_array, bounding_boxes, merge_size)
+        yield b"]"
+    elif isinstance(obj, dict) or is_dataclass(obj):
+        items = obj.items() if isinstance(obj, dict) else _get_items(obj)
+        yield b"{"
+        first = True
+        for k, v in items:
+            if v is None:
+                continue
+            if not first:
+                yield b","
+            first = False
+            yield _dumps(k)
+            yield b":"
+            yield from _iter_json(v, encode_array, bounding_boxes, merge_size)
+        yield b"}"
+    else:
+        yield _dumps(_serialize(obj, encode_array))
+
+
+def _iter_scene_json(scene, encode_array, bounding_boxes=False, merge_size=None):
+    """
+    Yields a Scene as JSON bytes, see _iter_json(). The bounding box is
+    accumulated while the contents are written and is written after them,
+    so the contents are only consumed once.
+
+    :return: bounding box of the Scene as for Scene.bounding_box
+    """
+    all_bounds = []
+    yield b"{"
+    first = True
+    for k, v in _get_items(scene):
+        if v is None:
+            continue
+        if not first:
+            yield b","
+        first = False
+        yield _dumps(k)
+        yield b":"
+        if k != "contents":
+            yield from _iter_json(v, encode_array, bounding_boxes, merge_size)
+            continue
+        yield b"["
+        merged = Scene.iter_merged_primitives(v, max_size=merge_size)
+        for idx, item in enumerate(merged):
+            if idx:
+                yield b","
+            if isinstance(item, Scene):
+                bounds = yield from _iter_scene_json(
+                    item, encode_array, bounding_boxes, merge_size
+                )
+            else:
+                yield from _iter_json(item, encode_array, bounding_boxes, merge_size)
+                bounds = _get_bounds(item) if bounding_boxes else None
+            if bounds is not None:
+                all_bounds.append(bounds)
+        yield b"]"
+    bounds = _combine_bounds(all_bounds)
+    if bounding_boxes and bounds is not None:
+        yield b',"bbox":' + _dumps(bounds.tolist())
+    yield b"}"
+    return bounds
+
+
+def _get_items(obj, bounding_boxes=False):
+    """
+    Field names and values of a Scene or primitive to serialize.
+    """
+    items = [(name, getattr(obj, name)) for name in _field_names(type(obj))]
+    if bounding_boxes and isinstance(obj, Scene):
+        bounding_box = obj.bounding_box
+        if bounding_box is not None:
+            items.append(("bbox", bounding_box.tolist()))
+    return items
+
+
+def _dumps(obj):
+    return dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _setattr_invalidating_caches(self, name, value):
+    """
+    __setattr__ for Scenes and primitives that counts the modifications of
+    each object, so that cached bounding boxes and content hashes are only
+    used for the version of the object they were computed for, see
+    _get_version().
+    """
+    attributes = self.__dict__
+    attributes[name] = value
+    attributes["_version"] = attributes.get("_version", 0) + 1
+
+
+def _is_lazy(obj):
+    """
+    True for a Scene whose contents, or the contents of any Scene it
+    contains, are a generator rather than a list, see Scene. Anything that
+    iterates the contents of such a Scene before it is written would consume
+    them.
+    """
+    if not isinstance(obj, Scene):
+        return False
+    if not isinstance(obj.contents, (list, tuple)):
+        return True
+    return any(_is_lazy(item) for item in obj.contents)
+
+
+def _get_version(obj):
+    """
+    Cache key for the contents of a Scene or primitive, which changes when
+    the object is modified, or for a Scene when anything it contains is
+    modified or its contents are changed. Not defined for lazy Scenes, see
+    _is_lazy().
+    """
+    version = (id(obj), obj.__dict__.get("_version", 0))
+    if isinstance(obj, Scene):
+        version += tuple(_get_version(item) for item in obj.contents)
+    return version
+
+
+def content_hash(obj):
+    """
+    A hash of the contents of a Scene or primitive, suitable for cache keys,
+    ETags or to detect that a Scene has not changed. Two objects have the same
+    hash if they are of the same type with equal fields (ignoring private
+    fields such as _meta), and geometry arrays are hashed from their raw
+    buffers rather than from their JSON representation.
+
+    The hash is memoized on the object and on every object it contains, and
+    is recomputed when anything is modified in the same way as
+    Scene.bounding_box.
+
+    Lazy Scenes cannot be hashed without consuming their contents, see
+    _is_lazy().
+
+    :param obj: Scene or primitive
+    :return: hash as a hexadecimal string
+    """
+    if _is_lazy(obj):
+        raise ValueError(
+            "Cannot hash a Scene with lazy contents without consuming them."
+        )
+    key = _get_version(obj)
+    cached = obj.__dict__.get("_hash")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    digest = blake2b(digest_size=16)
+    digest.update(type(obj).__name__.encode("utf-8"))
+    for name in _field_names(type(obj)):
+        if not name.startswith("_"):
+            digest.update(name.encode("utf-8"))
+            _update_hash(digest, getattr(obj, name))
+    value = digest.hexdigest()
+
+    obj.__dict__["_hash"] = (key, value)
+    return value
+
+
+def _update_hash(digest, value):
+    """
+    Add a field value to a hash, with a type tag for every value so that
+    e.g. [1, 2] and "[1, 2]" hash differently.
+    """
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        digest.update(f"a{array.dtype.str}{array.shape}".encode("utf-8"))
+        digest.update(array.tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"l{len(value)}".encode("utf-8"))
+        for item in value:
+            _update_hash(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"d{len(value)}".encode("utf-8"))
+        for k in sorted(value):
+            _update_hash(digest, k)
+            _update_hash(digest, value[k])
+    elif is_dataclass(value):
+        digest.update(f"h{content_hash(value)}".encode("utf-8"))
+    else:
+        if isinstance(value, np.generic):
+            value = value.item()
+        digest.update(f"v{value!r}".encode("utf-8"))
+
+
+def _get_bounds(primitive):
+    """
+    Axis-aligned bounding box of a primitive, computed from all of its
+    positions (or position pairs) at once. Spheres and cubes are padded by
+    their size, other primitives are bounded by their vertices only.
+    :param primitive: a primitive, e.g. Spheres
+    :return: array [min, max] of shape (2, 3), or None if the primitive has
+    no geometry
+    """
+    key = _get_version(primitive)
+    cached = primitive.__dict__.get("_bounds")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    points = getattr(primitive, "positions", None)
+    if points is None:
+        points = getattr(primitive, "positionPairs", None)
+    if points is None or not len(points):
+        primitive.__dict__["_bounds"] = (key, None)
+        return None
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    if isinstance(primitive, Spheres):
+        padding = 1.0 if primitive.radius is None else primitive.radius
+    elif isinstance(primitive, InstancedSpheres):
+        padding = 1.0 if primitive.radii is None else primitive.radii[:, np.newaxis]
+    elif isinstance(primitive, Cubes):
+        padding = 0.5 if primitive.width is None else primitive.width / 2
+    else:
+        padding = 0.0
+    if getattr(primitive, "ellipsoids", None):
+        padding = padding * primitive.ellipsoids["scales"].max(axis=1)[:, np.newaxis]
+
+    bounds = np.array([(points - padding).min(axis=0), (points + padding).max(axis=0)])
+    primitive.__dict__["_bounds"] = (key, bounds)
+    return bounds
+
+
+def _combine_bounds(all_bounds):
+    """
+    Bounding box enclosing a list of bounding boxes, or None if it is empty.
+    """
+    if not all_bounds:
+        return None
+    all_bounds = np.array(all_bounds)
+    return np.array([all_bounds[:, 0].min(axis=0), all_bounds[:, 1].max(axis=0)])
+
+
+def _get_distances(primitive, point):
+    """
+    Distance from a point to each position of a primitive, or to each
+    segment for primitives defined by position pairs.
+    """
+    if getattr(primitive, "positions", None) is not None:
+        positions = np.asarray(primitive.positions, dtype=np.float64)
+        return np.linalg.norm(positions.reshape(-1, 3) - point, axis=1)
+    position_pairs = np.asarray(primitive.positionPairs, dtype=np.float64)
+    starts, ends = position_pairs[:, 0], position_pairs[:, 1]
+    segments = ends - starts
+    lengths = np.einsum("ij,ij->i", segments, segments)
+    fractions = np.einsum("ij,ij->i", point - starts, segments) / np.where(
+        lengths > 0, lengths, 1
+    )
+    closest = starts + np.clip(fractions, 0, 1)[:, np.newaxis] * segments
+    return np.linalg.norm(closest - point, axis=1)
+
+
 @dataclass
 class Scene:
     """
     A Scene is defined by its name (a string, does not have to be unique),
     and its contents (a list of geometric primitives or other Scenes).
+
+    Optionally, level-of-detail hints can be given for the viewer, these
+    override the viewer settings for this Scene and everything it contains,
+    e.g. {"sphereSegments": 8, "cylinderSegments": 4, "sphereImpostors": True},
+    see StructureMoleculeComponent._get_lod_hints().
+
+    The contents can also be a generator, e.g. from
+    StructureGraph.get_scene(lazy=True), in which case primitives are only
+    generated when the Scene is written with write_json() or
+    iter_json_chunks(). Since a generator can only be consumed once, such a
+    Scene can only be written (or converted with to_json()) once.
     """
 
     name: str  # name for the scene, does not have to be unique
     contents: list = field(default_factory=list)
     origin: List[float] = field(default=(0, 0, 0))
+    lod: Optional[Dict[str, Any]] = None
     _meta: Any = None
 
-    def to_json(self):
+    __setattr__ = _setattr_invalidating_caches
+
+    @property
+    def bounding_box(self):
+        """
+        Axis-aligned bounding box of everything in the Scene, including
+        sub-Scenes, e.g. for fitting the camera to the Scene. This is cached
+        per Scene and per primitive, and is recomputed when the Scene or
+        anything in it is modified (by setting an attribute or changing which
+        objects are in its contents; arrays modified in-place are not
+        detected).
+
+        For a lazy Scene this is None, since its contents can only be
+        consumed once; the bounding box is instead computed while the Scene
+        is written, see iter_json_chunks().
+
+        :return: array [min, max] of shape (2, 3), or None if the Scene is
+        empty or lazy
+        """
+        if _is_lazy(self):
+            return None
+        key = _get_version(self)
+        cached = self.__dict__.get("_bounds")
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        all_bounds = [
+            item.bounding_box if isinstance(item, Scene) else _get_bounds(item)
+            for item in self.contents
+        ]
+        bounds = _combine_bounds(
+            [bounds for bounds in all_bounds if bounds is not None]
+        )
+
+        self.__dict__["_bounds"] = (key, bounds)
+        return bounds
+
+    @property
+    def content_hash(self):
+        """
+        A hash of everything in the Scene, see content_hash().
+
+        :return: hash as a hexadecimal string
+        """
+        return content_hash(self)
+
+    def get_primitives_near(self, point, distance):
+        """
+        Find geometry within a distance of a point, e.g. to find the atoms
+        near a point picked in the viewer. Scenes and primitives whose
+        bounding box is further away are skipped without looking at their
+        geometry.
+
+        :param point: position as (x, y, z)
+        :param distance: maximum distance from the point
+        :return: list of (primitive, indices) where indices are the indices
+        of the positions (or position pairs) of the primitive within distance
+        of the point
+        """
+        point = np.asarray(point, dtype=np.float64)
+        near = []
+
+        def is_near(bounds):
+            return bounds is not None and np.all(
+                (point >= bounds[0] - distance) & (point <= bounds[1] + distance)
+            )
+
+        def search(scene):
+            for item in scene.contents:
+                if isinstance(item, Scene):
+                    if is_near(item.bounding_box):
+                        search(item)
+                elif is_near(_get_bounds(item)):
+                    indices = np.flatnonzero(_get_distances(item, point) <= distance)
+                    if len(indices):
+                        near.append((item, indices))
+
+        if is_near(self.bounding_box):
+            search(self)
+
+        return near
+
+    def to_json(self, bounding_boxes=False, precision=None):
         """
         Convert a Scene into JSON. It will implicitly assume all None values means
         that that attribute uses its default value, and so will be removed from
@@ -37,128 +653,467 @@ class Scene:
         that can be converted to a JSON string using the standard library JSON
         encoder.
 
-        :param scene: A Scene object
+        :param bounding_boxes: if True, include the bounding box of every Scene
+        as "bbox", see Scene.bounding_box
+        :param precision: None to keep full precision, an integer number of
+        decimal places to round geometry to, or "int16" to quantize geometry
+        arrays to 16-bit integers relative to their bounding box
+        :return: dict in a format that can be parsed by Simple3DSceneComponent
+        """
+        return _serialize(
+            self._get_merged_scene(),
+            _get_array_encoder("json", precision),
+            bounding_boxes,
+        )
+
+    def to_binary(self, bounding_boxes=False, precision=None):
+        """
+        Convert a Scene into the compact typed-array encoding. This is the
+        same as to_json(), except that geometry arrays (positions,
+        positionPairs, normals, etc.) are sent as base64-encoded little-endian
+        Float32Array blocks instead of nested lists of floats, see
+        encode_typed_array(). Simple3DSceneComponent will load these straight
+        into BufferAttributes without parsing individual numbers.
+
+        :param bounding_boxes: if True, include the bounding box of every Scene
+        :param precision: see to_json(), "int16" sends Int16Array blocks
         :return: dict in a format that can be parsed by Simple3DSceneComponent
         """
+        return _serialize(
+            self._get_merged_scene(),
+            _get_array_encoder("binary", precision),
+            bounding_boxes,
+        )
+
+    def write_json(
+        self,
+        fp,
+        encoding="json",
+        bounding_boxes=False,
+        precision=None,
+        merge_size=MERGE_SIZE,
+    ):
+        """
+        Write a Scene as UTF-8 encoded JSON directly to a binary file-like
+        object, e.g. a file opened with "wb" or an io.BytesIO, without first
+        building the equivalent dict of to_json() or to_binary().
+
+        Primitives are merged while they are written, at most merge_size
+        instances at a time, so this also accepts Scenes whose contents are
+        generators (see Scene), holding at most merge_size instances per
+        material of the Scene being written in memory.
+
+        :param fp: binary file-like object
+        :param encoding: "json" for the format of to_json() or "binary" for
+        the format of to_binary()
+        :param bounding_boxes: if True, include the bounding box of every Scene
+        :param precision: see to_json()
+        :param merge_size: maximum number of instances (positions or position
+        pairs) in a merged primitive, or None for no limit
+        """
+        _write_json(
+            self,
+            fp.write,
+            _get_array_encoder(encoding, precision),
+            bounding_boxes,
+            merge_size,
+        )
+
+    def iter_json_chunks(
+        self,
+        encoding="json",
+        bounding_boxes=False,
+        precision=None,
+        merge_size=MERGE_SIZE,
+        chunk_size=65536,
+    ):
+        """
+        As write_json(), but yields the JSON bytes in chunks of around
+        chunk_size bytes as they are generated, e.g. for a streaming HTTP
+        response, so that the first chunk can be sent before the rest of the
+        Scene has been generated.
 
-        merged_scene = Scene(
-            name=self.name,
-            contents=self.merge_primitives(self.contents),
-            origin=self.origin,
+        :param chunk_size: minimum size of each chunk in bytes (except the
+        last)
+        :return: generator of bytes
+        """
+        pieces = []
+        size = 0
+        for piece in _iter_json(
+            self,
+            _get_array_encoder(encoding, precision),
+            bounding_boxes,
+            merge_size,
+        ):
+            pieces.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield b"".join(pieces)
+                pieces = []
+                size = 0
+        if pieces:
+            yield b"".join(pieces)
+
+    def to_json_bytes(self, encoding="json", bounding_boxes=False, precision=None):
+        """
+        :param encoding: "json" or "binary", see write_json()
+        :param bounding_boxes: if True, include the bounding box of every Scene
+        :param precision: see to_json()
+        :return: the Scene as UTF-8 encoded JSON bytes
+        """
+        buffer = BytesIO()
+        self.write_json(
+            buffer,
+            encoding=encoding,
+            bounding_boxes=bounding_boxes,
+            precision=precision,
+            merge_size=None,
         )
+        return buffer.getvalue()
 
-        def remove_defaults(scene_dict):
-            """
-            Reduce file size of JSON by removing any key which
-            is just its default value.
-            """
-            trimmed_dict = {}
-            for k, v in scene_dict.items():
-                if isinstance(v, dict):
-                    v = remove_defaults(v)
-                elif isinstance(v, list):
-                    trimmed_dict[k] = [
-                        remove_defaults(item) if isinstance(item, dict) else item
-                        for item in v
-                    ]
-                elif v is not None:
-                    trimmed_dict[k] = v
-            return trimmed_dict
-
-        return remove_defaults(asdict(merged_scene))
+    def _get_merged_scene(self):
+        return replace(self, contents=self.merge_primitives(self.contents))
 
     @staticmethod
     def merge_primitives(primitives):
         """
-        If primitives are of the same type but differ only in position, they
-        are merged together. This is a small optimization, has not been benchmarked.
+        If primitives are of the same type and share the same material, i.e.
+        they have the same value for every field other than their geometry
+        (color, radius, opacity, visibility, dash pattern etc.), they are merged
+        together by concatenating their geometry arrays. Per-instance
+        attributes, such as the ellipsoid rotations and scales of Spheres, are
+        concatenated alongside. Convex primitives are not merged, since the
+        shipped Simple3DScene would draw a single hull around all of them.
+
+        Every merged primitive is a single material (and, depending on the
+        primitive, a single mesh) in Simple3DScene, see
+        tests/benchmarks/merge_primitives.py for the effect on typical
+        structures.
+        :param primitives: list of primitives (Spheres, Cylinders, etc.)
+        :return: list of primitives
+        """
+        return [
+            replace(primitive, contents=Scene.merge_primitives(primitive.contents))
+            if isinstance(primitive, Scene)
+            else primitive
+            for primitive in Scene.iter_merged_primitives(primitives)
+        ]
+
+    @staticmethod
+    def iter_merged_primitives(primitives, max_size=None):
+        """
+        As merge_primitives(), but consumes primitives from any iterable
+        (e.g. a generator) and yields merged primitives as soon as they are
+        complete: once they reach max_size instances, and otherwise at the
+        end. Scenes and primitives that cannot be merged are yielded last,
+        as in merge_primitives(), and the contents of Scenes are not merged.
+
+        :param primitives: iterable of primitives (Spheres, Cylinders, etc.)
+        :param max_size: maximum number of instances (positions or position
+        pairs) in a merged primitive, or None for no limit
+        :return: generator of primitives
+        """
+        groups = {}
+        sizes = defaultdict(int)
+        remainder = []
+
+        for primitive in primitives:
+            if isinstance(primitive, (Scene, Convex)) or not hasattr(
+                primitive, "_array_fields"
+            ):
+                remainder.append(primitive)
+                continue
+            key = _material_key(primitive)
+            groups.setdefault(key, []).append(primitive)
+            if max_size is not None:
+                sizes[key] += len(getattr(primitive, primitive._array_fields[0]))
+                if sizes[key] >= max_size:
+                    yield _merge_group(groups.pop(key))
+                    del sizes[key]
+
+        for group in groups.values():
+            yield _merge_group(group)
+        yield from remainder
+
+    @staticmethod
+    def instance_primitives(primitives):
+        """
+        Convert Spheres and Cylinders into InstancedSpheres and
+        InstancedCylinders, which carry a color and radius per instance, so
+        that spheres (or cylinders) of any number of different colors and
+        radii are drawn by Simple3DScene with a single draw call.
+
+        Spheres drawn as sections (phiStart/phiEnd, used for disordered sites)
+        and primitives whose color is not a hexadecimal string are left as-is,
+        as are all other primitives.
         :param primitives: list of primitives (Spheres, Cylinders, etc.)
         :return: list of primitives
         """
-        spheres = defaultdict(list)
-        cylinders = defaultdict(list)
+        groups = defaultdict(list)
         remainder = []
 
         for primitive in primitives:
-            if isinstance(primitive, Scene):
-                primitive.contents = Scene.merge_primitives(primitive.contents)
+            if primitive.__class__ not in (Spheres, Cylinders) or not (
+                primitive.color is None or _is_hex_color(primitive.color)
+            ):
                 remainder.append(primitive)
             elif isinstance(primitive, Spheres):
-                key = f"{primitive.color}_{primitive.radius}_{primitive.phiStart}_{primitive.phiEnd}"
-                spheres[key].append(primitive)
-            elif isinstance(primitive, Cylinders):
-                key = f"{primitive.color}_{primitive.radius}"
-                cylinders[key].append(primitive)
+                if primitive.phiStart is not None or primitive.phiEnd is not None:
+                    remainder.append(primitive)
+                else:
+                    groups[(Spheres, primitive.visible)].append(
+                        InstancedSpheres(
+                            positions=primitive.positions,
+                            colors=_instance_colors(
+                                primitive, len(primitive.positions)
+                            ),
+                            radii=np.full(
+                                len(primitive.positions),
+                                1.0 if primitive.radius is None else primitive.radius,
+                            ),
+                            ellipsoids=primitive.ellipsoids,
+                            visible=primitive.visible,
+                        )
+                    )
             else:
-                remainder.append(primitive)
+                groups[(Cylinders, primitive.visible)].append(
+                    InstancedCylinders(
+                        positionPairs=primitive.positionPairs,
+                        colors=_instance_colors(
+                            primitive, len(primitive.positionPairs)
+                        ),
+                        radii=np.full(
+                            len(primitive.positionPairs),
+                            1.0 if primitive.radius is None else primitive.radius,
+                        ),
+                        visible=primitive.visible,
+                    )
+                )
 
-        new_spheres = []
-        for key, sphere_list in spheres.items():
-            new_positions = list(
-                chain.from_iterable([sphere.positions for sphere in sphere_list])
-            )
-            new_ellipsoids = None
-            has_ellipsoids = any(
+        return [_merge_group(group) for group in groups.values()] + remainder
+
+
+def _material_key(primitive):
+    """
+    Key for a primitive that is identical for all primitives that can be
+    merged: the primitive type, all non-geometry field values and which
+    (optional) geometry arrays are present.
+    """
+    material_fields, array_fields = _material_fields(type(primitive))
+    return (
+        type(primitive),
+        material_fields(primitive),
+        tuple(getattr(primitive, name) is None for name in array_fields),
+    )
+
+
+def _instance_colors(primitive, num_instances):
+    """
+    Per-instance colors for a primitive with a single color, with the default
+    color of Simple3DScene if no color is set.
+    """
+    rgb = _hex_to_rgb(primitive.color or "#52afb0")
+    return np.tile(rgb, (num_instances, 1))
+
+
+@lru_cache(maxsize=None)
+def _material_fields(cls):
+    """
+    Getter for the non-geometry fields of a primitive class, and the names of
+    its geometry fields, computed once per class.
+    """
+    material_fields = [
+        name
+        for name in _field_names(cls)
+        if name not in cls._array_fields + cls._instance_fields + ("_meta",)
+    ]
+    return attrgetter(*material_fields), cls._array_fields
+
+
+def _merge_group(group):
+    """
+    Merge a list of primitives with the same _material_key into one.
+    """
+    if len(group) == 1:
+        return group[0]
+
+    first = group[0]
+    merged = {
+        name: np.concatenate([getattr(primitive, name) for primitive in group])
+        for name in first._array_fields
+        if getattr(first, name) is not None
+    }
+
+    if isinstance(first, (Spheres, InstancedSpheres)) and any(
+        sphere.ellipsoids for sphere in group
+    ):
+        # spheres without ellipsoids are given the identity transform,
+        # i.e. no rotation away from (0, 0, 1) and unit scale, and if any
+        # rotations are quaternions all rotations are converted to quaternions
+        rotations = [
+            sphere.ellipsoids["rotations"]
+            if sphere.ellipsoids
+            else np.tile((0, 0, 1), (len(sphere.positions), 1))
+            for sphere in group
+        ]
+        if any(r.shape[1] == 4 for r in rotations):
+            rotations = [
+                r if r.shape[1] == 4 else _quaternions_from_z(r) for r in rotations
+            ]
+        merged["ellipsoids"] = {
+            "rotations": np.concatenate(rotations),
+            "scales": np.concatenate(
                 [
-                    sphere.ellipsoids["rotations"] if sphere.ellipsoids else None
-                    for sphere in sphere_list
+                    sphere.ellipsoids["scales"]
+                    if sphere.ellipsoids
+                    else np.ones((len(sphere.positions), 3))
+                    for sphere in group
                 ]
-            )
-            if has_ellipsoids:
-                warn("Merging of ellipsoids doesn't work yet.")
-                # TODO: should re-think how ellipsoids are stored, dict format is awkward
-            # new_ellipsoids_rotations = list(
-            #    chain.from_iterable(
-            #        [
-            #            sphere.ellipsoids["rotations"] if sphere.ellipsoids else None
-            #            for sphere in sphere_list
-            #        ]
-            #    )
-            # )
-            # new_ellipsoids_scales = list(
-            #    chain.from_iterable(
-            #        [
-            #            sphere.ellipsoids["scales"] if sphere.ellipsoids else None
-            #            for sphere in sphere_list
-            #        ]
-            #    )
-            # )
-            # if any(new_ellipsoids_rotations):
-            #    new_ellipsoids = {
-            #        "rotations": new_ellipsoids_rotations,
-            #        "scales": new_ellipsoids_scales,
-            #    }
-            # else:
-            #    new_ellipsoids = None
-            new_spheres.append(
-                Spheres(
-                    positions=new_positions,
-                    color=sphere_list[0].color,
-                    radius=sphere_list[0].radius,
-                    phiStart=sphere_list[0].phiStart,
-                    phiEnd=sphere_list[0].phiEnd,
-                    ellipsoids=new_ellipsoids,
-                    visible=sphere_list[0].visible,
-                )
-            )
+            ),
+        }
 
-        new_cylinders = []
-        for key, cylinder_list in cylinders.items():
-            new_positionPairs = list(
-                chain.from_iterable(
-                    [cylinder.positionPairs for cylinder in cylinder_list]
-                )
-            )
-            new_cylinders.append(
-                Cylinders(
-                    positionPairs=new_positionPairs,
-                    color=cylinder_list[0].color,
-                    radius=cylinder_list[0].radius,
-                    visible=cylinder_list[0].visible,
-                )
-            )
+    return replace(first, _meta=None, **merged)
+
+
+def _decode_arrays_json(value):
+    """
+    Replace the typed arrays (and quantized arrays) in serialized data by
+    nested lists, see decode_typed_array().
+    """
+    if isinstance(value, dict):
+        if "shape" in value and ("typedArray" in value or "values" in value):
+            return decode_typed_array(value).tolist()
+        return {k: _decode_arrays_json(v) for k, v in value.items()}
+    return value
 
-        return new_spheres + new_cylinders + remainder
+
+def split_instanced_json(primitive_json):
+    """
+    Split a serialized InstancedSpheres or InstancedCylinders (as given by
+    Scene.to_json() or Scene.to_binary(), at any precision) into the
+    equivalent list of serialized Spheres or Cylinders, one per distinct
+    color and radius, for renderers that do not support per-instance colors
+    and radii. Any other primitive is returned as-is. Typed arrays are
+    decoded to lists, for renderers that do not support them either.
+
+    :param primitive_json: serialized primitive
+    :return: list of serialized primitives
+    """
+    primitive_json = _decode_arrays_json(primitive_json)
+
+    if primitive_json["type"] == "instancedSpheres":
+        type, geometry_field = "spheres", "positions"
+    elif primitive_json["type"] == "instancedCylinders":
+        type, geometry_field = "cylinders", "positionPairs"
+    else:
+        return [primitive_json]
+
+    num_instances = len(primitive_json[geometry_field])
+    colors = primitive_json.get("colors", [None] * num_instances)
+    radii = primitive_json.get("radii", [None] * num_instances)
+
+    groups = defaultdict(list)
+    for idx, (color, radius) in enumerate(zip(colors, radii)):
+        if color is not None:
+            color = "#" + "".join(f"{round(c * 255):02x}" for c in color)
+        groups[(color, radius)].append(idx)
+
+    split = []
+    for (color, radius), indices in groups.items():
+        primitive = {
+            "type": type,
+            geometry_field: [primitive_json[geometry_field][idx] for idx in indices],
+            "color": color,
+            "radius": radius,
+            "visible": primitive_json.get("visible"),
+        }
+        if "ellipsoids" in primitive_json:
+            primitive["ellipsoids"] = {
+                k: [v[idx] for idx in indices]
+                for k, v in primitive_json["ellipsoids"].items()
+            }
+        split.append({k: v for k, v in primitive.items() if v is not None})
+
+    return split
+
+
+def diff_scene_json(old_scene_json, new_scene_json):
+    """
+    Compute a patch that transforms one serialized Scene (as returned by
+    Scene.to_json() or Scene.to_binary()) into another, so that only the
+    parts of a scene that have changed need to be sent to
+    Simple3DSceneComponent, which will apply the patch in place.
+
+    Nodes (i.e. Scenes) are identified by the path of names from the root
+    Scene. A node is "changed" if anything other than its child Scenes differs
+    (e.g. its primitives), in which case it is replaced as a whole, otherwise
+    its children are compared in turn. Nodes with non-unique names cannot be
+    identified, so if a node has children with duplicate names, it is replaced
+    as a whole too.
+
+    The patch has the format:
+    {"patch": True, "name": name of the root Scene,
+     "base": "hash" of the old Scene, "hash": "hash" of the new Scene,
+     "added": [{"path": path to parent, "node": serialized Scene}, ...],
+     "removed": [path, ...],
+     "changed": [{"path": path, "node": serialized Scene}, ...]}
+    where the hashes are taken from the serialized Scenes, if present, so
+    that a patch is only applied to the Scene it was computed from.
+
+    :param old_scene_json: serialized Scene currently displayed
+    :param new_scene_json: serialized Scene to display
+    :return: patch, or None if the root Scene itself differs and the new
+    Scene has to be sent in full
+    """
+
+    def own_contents(node):
+        # bounding boxes and hashes change with any of the contents, so are
+        # not compared
+        return (
+            {k: v for k, v in node.items() if k not in ("contents", "bbox", "hash")},
+            [item for item in node.get("contents", []) if "type" in item],
+        )
+
+    def child_scenes(node):
+        children = [item for item in node.get("contents", []) if "type" not in item]
+        names = [child["name"] for child in children]
+        if len(set(names)) != len(names):
+            return None
+        return dict(zip(names, children))
+
+    def diff(old_node, new_node, path):
+        old_children, new_children = child_scenes(old_node), child_scenes(new_node)
+        if (
+            own_contents(old_node) != own_contents(new_node)
+            or old_children is None
+            or new_children is None
+        ):
+            return False
+        for name, child in old_children.items():
+            if name not in new_children:
+                patch["removed"].append(path + [name])
+        for name, child in new_children.items():
+            if name not in old_children:
+                patch["added"].append({"path": path, "node": child})
+            elif child != old_children[name]:
+                if not diff(old_children[name], child, path + [name]):
+                    patch["changed"].append({"path": path + [name], "node": child})
+        return True
+
+    patch = {
+        "patch": True,
+        "name": new_scene_json["name"],
+        "base": old_scene_json.get("hash"),
+        "hash": new_scene_json.get("hash"),
+        "added": [],
+        "removed": [],
+        "changed": [],
+    }
+
+    if not diff(old_scene_json, new_scene_json, []):
+        return None
+
+    return patch
 
 
 @dataclass
@@ -166,8 +1121,8 @@ class Spheres:
     """
     Create a set of spheres. All spheres will have the same color, radius and
     segment size (if only drawing a section of a sphere).
-    :param positions: This is a list of lists corresponding to the vector
-    positions of the spheres.
+    :param positions: This is a list of lists (or an array of shape (n, 3))
+    corresponding to the vector positions of the spheres.
     :param color: Sphere color as a hexadecimal string, e.g. #ff0000
     :param radius: The radius of the sphere, defaults to 1.
     :param phiStart: Start angle in radians if drawing only a section of the
@@ -180,67 +1135,170 @@ class Spheres:
     ellipsoid major axis to align with, and scales refers to the vector to scale
     the ellipsoid by along x, y and z. The dictionary values should be lists of
     lists of the same length as positions, corresponding to a unique
-    rotation/scale for each sphere.
+    rotation/scale for each sphere. Rotations can instead be given as unit
+    quaternions (x, y, z, w), which fix the orientation of all three axes,
+    e.g. for thermal ellipsoids.
     :param visible: If False, will hide the object by default.
     """
 
-    positions: List[List[float]]
+    positions: Union[np.ndarray, List[List[float]]]
     color: Optional[str] = None
     radius: Optional[float] = None
     phiStart: Optional[float] = None
     phiEnd: Optional[float] = None
-    ellipsoids: Optional[Dict[str, List[List[float]]]] = None
+    ellipsoids: Optional[Dict[str, Union[np.ndarray, List[List[float]]]]] = None
     type: str = field(default="spheres", init=False)  # private field
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positions",)
+    _instance_fields = ("ellipsoids",)
+
+    def __post_init__(self):
+        self.positions = _as_vectors(self.positions)
+        self.ellipsoids = _as_ellipsoids(self.ellipsoids)
+
 
 @dataclass
 class Cylinders:
     """
     Create a set of cylinders. All cylinders will have the same color and
     radius.
-    :param positionPairs: This is a list of pairs of lists corresponding to the
-    start and end position of the cylinder.
+    :param positionPairs: This is a list of pairs of lists (or an array of
+    shape (n, 2, 3)) corresponding to the start and end position of the
+    cylinder.
     :param color: Cylinder color as a hexadecimal string, e.g. #ff0000
     :param radius: The radius of the cylinder, defaults to 1.
     :param visible: If False, will hide the object by default.
     """
 
-    positionPairs: List[List[List[float]]]
+    positionPairs: Union[np.ndarray, List[List[List[float]]]]
     color: Optional[str] = None
     radius: Optional[float] = None
     type: str = field(default="cylinders", init=False)  # private field
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positionPairs",)
+    _instance_fields = ()
+
+    def __post_init__(self):
+        self.positionPairs = _as_vectors(self.positionPairs, shape=(2, 3))
+
+
+@dataclass
+class InstancedSpheres:
+    """
+    Create a set of spheres where every sphere can have its own color and
+    radius. These are drawn by Simple3DScene as a single mesh (using
+    THREE.InstancedMesh where available), so are preferred over many Spheres
+    for large structures, see Scene.instance_primitives().
+    :param positions: This is a list of lists (or an array of shape (n, 3))
+    corresponding to the vector positions of the spheres.
+    :param colors: Sphere colors, either a list of hexadecimal strings or a
+    list of lists (or an array of shape (n, 3)) of RGB values between 0 and 1.
+    Defaults to the same color for all spheres.
+    :param radii: Sphere radii as a list (or an array of shape (n,)), defaults
+    to 1 for all spheres.
+    :param ellipsoids: Any distortions to apply to the spheres to display
+    ellipsoids, in the same format as for Spheres.
+    :param visible: If False, will hide the object by default.
+    """
+
+    positions: Union[np.ndarray, List[List[float]]]
+    colors: Optional[Union[np.ndarray, List[str], List[List[float]]]] = None
+    radii: Optional[Union[np.ndarray, List[float]]] = None
+    ellipsoids: Optional[Dict[str, Union[np.ndarray, List[List[float]]]]] = None
+    type: str = field(default="instancedSpheres", init=False)  # private field
+    visible: bool = None
+    _meta: Any = None
+
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positions", "colors", "radii")
+    _instance_fields = ("ellipsoids",)
+
+    def __post_init__(self):
+        self.positions = _as_vectors(self.positions)
+        self.colors = _as_colors(self.colors)
+        if self.radii is not None:
+            self.radii = np.ascontiguousarray(self.radii, dtype=np.float64)
+        self.ellipsoids = _as_ellipsoids(self.ellipsoids)
+
+
+@dataclass
+class InstancedCylinders:
+    """
+    Create a set of cylinders where every cylinder can have its own color and
+    radius, drawn by Simple3DScene as a single mesh, see InstancedSpheres.
+    :param positionPairs: This is a list of pairs of lists (or an array of
+    shape (n, 2, 3)) corresponding to the start and end position of the
+    cylinder.
+    :param colors: Cylinder colors, either a list of hexadecimal strings or a
+    list of lists (or an array of shape (n, 3)) of RGB values between 0 and 1.
+    Defaults to the same color for all cylinders.
+    :param radii: Cylinder radii as a list (or an array of shape (n,)),
+    defaults to 1 for all cylinders.
+    :param visible: If False, will hide the object by default.
+    """
+
+    positionPairs: Union[np.ndarray, List[List[List[float]]]]
+    colors: Optional[Union[np.ndarray, List[str], List[List[float]]]] = None
+    radii: Optional[Union[np.ndarray, List[float]]] = None
+    type: str = field(default="instancedCylinders", init=False)  # private field
+    visible: bool = None
+    _meta: Any = None
+
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positionPairs", "colors", "radii")
+    _instance_fields = ()
+
+    def __post_init__(self):
+        self.positionPairs = _as_vectors(self.positionPairs, shape=(2, 3))
+        self.colors = _as_colors(self.colors)
+        if self.radii is not None:
+            self.radii = np.ascontiguousarray(self.radii, dtype=np.float64)
+
 
 @dataclass
 class Cubes:
     """
     Create a set of cubes. All cubes will have the same color and width.
-    :param positions: This is a list of lists corresponding to the vector
-    positions of the cubes.
+    :param positions: This is a list of lists (or an array of shape (n, 3))
+    corresponding to the vector positions of the cubes.
     :param color: Cube color as a hexadecimal string, e.g. #ff0000
     :param width: The width of the cube, defaults to 1.
     :param visible: If False, will hide the object by default.
     """
 
-    positions: List[List[float]]
+    positions: Union[np.ndarray, List[List[float]]]
     color: Optional[str] = None
     width: Optional[float] = None
     type: str = field(default="cubes", init=False)  # private field
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positions",)
+    _instance_fields = ()
+
+    def __post_init__(self):
+        self.positions = _as_vectors(self.positions)
+
 
 @dataclass
 class Lines:
     """
     Create a set of lines. All lines will have the same color, thickness and
     (optional) dashes.
-    :param positions: This is a list of lists corresponding to the positions of
-    the lines. Each consecutive pair of vectors corresponds to the start and end
+    :param positions: This is a list of lists (or an array of shape (n, 3))
+    corresponding to the positions of the lines. Each consecutive pair of vectors corresponds to the start and end
     position of a line segment (line segments do not have to be joined
     together).
     :param color: Line color as a hexadecimal string, e.g. #ff0000
@@ -251,7 +1309,7 @@ class Lines:
     :param visible: If False, will hide the object by default.
     """
 
-    positions: List[List[float]]
+    positions: Union[np.ndarray, List[List[float]]]
     color: str = None
     lineWidth: float = None
     scale: float = None
@@ -261,6 +1319,14 @@ class Lines:
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positions",)
+    _instance_fields = ()
+
+    def __post_init__(self):
+        self.positions = _as_vectors(self.positions)
+
 
 @dataclass
 class Surface:
@@ -270,14 +1336,24 @@ class Surface:
     Three.js renderer doesn't support nested transparent objects very well.
     """
 
-    positions: List[List[float]]
-    normals: Optional[List[List[float]]] = None
+    positions: Union[np.ndarray, List[List[float]]]
+    normals: Optional[Union[np.ndarray, List[List[float]]]] = None
     color: str = None
     opacity: float = None
     type: str = field(default="surface", init=False)  # private field
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positions", "normals")
+    _instance_fields = ()
+
+    def __post_init__(self):
+        self.positions = _as_vectors(self.positions)
+        if self.normals is not None:
+            self.normals = _as_vectors(self.normals)
+
 
 @dataclass
 class Convex:
@@ -287,15 +1363,31 @@ class Convex:
     the QuickHull algorithm. Opacity can be set to enable transparency, but note
     that the current Three.js renderer doesn't support nested transparent
     objects very well.
+    :param hullSizes: Optional, to draw several convex hulls with the same
+    material, positions can hold the concatenated points of each hull, and
+    hullSizes the number of points belonging to each hull in turn. This needs
+    a build of Simple3DSceneComponent that supports it, otherwise a single
+    hull is drawn around all positions.
     """
 
-    positions: List[List[float]]
+    positions: Union[np.ndarray, List[List[float]]]
     color: str = None
     opacity: float = None
+    hullSizes: Optional[Union[np.ndarray, List[int]]] = None
     type: str = field(default="convex", init=False)  # private field
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positions",)
+    _instance_fields = ("hullSizes",)
+
+    def __post_init__(self):
+        self.positions = _as_vectors(self.positions)
+        if self.hullSizes is not None:
+            self.hullSizes = np.asarray(self.hullSizes, dtype=int)
+
 
 @dataclass
 class Arrows:
@@ -309,7 +1401,7 @@ class Arrows:
     :param visible: If False, will hide the object by default.
     """
 
-    positionPairs: List[List[List[float]]]
+    positionPairs: Union[np.ndarray, List[List[List[float]]]]
     color: Optional[str] = None
     radius: Optional[float] = None
     headLength: Optional[float] = None
@@ -318,6 +1410,14 @@ class Arrows:
     visible: bool = None
     _meta: Any = None
 
+    __setattr__ = _setattr_invalidating_caches
+
+    _array_fields = ("positionPairs",)
+    _instance_fields = ()
+
+    def __post_init__(self):
+        self.positionPairs = _as_vectors(self.positionPairs, shape=(2, 3))
+
 
 # class VolumetricData:
 #
@@ -366,8 +1466,13 @@ class Plottable3D(ABC):
         This is useful for quick and easy plotting of
         a 3D scene, but for higher-quality publication
         quality plots we recommend other options.
+
+        :return: plotly.graph_objs.Figure
         """
+        from crystal_toolkit.helpers.plotly_renderer import get_plotly_figure
+
         scene = self.get_scene(**kwargs)
+        return get_plotly_figure(scene)
 
     def get_scene_asymptote(self, **kwargs):
         """
@@ -4,6 +4,7 @@ For creating publication quality plots
 """
 from jinja2 import Environment
 from crystal_toolkit.components.structure import StructureMoleculeComponent
+from crystal_toolkit.core.scene import split_instanced_json
 
 HEAD = """
 size(300);
@@ -132,7 +133,8 @@ def filter_data(scene_data, fstream):
     Recursively traverse the scene_data dictionary to find objects to draw
     """
     if "type" in scene_data.keys():
-        asy_write_data(scene_data, fstream)
+        for primitive in split_instanced_json(scene_data):
+            asy_write_data(primitive, fstream)
     else:
         for itr in scene_data["contents"]:
             filter_data(itr, fstream)
@@ -0,0 +1,401 @@
+"""
+Export a Scene to Plotly, for quick plots e.g. in notebooks or reports
+
+All spheres, cylinders, cubes and surfaces that share a material are
+tessellated together (vectorized over all instances) into a single Mesh3d
+trace, and all lines of the same color into a single Scatter3d trace, so a
+structure gives a handful of traces regardless of its size.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import plotly.graph_objs as go
+from scipy.spatial import ConvexHull
+from scipy.spatial.transform import Rotation
+
+from crystal_toolkit.core.scene import (
+    Scene,
+    Spheres,
+    InstancedSpheres,
+    Cylinders,
+    InstancedCylinders,
+    Arrows,
+    Cubes,
+    Lines,
+    Surface,
+    Convex,
+)
+
+# defaults of Simple3DScene, so that plots look similar to the web viewer
+DEFAULT_COLOR = "#52afb0"
+DEFAULT_SURFACE_OPACITY = 0.5
+
+
+def get_plotly_figure(scene, sphere_segments=16, cylinder_segments=8, **kwargs):
+    """
+    Create a Plotly figure from a Scene.
+
+    :param scene: Scene
+    :param sphere_segments: number of segments around each sphere
+    :param cylinder_segments: number of segments around each cylinder
+    :param kwargs: passed to get_plotly_traces()
+    :return: plotly.graph_objs.Figure
+    """
+    traces = get_plotly_traces(
+        scene,
+        sphere_segments=sphere_segments,
+        cylinder_segments=cylinder_segments,
+        **kwargs,
+    )
+    axis = dict(visible=False, showgrid=False, zeroline=False)
+    layout = go.Layout(
+        scene=dict(xaxis=axis, yaxis=axis, zaxis=axis, aspectmode="data"),
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+def get_plotly_traces(
+    scene, sphere_segments=16, cylinder_segments=8, cylinder_scale=0.1
+):
+    """
+    Create Plotly traces from a Scene, one Mesh3d trace per material (color
+    and opacity) and one Scatter3d trace per line color. Primitives that are
+    hidden by default are not drawn.
+
+    :param scene: Scene
+    :param sphere_segments: number of segments around each sphere
+    :param cylinder_segments: number of segments around each cylinder
+    :param cylinder_scale: scale factor for cylinder radii, as in the
+    cylinderScale setting of Simple3DScene
+    :return: list of Plotly traces
+    """
+
+    meshes = defaultdict(_MeshBuilder)
+    lines = defaultdict(list)
+
+    sphere = _get_unit_sphere(sphere_segments)
+    cylinder = _get_unit_cylinder(cylinder_segments)
+    cone = _get_unit_cylinder(cylinder_segments, top_radius=0)
+
+    def add_primitives(primitives):
+        for primitive in primitives:
+            if isinstance(primitive, Scene):
+                add_primitives(primitive.contents)
+                continue
+            if primitive.visible is False:
+                continue
+
+            if isinstance(primitive, (Spheres, InstancedSpheres)):
+                _add_spheres(meshes, primitive, sphere)
+            elif isinstance(primitive, (Cylinders, InstancedCylinders)):
+                _add_cylinders(meshes, primitive, cylinder, cylinder_scale)
+            elif isinstance(primitive, Arrows):
+                _add_arrows(meshes, primitive, cylinder, cone, cylinder_scale)
+            elif isinstance(primitive, Cubes):
+                _add_cubes(meshes, primitive)
+            elif isinstance(primitive, (Surface, Convex)):
+                _add_surface(meshes, primitive)
+            elif isinstance(primitive, Lines) and len(primitive.positions):
+                lines[primitive.color or DEFAULT_COLOR].append(primitive.positions)
+
+    # merging first means every material is tessellated in one go
+    add_primitives([scene._get_merged_scene()])
+
+    traces = [mesh.get_trace(*material) for material, mesh in meshes.items()]
+
+    for color, all_positions in lines.items():
+        # line segments are separated by NaN so that each color is one trace
+        positions = np.concatenate(all_positions).reshape(-1, 2, 3)
+        separators = np.full((len(positions), 1, 3), np.nan)
+        x, y, z = np.concatenate([positions, separators], axis=1).reshape(-1, 3).T
+        traces.append(
+            go.Scatter3d(
+                x=x,
+                y=y,
+                z=z,
+                mode="lines",
+                line=dict(color=color),
+                hoverinfo="skip",
+            )
+        )
+
+    return traces
+
+
+class _MeshBuilder:
+    """
+    Accumulates vertices and triangles for a single Mesh3d trace.
+    """
+
+    def __init__(self):
+        self.vertices = []
+        self.triangles = []
+        self.num_vertices = 0
+
+    def add(self, vertices, triangles):
+        """
+        :param vertices: array of shape (n, 3)
+        :param triangles: array of shape (m, 3) of indices into vertices
+        """
+        self.vertices.append(vertices)
+        self.triangles.append(triangles + self.num_vertices)
+        self.num_vertices += len(vertices)
+
+    def get_trace(self, color, opacity):
+        x, y, z = np.concatenate(self.vertices).T
+        i, j, k = np.concatenate(self.triangles).T
+        return go.Mesh3d(
+            x=x,
+            y=y,
+            z=z,
+            i=i,
+            j=j,
+            k=k,
+            color=color,
+            opacity=opacity,
+            hoverinfo="skip",
+        )
+
+
+def _get_unit_sphere(segments):
+    """
+    Vertices and triangles of a sphere of radius 1 centered on the origin.
+    """
+    theta = np.linspace(0, np.pi, segments // 2 + 1)
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    vertices = np.stack(
+        [np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)],
+        axis=-1,
+    ).reshape(-1, 3)
+
+    rows, cols = np.meshgrid(
+        np.arange(segments // 2), np.arange(segments), indexing="ij"
+    )
+    a = rows * segments + cols
+    b = rows * segments + (cols + 1) % segments
+    c = a + segments
+    d = b + segments
+    triangles = np.concatenate(
+        [np.stack([a, c, b], axis=-1), np.stack([b, c, d], axis=-1)]
+    ).reshape(-1, 3)
+
+    return vertices, triangles
+
+
+def _get_unit_cylinder(segments, top_radius=1):
+    """
+    Vertices and triangles of the side of a cylinder (or cone, if top_radius
+    is 0) of radius 1 along z, from z=0 to z=1.
+    """
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    circle = np.stack([np.cos(phi), np.sin(phi), np.zeros(segments)], axis=-1)
+    vertices = np.concatenate([circle, circle * top_radius + [0, 0, 1]])
+
+    a = np.arange(segments)
+    b = (a + 1) % segments
+    triangles = np.concatenate(
+        [
+            np.stack([a, b, a + segments], axis=-1),
+            np.stack([b, b + segments, a + segments], axis=-1),
+        ]
+    )
+
+    return vertices, triangles
+
+
+def _get_rotations_from_z(directions):
+    """
+    Rotation matrices that rotate (0, 0, 1) onto each direction, the same
+    convention as used by Simple3DScene for ellipsoids.
+
+    :param directions: array of shape (n, 3), need not be normalized
+    :return: array of shape (n, 3, 3)
+    """
+    norms = np.linalg.norm(directions, axis=1, keepdims=True)
+    directions = directions / np.where(norms > 0, norms, 1)
+    # Rodrigues' formula for the rotation of z onto b: I + [v]x + [v]x^2 / (1 + c)
+    # with v = z x b and c = z . b
+    v = np.stack(
+        [-directions[:, 1], directions[:, 0], np.zeros(len(directions))], axis=-1
+    )
+    c = directions[:, 2]
+    skew = np.zeros((len(directions), 3, 3))
+    skew[:, 0, 1], skew[:, 0, 2] = -v[:, 2], v[:, 1]
+    skew[:, 1, 0], skew[:, 1, 2] = v[:, 2], -v[:, 0]
+    skew[:, 2, 0], skew[:, 2, 1] = -v[:, 1], v[:, 0]
+    antiparallel = np.isclose(c, -1)
+    factor = 1 / np.where(antiparallel, 1, 1 + c)
+    rotations = np.eye(3) + skew + skew @ skew * factor[:, np.newaxis, np.newaxis]
+    # rotate by pi about x if the direction is -z
+    rotations[antiparallel] = np.diag([1.0, -1.0, -1.0])
+    return rotations
+
+
+def _add_instances(meshes, primitive, unit_mesh, transforms, offsets):
+    """
+    Add one transformed copy of unit_mesh per instance of a primitive to the
+    mesh for its material. Instances of primitives with per-instance colors
+    are added to the mesh for their own color.
+
+    :param transforms: array of shape (n, 3, 3), linear transform for every
+    instance
+    :param offsets: array of shape (n, 3), translation for every instance
+    """
+    unit_vertices, unit_triangles = unit_mesh
+    if not len(offsets):
+        return
+
+    colors = getattr(primitive, "colors", None)
+    if colors is None:
+        groups = [(primitive.color or DEFAULT_COLOR, slice(None))]
+    else:
+        unique_colors, inverse = np.unique(
+            np.round(colors * 255).astype(int), axis=0, return_inverse=True
+        )
+        groups = [
+            ("#{:02x}{:02x}{:02x}".format(*rgb), inverse.ravel() == idx)
+            for idx, rgb in enumerate(unique_colors.tolist())
+        ]
+
+    for color, instances in groups:
+        vertices = np.einsum("nij,vj->nvi", transforms[instances], unit_vertices)
+        vertices += offsets[instances][:, np.newaxis, :]
+        num_instances = len(vertices)
+        triangles = (
+            unit_triangles[np.newaxis, :, :]
+            + (np.arange(num_instances) * len(unit_vertices))[:, np.newaxis, np.newaxis]
+        )
+        meshes[(color, 1.0)].add(vertices.reshape(-1, 3), triangles.reshape(-1, 3))
+
+
+def _add_spheres(meshes, primitive, sphere):
+
+    positions = primitive.positions
+    if isinstance(primitive, InstancedSpheres):
+        radii = np.ones(len(positions)) if primitive.radii is None else primitive.radii
+    else:
+        radii = np.full(len(positions), primitive.radius or 1.0)
+
+    scales = radii[:, np.newaxis] * np.ones((len(positions), 3))
+    if primitive.ellipsoids:
+        scales = scales * primitive.ellipsoids["scales"]
+        rotations = primitive.ellipsoids["rotations"]
+        if rotations.shape[1] == 4:
+            rotations = Rotation.from_quat(rotations).as_matrix()
+        else:
+            rotations = _get_rotations_from_z(rotations)
+    else:
+        rotations = np.broadcast_to(np.eye(3), (len(positions), 3, 3))
+    # scale first, then rotate
+    transforms = rotations * scales[:, np.newaxis, :]
+
+    _add_instances(meshes, primitive, sphere, transforms, positions)
+
+
+def _get_segment_transforms(position_pairs, radii, lengths=None):
+    """
+    Transforms to map a unit cylinder along z onto each position pair.
+    """
+    starts, ends = position_pairs[:, 0], position_pairs[:, 1]
+    directions = ends - starts
+    if lengths is None:
+        lengths = np.linalg.norm(directions, axis=1)
+    scales = np.stack([radii, radii, lengths], axis=-1)
+    return _get_rotations_from_z(directions) * scales[:, np.newaxis, :], starts
+
+
+def _add_cylinders(meshes, primitive, cylinder, cylinder_scale):
+
+    position_pairs = primitive.positionPairs
+    if isinstance(primitive, InstancedCylinders):
+        radii = (
+            np.ones(len(position_pairs)) if primitive.radii is None else primitive.radii
+        )
+    else:
+        radii = np.full(len(position_pairs), primitive.radius or 1.0)
+
+    transforms, offsets = _get_segment_transforms(
+        position_pairs, radii * cylinder_scale
+    )
+    _add_instances(meshes, primitive, cylinder, transforms, offsets)
+
+
+def _add_arrows(meshes, primitive, cylinder, cone, cylinder_scale):
+
+    position_pairs = primitive.positionPairs
+    radius = (primitive.radius or 1.0) * cylinder_scale
+    head_length = (primitive.headLength or 2.0) * cylinder_scale
+    head_width = (primitive.headWidth or 2.0) * cylinder_scale
+
+    starts, ends = position_pairs[:, 0], position_pairs[:, 1]
+    lengths = np.linalg.norm(ends - starts, axis=1)
+    directions = (ends - starts) / np.where(lengths > 0, lengths, 1)[:, np.newaxis]
+    shaft_lengths = np.maximum(lengths - head_length, 0)
+    head_starts = starts + directions * shaft_lengths[:, np.newaxis]
+
+    transforms, offsets = _get_segment_transforms(
+        position_pairs, np.full(len(starts), radius), shaft_lengths
+    )
+    _add_instances(meshes, primitive, cylinder, transforms, offsets)
+    transforms, offsets = _get_segment_transforms(
+        np.stack([head_starts, ends], axis=1),
+        np.full(len(starts), head_width),
+        lengths - shaft_lengths,
+    )
+    _add_instances(meshes, primitive, cone, transforms, offsets)
+
+
+def _add_cubes(meshes, primitive):
+
+    corners = np.array(
+        [[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)]
+    )
+    # two triangles per face, indices into corners
+    # fmt: off
+    triangles = np.array(
+        [
+            [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],
+            [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],
+            [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],
+        ]
+    )
+    # fmt: on
+
+    num_cubes = len(primitive.positions)
+    transforms = np.broadcast_to(
+        np.eye(3) * (primitive.width or 1.0), (num_cubes, 3, 3)
+    )
+    _add_instances(
+        meshes, primitive, (corners, triangles), transforms, primitive.positions
+    )
+
+
+def _add_surface(meshes, primitive):
+
+    material = (
+        primitive.color or DEFAULT_COLOR,
+        primitive.opacity or DEFAULT_SURFACE_OPACITY,
+    )
+
+    if isinstance(primitive, Surface):
+        # every three positions are the vertices of a triangle
+        vertices = primitive.positions
+        meshes[material].add(vertices, np.arange(len(vertices)).reshape(-1, 3))
+        return
+
+    hull_sizes = primitive.hullSizes
+    if hull_sizes is None:
+        hull_sizes = [len(primitive.positions)]
+    for points in np.split(primitive.positions, np.cumsum(hull_sizes)[:-1]):
+        if len(points) < 4:
+            continue
+        try:
+            hull = ConvexHull(points)
+        except Exception:
+            # e.g. if all points are co-planar
+            continue
+        meshes[material].add(points, hull.simplices)
@@ -20,6 +20,7 @@ from pythreejs import (
     DirectionalLight,
 )
 from crystal_toolkit.components.structure import StructureMoleculeComponent
+from crystal_toolkit.core.scene import split_instanced_json
 from IPython.display import display
 from scipy.spatial.transform import Rotation as R
 import numpy as np
@@ -40,7 +41,8 @@ def traverse_scene_object(scene_data, parent=None):
     """
     for sub_object in scene_data["contents"]:
         if "type" in sub_object.keys():
-            parent.add(convert_object_to_pythreejs(sub_object))
+            for primitive in split_instanced_json(sub_object):
+                parent.add(convert_object_to_pythreejs(primitive))
         else:
             new_parent = Object3D(name=sub_object["name"])
             if parent is None:
@@ -0,0 +1,137 @@
+import numpy as np
+from pymatgen.analysis.graphs import MoleculeGraph
+
+from crystal_toolkit.core.local_env import KDTreeNN
+from crystal_toolkit.core.scene import Scene, Cylinders
+from crystal_toolkit.renderables.sitecollection import (
+    _get_site_colors,
+    _iter_atoms as _iter_site_atoms,
+)
+
+
+def get_covalent_bonds(molecule, tolerance=0.45):
+    """
+    Find bonds between all pairs of sites closer than the sum of their
+    covalent radii plus a tolerance, using a KD-tree so that this scales to
+    molecules of 100k sites (e.g. proteins or clusters), where the
+    NearNeighbors strategies in pymatgen.analysis.local_env are too slow,
+    see KDTreeNN.
+
+    :param molecule: Molecule
+    :param tolerance: tolerance in Å added to the sum of covalent radii
+    :return: indices of the sites at either end of each bond, of shape (n, 2)
+    with the lower index first, and the bond lengths of shape (n,)
+    """
+
+    sites, neighbors, _, distances = KDTreeNN(tolerance=tolerance).get_neighbors(
+        molecule
+    )
+    # each bond is found from both of its sites
+    first = sites < neighbors
+
+    return np.stack([sites[first], neighbors[first]], axis=1), distances[first]
+
+
+def get_covalent_bond_graph(molecule, tolerance=0.45):
+    """
+    A MoleculeGraph with the bonds found by get_covalent_bonds().
+
+    :param molecule: Molecule
+    :param tolerance: tolerance in Å added to the sum of covalent radii
+    :return: MoleculeGraph
+    """
+    return KDTreeNN(tolerance=tolerance).get_bonded_structure(molecule)
+
+
+def _get_bond_array(self):
+    """
+    Indices of the sites at either end of each bond, of shape (n, 2).
+    """
+    return np.array(list(self.graph.edges()), dtype=int).reshape(-1, 2)
+
+
+def _iter_bonds(self, origin=(0, 0, 0), chunk_size=None):
+    """
+    Yields the bonds of the molecule, chunk_size bonds at a time (or all at
+    once if None), as lists of Cylinders with one Cylinders per color. As
+    in Site.get_scene(), each site draws the half of each of its bonds
+    closest to it in its own color.
+    """
+
+    molecule = self.molecule
+    positions = molecule.cart_coords - np.asarray(origin, dtype=np.float64)
+    site_colors = _get_site_colors(molecule)
+
+    bonds = self._get_bond_array()
+    chunk_size = chunk_size or max(len(bonds), 1)
+
+    for start in range(0, len(bonds), chunk_size):
+
+        chunk = bonds[start : start + chunk_size]
+        midpoints = (positions[chunk[:, 0]] + positions[chunk[:, 1]]) / 2
+        # both halves of each bond, from the site at either end
+        ends = np.concatenate([chunk[:, 0], chunk[:, 1]])
+        position_pairs = np.stack(
+            [positions[ends], np.concatenate([midpoints, midpoints])], axis=1
+        )
+        bond_colors = site_colors[ends]
+
+        yield [
+            Cylinders(positionPairs=position_pairs[bond_colors == color], color=color)
+            for color in np.unique(bond_colors)
+        ]
+
+
+def get_molecule_graph_scene(
+    self,
+    origin=(0, 0, 0),
+    instanced=False,
+    lazy=False,
+    ellipsoid_site_prop=None,
+    **kwargs,
+) -> Scene:
+    """
+    Create a Scene for a MoleculeGraph, with atoms and bonds in separate
+    sub-scenes. Atoms and bonds are built from the coordinate and bond arrays
+    of the whole molecule at once.
+
+    :param origin: shift the scene so that this point is at (0, 0, 0)
+    :param instanced: if True, atoms and bonds are given as InstancedSpheres
+    and InstancedCylinders, see Scene.instance_primitives()
+    :param lazy: if True, the contents of the atoms and bonds Scenes are
+    generators that yield primitives a few thousand sites at a time, see
+    StructureGraph.get_scene()
+    :param ellipsoid_site_prop: name of a site property of 3x3 matrices to
+    draw atoms as ellipsoids
+    :param kwargs: options that only apply to periodic structures (e.g.
+    draw_image_atoms) are ignored
+    :return: Scene
+    """
+
+    def iter_atoms(chunk_size=None):
+        for atoms in _iter_site_atoms(
+            self.molecule,
+            origin=origin,
+            ellipsoid_site_prop=ellipsoid_site_prop,
+            chunk_size=chunk_size,
+        ):
+            yield from Scene.instance_primitives(atoms) if instanced else atoms
+
+    def iter_bonds(chunk_size=None):
+        for bonds in self._iter_bonds(origin=origin, chunk_size=chunk_size):
+            yield from Scene.instance_primitives(bonds) if instanced else bonds
+
+    if lazy:
+        primitives = {"atoms": iter_atoms(4096), "bonds": iter_bonds(16384)}
+    else:
+        primitives = {"atoms": list(iter_atoms()), "bonds": list(iter_bonds())}
+
+    return Scene(
+        name=self.molecule.composition.reduced_formula,
+        contents=[Scene(name=k, contents=v) for k, v in primitives.items()],
+    )
+
+
+MoleculeGraph._get_bond_array = _get_bond_array
+MoleculeGraph._iter_bonds = _iter_bonds
+MoleculeGraph.get_scene = get_molecule_graph_scene
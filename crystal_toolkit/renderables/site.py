@@ -1,8 +1,17 @@
 import numpy as np
 from pymatgen import DummySpecie
-from scipy.spatial.qhull import Delaunay
-
-from crystal_toolkit.core.scene import Scene, Cubes, Spheres, Cylinders, Surface, Convex
+from scipy.spatial import ConvexHull, QhullError
+from scipy.spatial.transform import Rotation
+
+from crystal_toolkit.core.scene import (
+    Scene,
+    Cubes,
+    Spheres,
+    Cylinders,
+    Surface,
+    Convex,
+    Lines,
+)
 
 from pymatgen import Site
 
@@ -24,6 +33,8 @@ def get_site_scene(
         :param site:
         :param connected_sites:
         :param origin:
+        :param ellipsoid_site_prop: name of a site property of a 3x3 matrix
+        to draw the site as an ellipsoid, see get_ellipsoids()
         :param all_connected_sites_present: if False, will not calculate
         polyhedra since this would be misleading
         :param explicitly_calculate_polyhedra_hull:
@@ -40,18 +51,12 @@ def get_site_scene(
     occu_start = 0.0
 
     # for thermal ellipsoids etc.
-    def _get_ellipsoids_from_matrix(matrix):
-        raise NotImplementedError
-        # matrix = np.array(matrix)
-        # eigenvalues, eigenvectors = np.linalg.eig(matrix)
-
     if ellipsoid_site_prop:
-        matrix = self.properties[ellipsoid_site_prop]
-        ellipsoids = _get_ellipsoids_from_matrix(matrix)
+        rotations, semi_axes = get_ellipsoids(self.properties[ellipsoid_site_prop])
     else:
-        ellipsoids = None
+        rotations, semi_axes = None, None
 
-    position = np.subtract(self.coords, origin).tolist()
+    position = np.subtract(self.coords, origin)
 
     # site_color is used for bonds and polyhedra, if multiple colors are
     # defined for site (e.g. a disordered site), then we use grey
@@ -99,19 +104,20 @@ def get_site_scene(
                 radius=radius,
                 phiStart=phiStart,
                 phiEnd=phiEnd,
-                ellipsoids=ellipsoids,
+                ellipsoids=_scale_ellipsoids(rotations, semi_axes, radius),
             )
             atoms.append(sphere)
 
     if not is_ordered and not np.isclose(phiEnd, np.pi * 2):
         # if site occupancy doesn't sum to 100%, cap sphere
+        radius = self.properties["display_radius"][0]
         sphere = Spheres(
             positions=[position],
             color="#ffffff",
-            radius=self.properties["display_radius"][0],
+            radius=radius,
             phiStart=phiEnd,
             phiEnd=np.pi * 2,
-            ellipsoids=ellipsoids,
+            ellipsoids=_scale_ellipsoids(rotations, semi_axes, radius),
         )
         atoms.append(sphere)
 
@@ -124,47 +130,143 @@ def get_site_scene(
             bond_midpoint = np.add(position, connected_position) / 2
 
             cylinder = Cylinders(
-                positionPairs=[[position, bond_midpoint.tolist()]], color=site_color
+                positionPairs=[[position, bond_midpoint]], color=site_color
             )
             bonds.append(cylinder)
-            all_positions.append(connected_position.tolist())
+            all_positions.append(connected_position)
 
         if len(connected_sites) > 3 and all_connected_sites_present:
-            if explicitly_calculate_polyhedra_hull:
+            polyhedron = get_polyhedron(
+                all_positions,
+                site_color,
+                explicitly_calculate_polyhedra_hull=explicitly_calculate_polyhedra_hull,
+            )
 
-                try:
+    return Scene(
+        self.species_string,
+        [
+            Scene("atoms", contents=atoms),
+            Scene("bonds", contents=bonds),
+            Scene("polyhedra", contents=polyhedron),
+        ],
+    )
 
-                    # all_positions = [[0, 0, 0], [0, 0, 10], [0, 10, 0], [10, 0, 0]]
-                    # gives...
-                    # .convex_hull = [[2, 3, 0], [1, 3, 0], [1, 2, 0], [1, 2, 3]]
-                    # .vertex_neighbor_vertices = [1, 2, 3, 2, 3, 0, 1, 3, 0, 1, 2, 0]
 
-                    vertices_indices = Delaunay(all_positions).vertex_neighbor_vertices
-                    vertices = [all_positions[idx] for idx in vertices_indices]
+def get_ellipsoids(matrices, probability_scale=1.5382):
+    """
+    Principal axes of the ellipsoids described by symmetric 3x3 matrices,
+    e.g. anisotropic displacement parameters U (in Å^2, Cartesian axes),
+    for all matrices at once.
+
+    :param matrices: array of shape (n, 3, 3), or a single matrix
+    :param probability_scale: the semi-axes of the ellipsoids are
+    probability_scale * sqrt(eigenvalues), the default of 1.5382 gives
+    50% probability ellipsoids for displacement parameters
+    :return: unit quaternions (x, y, z, w) that rotate the x, y and z axes
+    onto the principal axes of shape (n, 4), and the lengths of the
+    semi-axes of shape (n, 3)
+    """
 
-                    polyhedron = [
-                        Surface(
-                            positions=vertices,
-                            color=self.properties["display_color"][0],
-                        )
-                    ]
+    matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 3, 3)
+    matrices = (matrices + matrices.transpose(0, 2, 1)) / 2
 
-                except Exception as e:
+    eigenvalues, eigenvectors = np.linalg.eigh(matrices)
+    # eigenvectors are the columns, flip one if needed to give a rotation
+    improper = np.linalg.det(eigenvectors) < 0
+    eigenvectors[improper, :, 2] *= -1
 
-                    polyhedron = []
+    rotations = Rotation.from_matrix(eigenvectors).as_quat()
+    # matrices that are not positive definite are drawn flattened
+    semi_axes = probability_scale * np.sqrt(np.clip(eigenvalues, 0, None))
 
-            else:
+    return rotations, semi_axes
 
-                polyhedron = [Convex(positions=all_positions, color=site_color)]
 
-    return Scene(
-        self.species_string,
-        [
-            Scene("atoms", contents=atoms),
-            Scene("bonds", contents=bonds),
-            Scene("polyhedra", contents=polyhedron),
-        ],
+def _scale_ellipsoids(rotations, semi_axes, radius):
+    """
+    Ellipsoids for a sphere of the given radius, so that it is drawn with
+    the given semi-axes, see get_ellipsoids().
+    """
+    if rotations is None:
+        return None
+    return {"rotations": rotations, "scales": semi_axes / (radius or 1.0)}
+
+
+def get_polyhedron_hull(positions):
+    """
+    Faces of the convex hull of the vertices of a polyhedron.
+
+    :param positions: positions of the vertices, shape (n, 3)
+    :return: triangles as indices into positions of shape (k, 3), wound
+    counter-clockwise when seen from outside, their outward unit normals of
+    shape (k, 3) and the edges between faces that are not coplanar as
+    indices into positions of shape (m, 2), or None if the vertices do not
+    enclose a volume (e.g. a square planar site)
+    """
+
+    positions = np.asarray(positions, dtype=np.float64)
+
+    try:
+        hull = ConvexHull(positions)
+    except (QhullError, ValueError):
+        return None
+
+    triangles = hull.simplices.copy()
+    normals = hull.equations[:, :3]
+
+    a, b, c = (positions[triangles[:, i]] for i in range(3))
+    inwards = np.einsum("ij,ij->i", np.cross(b - a, c - a), normals) < 0
+    triangles[inwards] = triangles[inwards][:, ::-1]
+
+    # every edge of a closed hull is shared by exactly two triangles, only
+    # draw those where the triangles are not coplanar (as THREE.EdgesGeometry)
+    num_triangles = len(triangles)
+    edges = np.sort(
+        np.concatenate(
+            [triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]]
+        ),
+        axis=1,
     )
+    faces = np.tile(np.arange(num_triangles), 3)
+    order = np.lexsort((edges[:, 1], edges[:, 0]))
+    edges, faces = edges[order][::2], faces[order].reshape(-1, 2)
+    coplanar = np.einsum(
+        "ij,ij->i", normals[faces[:, 0]], normals[faces[:, 1]]
+    ) > np.cos(np.radians(1))
+
+    return triangles, normals, edges[~coplanar]
+
+
+def get_polyhedron(positions, color, explicitly_calculate_polyhedra_hull=False):
+    """
+    Primitives for a coordination polyhedron.
+
+    :param positions: positions of the vertices (the connected sites)
+    :param color: color of the polyhedron
+    :param explicitly_calculate_polyhedra_hull: if True, calculate the faces
+    of the polyhedron here rather than in Simple3DScene, see
+    get_polyhedron_hull()
+    :return: list of primitives
+    """
+
+    if not explicitly_calculate_polyhedra_hull:
+        return [Convex(positions=positions, color=color)]
+
+    hull = get_polyhedron_hull(positions)
+    if hull is None:
+        return []
+
+    triangles, normals, edges = hull
+    positions = np.asarray(positions, dtype=np.float64)
+
+    return [
+        Surface(
+            positions=positions[triangles].reshape(-1, 3),
+            normals=np.repeat(normals, 3, axis=0),
+            color=color,
+        ),
+        Lines(positions=positions[edges].reshape(-1, 3), color=color),
+    ]
 
 
 Site.get_scene = get_site_scene
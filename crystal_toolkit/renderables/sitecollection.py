@@ -0,0 +1,217 @@
+import numpy as np
+from pymatgen import DummySpecie
+from pymatgen.core.structure import SiteCollection
+
+from crystal_toolkit.core.scene import Scene, Spheres
+from crystal_toolkit.renderables.site import get_ellipsoids, _scale_ellipsoids
+
+
+def get_image_sites_in_range(frac_coords, display_range, tol=1e-8):
+    """
+    Find every periodic image of every site whose fractional coordinates lie
+    within a display range, for all sites at once.
+
+    :param frac_coords: fractional coordinates of the sites, shape (n, 3)
+    :param display_range: fractional range to draw, as [[a_min, a_max],
+    [b_min, b_max], [c_min, c_max]], e.g. [[-0.1, 1.1]] * 3 to also draw
+    images of sites close to the cell boundary or [[0, 2]] * 3 for a 2x2x2
+    supercell
+    :param tol: tolerance on the bounds of the display range
+    :return: site indices of shape (m,) and images of shape (m, 3)
+    """
+    frac_coords = np.asarray(frac_coords, dtype=np.float64).reshape(-1, 3)
+    display_range = np.asarray(display_range, dtype=np.float64).reshape(3, 2)
+    lower = display_range[:, 0] - tol
+    upper = display_range[:, 1] + tol
+
+    if not len(frac_coords):
+        return np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int)
+
+    # all images that could bring any site into range, along each axis
+    axis_images = [
+        np.arange(
+            np.ceil(lower[axis] - frac_coords[:, axis].max()),
+            np.floor(upper[axis] - frac_coords[:, axis].min()) + 1,
+        )
+        for axis in range(3)
+    ]
+    images = np.stack(np.meshgrid(*axis_images, indexing="ij"), axis=-1)
+    images = images.reshape(-1, 3).astype(int)
+
+    # shape (sites, images, 3)
+    coords = frac_coords[:, np.newaxis, :] + images[np.newaxis, :, :]
+    in_range = np.all((coords >= lower) & (coords <= upper), axis=-1)
+    indices, image_indices = np.nonzero(in_range)
+
+    return indices, images[image_indices]
+
+
+def _is_single_species(species):
+    """
+    Whether the species of a site (a Composition) are a single real species
+    with full occupancy, i.e. the site can be drawn as a plain sphere.
+    """
+    if len(species) != 1:
+        return False
+    ((sp, occu),) = species.items()
+    return occu == 1 and not isinstance(sp, DummySpecie)
+
+
+def _get_site_colors(self):
+    """
+    Color of the bonds and polyhedra of each site of a Structure or
+    Molecule: the display color of the site, or grey if multiple colors are
+    defined for the site (e.g. a disordered site).
+    """
+    return np.array(
+        [
+            colors[0] if len(set(colors)) == 1 else "#555555"
+            for colors in self.site_properties["display_color"]
+        ]
+    )
+
+
+def _iter_atoms(
+    self,
+    indices=None,
+    positions=None,
+    origin=(0, 0, 0),
+    ellipsoid_site_prop=None,
+    chunk_size=None,
+):
+    """
+    Yields the atoms of the sites to draw, chunk_size sites at a time (or all
+    at once if None), as lists of primitives. Sites with a single, real
+    species are merged into one Spheres per color and radius, other sites
+    (e.g. dummy species or partial occupancies) are drawn by Site.get_scene().
+
+    :param indices: indices of the sites to draw, all sites if None
+    :param positions: Cartesian coordinates to draw each site at, e.g. of a
+    periodic image of the site, the coordinates of the sites if None
+    :param origin: shift the atoms so that this point is at (0, 0, 0)
+    :param ellipsoid_site_prop: name of a site property of 3x3 matrices to
+    draw the atoms as ellipsoids, see get_ellipsoids()
+    """
+
+    if indices is None:
+        indices = np.arange(len(self))
+    if positions is None:
+        positions = self.cart_coords[indices]
+    # shifts of each atom from its site, e.g. to a periodic image
+    shifts = positions - self.cart_coords[indices]
+    positions = positions - np.asarray(origin, dtype=np.float64)
+
+    colors = self.site_properties["display_color"]
+    radii = self.site_properties["display_radius"]
+
+    if ellipsoid_site_prop:
+        rotations, semi_axes = get_ellipsoids(self.site_properties[ellipsoid_site_prop])
+
+    simple = np.array(
+        [_is_single_species(species) for species in self.species_and_occu],
+        dtype=bool,
+    )[indices]
+    keys = np.array(
+        [
+            f"{site_colors[0]} {site_radii[0]}"
+            for site_colors, site_radii in zip(colors, radii)
+        ]
+    )[indices]
+    chunk_size = chunk_size or max(len(indices), 1)
+
+    for start in range(0, len(indices), chunk_size):
+
+        chunk = np.arange(start, min(start + chunk_size, len(indices)))
+        atoms = []
+
+        chunk_keys = keys[chunk[simple[chunk]]]
+        for key in np.unique(chunk_keys):
+            atom_indices = chunk[simple[chunk]][chunk_keys == key]
+            site_indices = indices[atom_indices]
+            radius = radii[site_indices[0]][0]
+            ellipsoids = None
+            if ellipsoid_site_prop:
+                ellipsoids = _scale_ellipsoids(
+                    rotations[site_indices], semi_axes[site_indices], radius
+                )
+            atoms.append(
+                Spheres(
+                    positions=positions[atom_indices],
+                    color=colors[site_indices[0]][0],
+                    radius=radius,
+                    ellipsoids=ellipsoids,
+                )
+            )
+
+        for idx in chunk[~simple[chunk]].tolist():
+            site = self[int(indices[idx])]
+            site_origin = np.subtract(origin, shifts[idx])
+            atoms += site.get_scene(origin=site_origin).contents[0].contents
+
+        yield atoms
+
+
+def get_site_collection_scene(
+    self,
+    origin=(0, 0, 0),
+    draw_image_atoms=True,
+    display_range=None,
+    instanced=False,
+    lazy=False,
+    ellipsoid_site_prop=None,
+    **kwargs,
+) -> Scene:
+    """
+    Create a Scene for a Structure or Molecule without a bonding graph, with
+    the atoms (including periodic images) and the unit cell drawn straight
+    from the coordinate arrays. This is much faster than drawing a
+    StructureGraph, since no bonds need to be calculated, e.g. to preview
+    large structures.
+
+    :param origin: shift the scene so that this point is at (0, 0, 0)
+    :param draw_image_atoms: draw periodic images of atoms on the cell boundary
+    :param display_range: fractional range of sites to draw, see
+    StructureGraph.get_scene()
+    :param instanced: if True, atoms are given as InstancedSpheres, see
+    Scene.instance_primitives()
+    :param lazy: if True, the contents of the atoms Scene is a generator that
+    yields primitives a few thousand sites at a time, see
+    StructureGraph.get_scene()
+    :param ellipsoid_site_prop: name of a site property of 3x3 matrices to
+    draw atoms as ellipsoids
+    :param kwargs: options for bonds and polyhedra (e.g. hide_incomplete_bonds)
+    are ignored
+    :return: Scene
+    """
+
+    lattice = getattr(self, "lattice", None)
+
+    indices, positions = None, None
+    if lattice is not None and (draw_image_atoms or display_range is not None):
+        if display_range is None:
+            display_range = [[-0.05, 1.05]] * 3
+        indices, images = get_image_sites_in_range(self.frac_coords, display_range)
+        positions = lattice.get_cartesian_coords(self.frac_coords[indices] + images)
+
+    def iter_atoms(chunk_size=None):
+        for atoms in self._iter_atoms(
+            indices=indices,
+            positions=positions,
+            origin=origin,
+            ellipsoid_site_prop=ellipsoid_site_prop,
+            chunk_size=chunk_size,
+        ):
+            yield from Scene.instance_primitives(atoms) if instanced else atoms
+
+    primitives = {"atoms": iter_atoms(4096) if lazy else list(iter_atoms())}
+    if lattice is not None:
+        primitives["unit_cell"] = [lattice.get_scene(origin=origin)]
+
+    return Scene(
+        name=self.composition.reduced_formula,
+        contents=[Scene(name=k, contents=v) for k, v in primitives.items()],
+    )
+
+
+SiteCollection._iter_atoms = _iter_atoms
+SiteCollection.get_scene = get_site_collection_scene
@@ -1,77 +1,395 @@
-from collections import defaultdict
-from itertools import combinations
+from collections import defaultdict, deque, namedtuple
+from hashlib import blake2b
 
 import numpy as np
-from pymatgen import PeriodicSite
 from pymatgen.analysis.graphs import StructureGraph
 
-from crystal_toolkit.core.scene import Scene
+from crystal_toolkit.core.scene import (
+    Scene,
+    Spheres,
+    Cylinders,
+    Convex,
+    Surface,
+    Lines,
+)
+from crystal_toolkit.renderables.site import get_polyhedron_hull
+from crystal_toolkit.renderables.sitecollection import (
+    get_image_sites_in_range,
+    _get_site_colors,
+    _iter_atoms as _iter_site_atoms,
+)
 
 
 def _get_sites_to_draw(
-    self, draw_image_atoms=True, bonded_sites_outside_unit_cell=False
+    self,
+    draw_image_atoms=True,
+    bonded_sites_outside_unit_cell=False,
+    display_range=None,
 ):
     """
-    Returns a list of site indices and image vectors.
+    Returns a set of site indices and image vectors.
+
+    :param draw_image_atoms: draw images of sites within 0.05 (fractional) of
+    the cell boundary on the opposite boundary
+    :param bonded_sites_outside_unit_cell: also draw sites bonded to the sites
+    drawn
+    :param display_range: draw all sites within this fractional range instead,
+    see get_image_sites_in_range()
     """
 
-    sites_to_draw = [(idx, (0, 0, 0)) for idx in range(len(self.structure))]
+    if display_range is None and not draw_image_atoms:
+        sites_to_draw = [(idx, (0, 0, 0)) for idx in range(len(self.structure))]
+    else:
+        if display_range is None:
+            # sites within 0.05 of a cell boundary are also drawn on the
+            # opposite boundary
+            display_range = [[-0.05, 1.05]] * 3
+        indices, images = get_image_sites_in_range(
+            self.structure.frac_coords, display_range
+        )
+        sites_to_draw = list(zip(indices.tolist(), map(tuple, images.tolist())))
 
-    if draw_image_atoms:
+    if bonded_sites_outside_unit_cell:
 
-        for idx, site in enumerate(self.structure):
+        indices = np.array([idx for idx, _ in sites_to_draw], dtype=int)
+        images = np.array([jimage for _, jimage in sites_to_draw], dtype=int)
+        _, neighbors, neighbor_images = self._get_neighbors(
+            indices, images.reshape(-1, 3)
+        )
+        outside = np.any(neighbor_images != 0, axis=1)
+        sites_to_draw += zip(
+            neighbors[outside].tolist(), map(tuple, neighbor_images[outside].tolist())
+        )
 
-            zero_elements = [
-                idx
-                for idx, f in enumerate(site.frac_coords)
-                if np.allclose(f, 0, atol=0.05)
-            ]
+    # remove any duplicate sites
+    # (can happen when enabling bonded_sites_outside_unit_cell,
+    #  since this works by following bonds, and a single site outside the
+    #  unit cell can be bonded to multiple atoms within it)
+    return set(sites_to_draw)
 
-            coord_permutations = [
-                x
-                for l in range(1, len(zero_elements) + 1)
-                for x in combinations(zero_elements, l)
-            ]
 
-            for perm in coord_permutations:
-                sites_to_draw.append(
-                    (idx, (int(0 in perm), int(1 in perm), int(2 in perm)))
-                )
+Adjacency = namedtuple("Adjacency", ["offsets", "neighbors", "images", "distances"])
 
-            one_elements = [
-                idx
-                for idx, f in enumerate(site.frac_coords)
-                if np.allclose(f, 1, atol=0.05)
-            ]
 
-            coord_permutations = [
-                x
-                for l in range(1, len(one_elements) + 1)
-                for x in combinations(one_elements, l)
-            ]
+def get_adjacency(self):
+    """
+    Bonds of every site from the edges of the graph, in both directions, as
+    compressed sparse row arrays: the bonds of site i are
+    neighbors[offsets[i]:offsets[i + 1]], to the neighboring sites in the
+    images images[offsets[i]:offsets[i + 1]] relative to site i, with bond
+    lengths distances[offsets[i]:offsets[i + 1]]. This gives the same
+    neighbors as get_connected_sites(), and the coordination number of site
+    i is offsets[i + 1] - offsets[i].
 
-            for perm in coord_permutations:
-                sites_to_draw.append(
-                    (idx, (-int(0 in perm), -int(1 in perm), -int(2 in perm)))
-                )
+    This is cached on the graph, and is rebuilt when the lattice or the
+    coordinates of the sites change (from a hash of their arrays) or when the
+    number of sites or edges changes, e.g. with add_edge() or break_edge().
+    Edges replaced by others without changing their number are not detected,
+    as hashing the edges would take as long as building the adjacency.
 
-    if bonded_sites_outside_unit_cell:
+    :return: Adjacency of offsets of shape (n + 1,), neighbors of shape (m,),
+    images of shape (m, 3) and distances of shape (m,)
+    """
+
+    frac_coords = self.structure.frac_coords
+    digest = blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(self.structure.lattice.matrix).tobytes())
+    digest.update(np.ascontiguousarray(frac_coords).tobytes())
+    key = (digest.hexdigest(), len(frac_coords), self.graph.number_of_edges())
+    cached = self.__dict__.get("_adjacency")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    edges = [
+        (u, v, *to_jimage) for u, v, to_jimage in self.graph.edges(data="to_jimage")
+    ]
+    edges = np.array(edges, dtype=int).reshape(-1, 5)
+
+    # each edge is a bond from u to v in to_jimage and from v to u in -to_jimage
+    half_edges = np.concatenate(
+        [edges, np.column_stack([edges[:, 1], edges[:, 0], -edges[:, 2:]])]
+    )
+    # sorted by site, and without bonds to the same neighbor in the same image
+    half_edges = np.unique(half_edges, axis=0)
+
+    sources, neighbors, images = half_edges[:, 0], half_edges[:, 1], half_edges[:, 2:]
+    distances = np.linalg.norm(
+        self.structure.lattice.get_cartesian_coords(
+            frac_coords[neighbors] + images - frac_coords[sources]
+        ),
+        axis=1,
+    )
+
+    adjacency = Adjacency(
+        offsets=np.searchsorted(sources, np.arange(len(self.structure) + 1)),
+        neighbors=neighbors,
+        images=images,
+        distances=distances,
+    )
+    self.__dict__["_adjacency"] = (key, adjacency)
+
+    return adjacency
+
+
+def _get_neighbors(self, indices, images):
+    """
+    Sites bonded to the given sites, see get_adjacency().
+
+    :param indices: site indices of shape (n,)
+    :param images: images of the sites of shape (n, 3)
+    :return: for every bond, the row of its site in indices, and the index
+    and image of the site it is bonded to
+    """
+
+    offsets, neighbors, neighbor_images, _ = self.get_adjacency()
+
+    counts = offsets[indices + 1] - offsets[indices]
+    rows = np.repeat(np.arange(len(indices)), counts)
+    # position of each bond in the adjacency arrays
+    edges = offsets[indices][rows] + (
+        np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+
+    return rows, neighbors[edges], images[rows] + neighbor_images[edges]
+
+
+def _get_site_keys(indices, images):
+    """
+    A single integer for every (site index, image), for fast set membership
+    tests with np.isin(), images must be within +/- 512 cells.
+    """
+    keys = np.asarray(indices, dtype=np.int64)
+    for axis in range(3):
+        keys = keys * 1024 + (np.asarray(images)[:, axis] + 512)
+    return keys
+
+
+def _get_bonds(self, indices, images, drawn_keys, origin=(0, 0, 0)):
+    """
+    Bonds of the given sites, computed together from the graph edges.
+
+    :param indices: site indices of shape (n,)
+    :param images: images of the sites of shape (n, 3)
+    :param drawn_keys: _get_site_keys() of all sites being drawn
+    :param origin: shift positions so that this point is at (0, 0, 0)
+    :return: for every bond, the row of its site in indices, its start and
+    end positions and whether the site it is bonded to is being drawn
+    """
+
+    rows, neighbors, neighbor_images = self._get_neighbors(indices, images)
+
+    lattice = self.structure.lattice
+    frac_coords = self.structure.frac_coords
+    positions = lattice.get_cartesian_coords(frac_coords[indices] + images) - origin
+    starts = positions[rows]
+    ends = (
+        lattice.get_cartesian_coords(frac_coords[neighbors] + neighbor_images) - origin
+    )
+
+    present = np.isin(_get_site_keys(neighbors, neighbor_images), drawn_keys)
+
+    return rows, starts, ends, present
+
+
+def _get_polyhedron_hulls(self, indices):
+    """
+    Faces of the coordination polyhedra of the given sites, see
+    get_polyhedron_hull(), for the vertices in the order of get_adjacency().
+    These are computed once per site (rather than once per image of a site
+    being drawn) and are cached on the graph alongside its adjacency.
+
+    :param indices: site indices
+    :return: dict of site index to hull, or None if the site has no hull
+    """
+
+    adjacency = self.get_adjacency()
+    cached = self.__dict__.get("_polyhedron_hulls")
+    if cached is None or cached[0] is not adjacency:
+        cached = (adjacency, {})
+        self.__dict__["_polyhedron_hulls"] = cached
+    hulls = cached[1]
+
+    frac_coords = self.structure.frac_coords
+    for idx in set(np.asarray(indices).tolist()) - hulls.keys():
+        start, end = adjacency.offsets[idx], adjacency.offsets[idx + 1]
+        vertices = self.structure.lattice.get_cartesian_coords(
+            frac_coords[adjacency.neighbors[start:end]] + adjacency.images[start:end]
+        )
+        hulls[idx] = get_polyhedron_hull(vertices)
+
+    return hulls
+
+
+def _select_polyhedra_centers(self, indices, images):
+    """
+    Choose the species to draw coordination polyhedra around so that the
+    polyhedra drawn do not intersect, e.g. only the SiO4 tetrahedra and not
+    also the OSi2 "polyhedra" in a silicate.
 
-        sites_to_append = []
-        for (n, jimage) in sites_to_draw:
-            connected_sites = self.get_connected_sites(n, jimage=jimage)
-            for connected_site in connected_sites:
-                if connected_site.jimage != (0, 0, 0):
-                    sites_to_append.append(
-                        (connected_site.index, connected_site.jimage)
+    Candidate polyhedra are split into sets by the species at their center,
+    and two sets intersect if a center of one is a vertex of a polyhedron of
+    the other (this does not check that a center is actually inside its
+    polyhedron). Sets are then added in turn, cations (lowest
+    electronegativity) and larger sets first, skipping any set that
+    intersects a set already chosen or itself. Intersection tests are
+    np.isin() tests on sorted site keys, so this takes O(n log n) for n
+    bonds rather than comparing polyhedra pairwise.
+
+    :param indices: site indices of the sites being drawn
+    :param images: images of the sites being drawn
+    :return: list of species strings
+    """
+
+    drawn_keys = _get_site_keys(indices, images)
+    rows, neighbors, neighbor_images = self._get_neighbors(indices, images)
+    vertex_keys = _get_site_keys(neighbors, neighbor_images)
+
+    counts = np.bincount(rows, minlength=len(indices))
+    missing = np.bincount(
+        rows[~np.isin(vertex_keys, drawn_keys)], minlength=len(indices)
+    )
+    has_polyhedron = (counts > 3) & (missing == 0)
+
+    site_species = np.array([site.species_string for site in self.structure])
+    center_species = site_species[indices]
+
+    centers, vertices, electronegativities = {}, {}, {}
+    for species in np.unique(center_species[has_polyhedron]).tolist():
+        is_center = has_polyhedron & (center_species == species)
+        centers[species] = np.unique(drawn_keys[is_center])
+        vertices[species] = np.unique(vertex_keys[is_center[rows]])
+        idx = indices[is_center][0]
+        electronegativities[species] = self.structure[idx].species.average_electroneg
+
+    def intersects(species, other_species):
+        return np.any(
+            np.isin(centers[species], vertices[other_species], assume_unique=True)
+        ) or np.any(
+            np.isin(centers[other_species], vertices[species], assume_unique=True)
+        )
+
+    chosen = []
+    for species in sorted(
+        centers, key=lambda sp: (electronegativities[sp], -len(centers[sp]), sp)
+    ):
+        if not any(intersects(species, other) for other in chosen + [species]):
+            chosen.append(species)
+
+    return chosen
+
+
+def _iter_atoms(
+    self, indices, images, origin=(0, 0, 0), ellipsoid_site_prop=None, chunk_size=None
+):
+    """
+    Yields the atoms of the sites to draw, drawn at the positions of their
+    images with SiteCollection._iter_atoms().
+    """
+    frac_coords = self.structure.frac_coords[indices] + images
+    return _iter_site_atoms(
+        self.structure,
+        indices=indices,
+        positions=self.structure.lattice.get_cartesian_coords(frac_coords),
+        origin=origin,
+        ellipsoid_site_prop=ellipsoid_site_prop,
+        chunk_size=chunk_size,
+    )
+
+
+def _iter_bonds_and_polyhedra(
+    self,
+    indices,
+    images,
+    origin=(0, 0, 0),
+    hide_incomplete_bonds=False,
+    explicitly_calculate_polyhedra_hull=False,
+    polyhedra_centers=None,
+    chunk_size=None,
+):
+    """
+    Yields the bonds and polyhedra of the sites to draw, chunk_size sites at
+    a time (or all at once if None), as lists of merged Cylinders and
+    Convex primitives with one primitive per color.
+
+    As in Site.get_scene(), each site draws half of each of its bonds, and
+    draws a polyhedron if it has more than 3 bonds and all sites it is
+    bonded to are being drawn.
+
+    :param polyhedra_centers: only draw polyhedra around sites with these
+    species strings, or around all sites if None
+    """
+
+    site_colors = _get_site_colors(self.structure)
+    site_species = np.array([site.species_string for site in self.structure])
+    drawn_keys = _get_site_keys(indices, images)
+    chunk_size = chunk_size or max(len(indices), 1)
+
+    for start in range(0, len(indices), chunk_size):
+
+        chunk_indices = indices[start : start + chunk_size]
+        rows, starts, ends, present = self._get_bonds(
+            chunk_indices, images[start : start + chunk_size], drawn_keys, origin
+        )
+
+        all_connected_sites_present = (
+            np.bincount(rows[~present], minlength=len(chunk_indices)) == 0
+        )
+        if hide_incomplete_bonds:
+            # only draw bonds if the destination site is also being drawn
+            rows, starts, ends = rows[present], starts[present], ends[present]
+
+        bond_colors = site_colors[chunk_indices[rows]]
+        position_pairs = np.stack([starts, (starts + ends) / 2], axis=1)
+        bonds = [
+            Cylinders(positionPairs=position_pairs[bond_colors == color], color=color)
+            for color in np.unique(bond_colors)
+        ]
+
+        counts = np.bincount(rows, minlength=len(chunk_indices))
+        has_polyhedron = (counts > 3) & all_connected_sites_present
+        if polyhedra_centers is not None:
+            has_polyhedron &= np.isin(site_species[chunk_indices], polyhedra_centers)
+        polyhedra = []
+        if explicitly_calculate_polyhedra_hull:
+            hulls = self._get_polyhedron_hulls(chunk_indices[has_polyhedron])
+            row_ends = np.cumsum(counts)
+            faces, normals, edges = (
+                defaultdict(list),
+                defaultdict(list),
+                defaultdict(list),
+            )
+            for row in np.flatnonzero(has_polyhedron):
+                hull = hulls[chunk_indices[row]]
+                if hull is None:
+                    continue
+                # the hull of a site is the same for all its images, since
+                # the vertices are always in the order of get_adjacency()
+                vertices = ends[row_ends[row] - counts[row] : row_ends[row]]
+                color = site_colors[chunk_indices[row]]
+                faces[color].append(vertices[hull[0]].reshape(-1, 3))
+                normals[color].append(np.repeat(hull[1], 3, axis=0))
+                edges[color].append(vertices[hull[2]].reshape(-1, 3))
+            for color in faces:
+                polyhedra.append(
+                    Surface(
+                        positions=np.concatenate(faces[color]),
+                        normals=np.concatenate(normals[color]),
+                        color=color,
                     )
-        sites_to_draw += sites_to_append
+                )
+                polyhedra.append(
+                    Lines(positions=np.concatenate(edges[color]), color=color)
+                )
+        elif np.any(has_polyhedron):
+            # one Convex per polyhedron, since Simple3DScene draws a single
+            # hull around all the positions of a Convex
+            vertices = np.split(ends, np.cumsum(counts)[:-1])
+            polyhedra = [
+                Convex(positions=vertices[row], color=site_colors[chunk_indices[row]])
+                for row in np.flatnonzero(has_polyhedron)
+            ]
 
-    # remove any duplicate sites
-    # (can happen when enabling bonded_sites_outside_unit_cell,
-    #  since this works by following bonds, and a single site outside the
-    #  unit cell can be bonded to multiple atoms within it)
-    return set(sites_to_draw)
+        yield bonds, polyhedra
 
 
 def get_structure_graph_scene(
@@ -81,61 +399,122 @@ def get_structure_graph_scene(
     bonded_sites_outside_unit_cell=True,
     hide_incomplete_bonds=False,
     explicitly_calculate_polyhedra_hull=False,
+    instanced=False,
+    lazy=False,
+    display_range=None,
+    polyhedra_centers=None,
+    ellipsoid_site_prop=None,
 ) -> Scene:
+    """
+    Create a Scene for a StructureGraph, with atoms, bonds, polyhedra and the
+    unit cell in separate sub-scenes.
 
-    primitives = defaultdict(list)
+    :param origin: shift the scene so that this point is at (0, 0, 0)
+    :param draw_image_atoms: draw periodic images of atoms on the cell boundary
+    :param bonded_sites_outside_unit_cell: draw atoms outside the unit cell that
+    are bonded to atoms inside it
+    :param hide_incomplete_bonds: only draw bonds between atoms that are drawn
+    :param explicitly_calculate_polyhedra_hull:
+    :param instanced: if True, atoms and bonds are given as InstancedSpheres
+    and InstancedCylinders with a color and radius per instance rather than as
+    one Spheres or Cylinders per color, see Scene.instance_primitives()
+    :param lazy: if True, the contents of the atoms, bonds and polyhedra
+    Scenes are generators that yield primitives a few sites at a time as the
+    Scene is written with Scene.write_json() or Scene.iter_json_chunks(), so
+    that the primitives of the whole structure are never held in memory at
+    once
+    :param display_range: fractional range of sites to draw, e.g.
+    [[0, 2], [0, 2], [0, 2]] to draw a 2x2x2 supercell, see
+    get_image_sites_in_range(), draw_image_atoms is ignored if this is given
+    :param polyhedra_centers: species strings of the sites to draw
+    coordination polyhedra around, e.g. ["Si"], or None to choose them
+    automatically so that polyhedra do not overlap, see
+    _select_polyhedra_centers()
+    :param ellipsoid_site_prop: name of a site property of 3x3 matrices, e.g.
+    anisotropic displacement parameters, to draw atoms as ellipsoids
+    :return: Scene
+    """
 
     sites_to_draw = self._get_sites_to_draw(
         draw_image_atoms=draw_image_atoms,
         bonded_sites_outside_unit_cell=bonded_sites_outside_unit_cell,
+        display_range=display_range,
     )
+    sites_to_draw = np.array(
+        [(idx, *jimage) for idx, jimage in sorted(sites_to_draw)], dtype=int
+    ).reshape(-1, 4)
+    indices, images = sites_to_draw[:, 0], sites_to_draw[:, 1:]
 
-    for (idx, jimage) in sites_to_draw:
-
-        site = self.structure[idx]
-        if jimage != (0, 0, 0):
-            connected_sites = self.get_connected_sites(idx, jimage=jimage)
-            site = PeriodicSite(
-                site.species,
-                np.add(site.frac_coords, jimage),
-                site.lattice,
-                properties=site.properties,
-            )
-        else:
-            connected_sites = self.get_connected_sites(idx)
+    if polyhedra_centers is None:
+        polyhedra_centers = self._select_polyhedra_centers(indices, images)
 
-        true_number_of_connected_sites = len(connected_sites)
-        connected_sites_being_drawn = [
-            cs for cs in connected_sites if (cs.index, cs.jimage) in sites_to_draw
-        ]
-        number_of_connected_sites_drawn = len(connected_sites_being_drawn)
-        all_connected_sites_present = (
-            true_number_of_connected_sites == number_of_connected_sites_drawn
-        )
-        if hide_incomplete_bonds:
-            # only draw bonds if the destination site is also being drawn
-            connected_sites = connected_sites_being_drawn
+    def iter_atoms():
+        for atoms in self._iter_atoms(
+            indices,
+            images,
+            origin=origin,
+            ellipsoid_site_prop=ellipsoid_site_prop,
+            chunk_size=4096,
+        ):
+            yield from Scene.instance_primitives(atoms) if instanced else atoms
 
-        site_scene = site.get_scene(
-            connected_sites=connected_sites,
-            all_connected_sites_present=all_connected_sites_present,
+    def iter_bonds_and_polyhedra(chunk_size=None):
+        return self._iter_bonds_and_polyhedra(
+            indices,
+            images,
             origin=origin,
+            hide_incomplete_bonds=hide_incomplete_bonds,
             explicitly_calculate_polyhedra_hull=explicitly_calculate_polyhedra_hull,
+            polyhedra_centers=polyhedra_centers,
+            chunk_size=chunk_size,
         )
-        for scene in site_scene.contents:
-            primitives[scene.name] += scene.contents
 
-    # we are here ...
-    # select polyhedra
-    # split by atom type at center
-    # see if any intersect, if yes split further
-    # order sets, with each choice, go to add second set etc if don't intersect
-    # they intersect if centre atom forms vertex of another atom (caveat: centre atom may not actually be inside polyhedra! not checking for this, add todo)
-    # def _set_intersects() ->bool:
-    # def _split_set() ->List: (by type, then..?)
-    # def _order_sets()... pick 1, ask can add 2? etc
+    if lazy:
+        # bonds and polyhedra are found together, so each chunk is computed
+        # once and its polyhedra are kept until the polyhedra Scene is
+        # written (or its bonds, if that Scene is written first)
+        chunks = iter_bonds_and_polyhedra(chunk_size=4096)
+        pending = {"bonds": deque(), "polyhedra": deque()}
+
+        def iter_pending(name):
+            while True:
+                if pending[name]:
+                    yield pending[name].popleft()
+                    continue
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending["bonds"].append(chunk[0])
+                pending["polyhedra"].append(chunk[1])
+
+        def iter_bonds():
+            for bonds in iter_pending("bonds"):
+                yield from Scene.instance_primitives(bonds) if instanced else bonds
+
+        def iter_polyhedra():
+            for polyhedra in iter_pending("polyhedra"):
+                yield from polyhedra
+
+        primitives = {
+            "atoms": iter_atoms(),
+            "bonds": iter_bonds(),
+            "polyhedra": iter_polyhedra(),
+        }
+    else:
+        primitives = {"atoms": [], "bonds": [], "polyhedra": []}
+        for atoms in self._iter_atoms(
+            indices, images, origin=origin, ellipsoid_site_prop=ellipsoid_site_prop
+        ):
+            primitives["atoms"] += atoms
+        for bonds, polyhedra in iter_bonds_and_polyhedra():
+            primitives["bonds"] += bonds
+            primitives["polyhedra"] += polyhedra
+
+    if instanced and not lazy:
+        for name in ("atoms", "bonds"):
+            primitives[name] = Scene.instance_primitives(primitives[name])
 
-    primitives["unit_cell"].append(self.structure.lattice.get_scene(origin=origin))
+    primitives["unit_cell"] = [self.structure.lattice.get_scene(origin=origin)]
 
     return Scene(
         name=self.structure.composition.reduced_formula,
@@ -144,4 +523,11 @@ def get_structure_graph_scene(
 
 
 StructureGraph._get_sites_to_draw = _get_sites_to_draw
+StructureGraph.get_adjacency = get_adjacency
+StructureGraph._get_neighbors = _get_neighbors
+StructureGraph._get_bonds = _get_bonds
+StructureGraph._get_polyhedron_hulls = _get_polyhedron_hulls
+StructureGraph._select_polyhedra_centers = _select_polyhedra_centers
+StructureGraph._iter_atoms = _iter_atoms
+StructureGraph._iter_bonds_and_polyhedra = _iter_bonds_and_polyhedra
 StructureGraph.get_scene = get_structure_graph_scene
@@ -1,5 +1,15 @@
 import * as THREE from "three-full";
 
+// typed arrays that can be sent by Scene.to_binary, see encode_typed_array
+const TYPED_ARRAYS = {
+  Float32Array: Float32Array,
+  Uint8Array: Uint8Array,
+  Uint16Array: Uint16Array,
+  Uint32Array: Uint32Array,
+  Int16Array: Int16Array,
+  Int32Array: Int32Array
+};
+
 export default class Simple3DScene {
   constructor(scene_json, dom_elt, settings) {
     this.start = this.start.bind(this);
@@ -149,24 +159,10 @@ export default class Simple3DScene {
 
   addToScene(scene_json) {
     Simple3DScene.removeObjectByName(this.scene, scene_json.name);
+    // patches are only applied to the scene they were computed from
+    this.sceneHash = scene_json.hash;
 
-    const root_obj = new THREE.Object3D();
-    root_obj.name = scene_json.name;
-
-    function traverse_scene(o, parent, self) {
-      o.contents.forEach(function(sub_o) {
-        if (sub_o.hasOwnProperty("type")) {
-          parent.add(self.makeObject(sub_o));
-        } else {
-          const new_parent = new THREE.Object3D();
-          new_parent.name = sub_o.name;
-          parent.add(new_parent);
-          traverse_scene(sub_o, new_parent, self);
-        }
-      });
-    }
-
-    traverse_scene(scene_json, root_obj, this);
+    const root_obj = this.makeNode(scene_json);
 
     //window.console.log("root_obj", root_obj);
 
@@ -175,7 +171,14 @@ export default class Simple3DScene {
     // auto-zoom to fit object
     // TODO: maybe better to move this elsewhere (what if using perspective?)
     const box = new THREE.Box3();
-    box.setFromObject(root_obj);
+    if (scene_json.bbox) {
+      // bounding box computed by Scene.bounding_box, avoids traversing
+      // every vertex of the scene
+      box.min.fromArray(scene_json.bbox[0]);
+      box.max.fromArray(scene_json.bbox[1]);
+    } else {
+      box.setFromObject(root_obj);
+    }
     const width = this.renderer.domElement.clientWidth;
     const height = this.renderer.domElement.clientHeight;
     // TODO: improve auto-zoom
@@ -189,6 +192,237 @@ export default class Simple3DScene {
     this.renderScene();
   }
 
+  makeNode(scene_json, settings = this.settings) {
+    // build the Object3D tree for a Scene and all its contents, level-of-detail
+    // hints of a Scene override the settings for everything it contains
+    const node = new THREE.Object3D();
+    node.name = scene_json.name;
+
+    if (scene_json.lod) {
+      node.userData.lod = scene_json.lod;
+      settings = Object.assign({}, settings, scene_json.lod);
+    }
+
+    const self = this;
+    scene_json.contents.forEach(function(sub_o) {
+      if (sub_o.hasOwnProperty("type")) {
+        node.add(self.makeObject(sub_o, settings));
+      } else {
+        node.add(self.makeNode(sub_o, settings));
+      }
+    });
+
+    return node;
+  }
+
+  static makeSphereImpostors(positions, colors, radii) {
+    // draw spheres as shaded point sprites instead of tessellated meshes,
+    // used for very large scenes, see StructureMoleculeComponent._get_lod_hints
+    const geom = new THREE.BufferGeometry();
+    geom.addAttribute("position", new THREE.BufferAttribute(positions, 3));
+    geom.addAttribute("instanceColor", new THREE.BufferAttribute(colors, 3));
+    geom.addAttribute("instanceRadius", new THREE.BufferAttribute(radii, 1));
+
+    const mat = new THREE.ShaderMaterial({
+      uniforms: {
+        scale: { value: 1.0 }
+      },
+      vertexShader: `
+        attribute vec3 instanceColor;
+        attribute float instanceRadius;
+        uniform float scale;
+        varying vec3 vColor;
+        void main() {
+          vColor = instanceColor;
+          gl_PointSize = 2.0 * instanceRadius * scale;
+          gl_Position = projectionMatrix * modelViewMatrix * vec4(position, 1.0);
+        }`,
+      fragmentShader: `
+        varying vec3 vColor;
+        void main() {
+          vec2 coord = 2.0 * gl_PointCoord - 1.0;
+          float r2 = dot(coord, coord);
+          if (r2 > 1.0) {
+            discard;
+          }
+          vec3 normal = vec3(coord.x, -coord.y, sqrt(1.0 - r2));
+          float light = 0.4 + 0.6 * max(dot(normal, normalize(vec3(-0.4, 0.4, 1.0))), 0.0);
+          gl_FragColor = vec4(vColor * light, 1.0);
+        }`
+    });
+
+    const points = new THREE.Points(geom, mat);
+    points.onBeforeRender = function(renderer, scene, camera) {
+      // point sizes are in pixels, so convert from scene units for the
+      // current (orthographic) camera zoom and canvas size
+      const height = renderer.getSize(new THREE.Vector2()).height;
+      mat.uniforms.scale.value =
+        (height * renderer.getPixelRatio() * camera.zoom) /
+        (camera.top - camera.bottom);
+    };
+
+    return points;
+  }
+
+  static makeInstances(geom, mat, matrices, colors) {
+    // draw all instances of geom with a single draw call, using
+    // THREE.InstancedMesh if this version of three.js supports per-instance
+    // colors, otherwise by merging transformed copies of geom into a single
+    // geometry with vertex colors
+    const count = matrices.length;
+
+    if (THREE.InstancedMesh && THREE.InstancedMesh.prototype.setColorAt) {
+      const mesh = new THREE.InstancedMesh(geom, mat, count);
+      const color = new THREE.Color();
+      matrices.forEach(function(matrix, i) {
+        mesh.setMatrixAt(i, matrix);
+        if (colors) {
+          mesh.setColorAt(i, color.fromArray(colors, i * 3));
+        }
+      });
+      return mesh;
+    }
+
+    const base_positions = geom.attributes.position.array;
+    const base_normals = geom.attributes.normal.array;
+    const base_index = geom.index.array;
+    const stride = base_positions.length;
+    const num_vertices = stride / 3;
+
+    const positions = new Float32Array(count * stride);
+    const normals = new Float32Array(count * stride);
+    const vertex_colors = colors ? new Float32Array(count * stride) : null;
+    const index = new Uint32Array(count * base_index.length);
+
+    const vec = new THREE.Vector3();
+    const normal_matrix = new THREE.Matrix3();
+    matrices.forEach(function(matrix, i) {
+      normal_matrix.getNormalMatrix(matrix);
+      const offset = i * stride;
+      for (let j = 0; j < stride; j += 3) {
+        vec
+          .fromArray(base_positions, j)
+          .applyMatrix4(matrix)
+          .toArray(positions, offset + j);
+        vec
+          .fromArray(base_normals, j)
+          .applyMatrix3(normal_matrix)
+          .normalize()
+          .toArray(normals, offset + j);
+        if (vertex_colors) {
+          vertex_colors[offset + j] = colors[i * 3];
+          vertex_colors[offset + j + 1] = colors[i * 3 + 1];
+          vertex_colors[offset + j + 2] = colors[i * 3 + 2];
+        }
+      }
+      const index_offset = i * base_index.length;
+      for (let j = 0; j < base_index.length; j++) {
+        index[index_offset + j] = base_index[j] + i * num_vertices;
+      }
+    });
+    geom.dispose();
+
+    const merged = new THREE.BufferGeometry();
+    merged.setIndex(new THREE.BufferAttribute(index, 1));
+    merged.addAttribute("position", new THREE.BufferAttribute(positions, 3));
+    merged.addAttribute("normal", new THREE.BufferAttribute(normals, 3));
+    if (vertex_colors) {
+      merged.addAttribute("color", new THREE.BufferAttribute(vertex_colors, 3));
+      mat.vertexColors = THREE.VertexColors;
+    }
+
+    return new THREE.Mesh(merged, mat);
+  }
+
+  static getInstanceColors(object_json) {
+    // per-instance colors as a flat Float32Array, or null to use a single color
+    if (object_json.colors) {
+      return Simple3DScene.decodeArray(object_json.colors);
+    }
+    return null;
+  }
+
+  static getInstanceRadii(object_json, count) {
+    if (object_json.radii) {
+      return Simple3DScene.decodeArray(object_json.radii);
+    }
+    return new Float32Array(count).fill(1);
+  }
+
+  static getEllipsoidQuaternion(quaternion, rotations, index, count) {
+    // ellipsoid rotations are either quaternions (x, y, z, w), which orient
+    // all three axes, or directions to rotate the z axis onto
+    if (rotations.length === count * 4) {
+      return quaternion.fromArray(rotations, index * 4).normalize();
+    }
+    const direction = new THREE.Vector3().fromArray(rotations, index * 3);
+    return quaternion.setFromUnitVectors(
+      new THREE.Vector3(0, 0, 1),
+      direction.normalize()
+    );
+  }
+
+  applyPatch(patch) {
+    // apply a patch from diff_scene_json in place, nodes are identified by
+    // the path of names from the root scene, returns false if the patch was
+    // computed from a different scene than the one displayed (e.g. if an
+    // earlier update was dropped), and the full scene is needed instead
+    const root_obj = this.scene.children.find(obj => obj.name === patch.name);
+    if (typeof root_obj === "undefined" || patch.base !== this.sceneHash) {
+      return false;
+    }
+
+    function getByPath(path) {
+      return path.reduce(function(obj, name) {
+        return obj && obj.children.find(child => child.name === name);
+      }, root_obj);
+    }
+
+    patch.removed.forEach(function(path) {
+      const obj = getByPath(path);
+      if (obj) {
+        Simple3DScene.disposeObject(obj);
+        obj.parent.remove(obj);
+      }
+    });
+
+    const self = this;
+    function getSettings(parent) {
+      // level-of-detail hints of the new node's ancestors
+      const lods = [];
+      parent.traverseAncestors(function(ancestor) {
+        if (ancestor.userData.lod) {
+          lods.unshift(ancestor.userData.lod);
+        }
+      });
+      if (parent.userData.lod) {
+        lods.push(parent.userData.lod);
+      }
+      return Object.assign({}, self.settings, ...lods);
+    }
+
+    patch.changed.forEach(function(change) {
+      const obj = getByPath(change.path);
+      if (obj) {
+        const parent = obj.parent;
+        Simple3DScene.disposeObject(obj);
+        parent.remove(obj);
+        parent.add(self.makeNode(change.node, getSettings(parent)));
+      }
+    });
+
+    patch.added.forEach(function(change) {
+      const parent = getByPath(change.path);
+      if (parent) {
+        parent.add(self.makeNode(change.node, getSettings(parent)));
+      }
+    });
+
+    this.sceneHash = patch.hash;
+    this.renderScene();
+    return true;
+  }
+
   makeLights(light_json) {
 
     const lights = new THREE.Object3D();
@@ -225,7 +459,7 @@ export default class Simple3DScene {
     return lights;
   }
 
-  makeObject(object_json) {
+  makeObject(object_json, settings = this.settings) {
     const obj = new THREE.Object3D();
     obj.name = object_json.name;
 
@@ -235,10 +469,30 @@ export default class Simple3DScene {
 
     switch (object_json.type) {
       case "spheres": {
+        if (
+          settings.sphereImpostors &&
+          !object_json.ellipsoids &&
+          !object_json.phiStart &&
+          !object_json.phiEnd
+        ) {
+          const positions = Simple3DScene.decodeArray(object_json.positions);
+          const count = positions.length / 3;
+          const color = new THREE.Color(object_json.color || "#52afb0");
+          const colors = new Float32Array(count * 3);
+          for (let i = 0; i < count; i++) {
+            color.toArray(colors, i * 3);
+          }
+          const radii = new Float32Array(count).fill(
+            (object_json.radius || 1) * settings.sphereScale
+          );
+          obj.add(Simple3DScene.makeSphereImpostors(positions, colors, radii));
+          return obj;
+        }
+
         const geom = new THREE.SphereBufferGeometry(
-          object_json.radius * this.settings.sphereScale,
-          this.settings.sphereSegments,
-          this.settings.sphereSegments,
+          object_json.radius * settings.sphereScale,
+          settings.sphereSegments,
+          settings.sphereSegments,
           object_json.phiStart || 0,
           object_json.phiEnd || Math.PI * 2
         );
@@ -249,24 +503,32 @@ export default class Simple3DScene {
         //    mat.side = THREE.DoubleSide;
         //}
 
+        const positions = Simple3DScene.decodeArray(object_json.positions);
+
         const meshes = [];
-        object_json.positions.forEach(function(position) {
+        for (let i = 0; i < positions.length; i += 3) {
           const mesh = new THREE.Mesh(geom, mat);
-          mesh.position.set(...position);
+          mesh.position.set(positions[i], positions[i + 1], positions[i + 2]);
           meshes.push(mesh);
-        });
+        }
 
         // TODO: test axes are correct!
         if (object_json.ellipsoids) {
-          const vec_z = new THREE.Vector3(0, 0, 1);
+          const rotations = Simple3DScene.decodeArray(
+            object_json.ellipsoids.rotations
+          );
+          const scales = Simple3DScene.decodeArray(object_json.ellipsoids.scales);
           const quaternion = new THREE.Quaternion();
-          object_json.ellipsoids.rotations.forEach(function(rotation, index) {
-            const rotation_vec = new THREE.Vector3(...rotation);
-            quaternion.setFromUnitVectors(vec_z, rotation_vec.normalize());
-            meshes[index].setRotationFromQuaternion(quaternion);
-          });
-          object_json.ellipsoids.scales.forEach(function(scale, index) {
-            meshes[index].scale.set(...scale);
+          meshes.forEach(function(mesh, index) {
+            const i = index * 3;
+            Simple3DScene.getEllipsoidQuaternion(
+              quaternion,
+              rotations,
+              index,
+              meshes.length
+            );
+            mesh.setRotationFromQuaternion(quaternion);
+            mesh.scale.set(scales[i], scales[i + 1], scales[i + 2]);
           });
         }
 
@@ -280,22 +542,28 @@ export default class Simple3DScene {
         const radius = object_json.radius || 1;
 
         const geom = new THREE.CylinderBufferGeometry(
-          radius * this.settings.cylinderScale,
-          radius * this.settings.cylinderScale,
+          radius * settings.cylinderScale,
+          radius * settings.cylinderScale,
           1.0,
-          this.settings.cylinderSegments
+          settings.cylinderSegments
         );
         const mat = this.makeMaterial(object_json.color);
 
         const vec_y = new THREE.Vector3(0, 1, 0); // initial axis of cylinder
         const quaternion = new THREE.Quaternion();
+        const vec_a = new THREE.Vector3();
+        const vec_b = new THREE.Vector3();
+
+        const positionPairs = Simple3DScene.decodeArray(
+          object_json.positionPairs
+        );
 
-        object_json.positionPairs.forEach(function(positionPair) {
+        for (let i = 0; i < positionPairs.length; i += 6) {
           // the following is technically correct but could be optimized?
 
           const mesh = new THREE.Mesh(geom, mat);
-          const vec_a = new THREE.Vector3(...positionPair[0]);
-          const vec_b = new THREE.Vector3(...positionPair[1]);
+          vec_a.fromArray(positionPairs, i);
+          vec_b.fromArray(positionPairs, i + 3);
           const vec_rel = vec_b.sub(vec_a);
 
           // scale cylinder to correct length
@@ -310,29 +578,127 @@ export default class Simple3DScene {
           mesh.setRotationFromQuaternion(quaternion);
 
           obj.add(mesh);
-        });
+        }
+
+        return obj;
+      }
+      case "instancedSpheres": {
+        const positions = Simple3DScene.decodeArray(object_json.positions);
+        const count = positions.length / 3;
+        const radii = Simple3DScene.getInstanceRadii(object_json, count);
+        const colors = Simple3DScene.getInstanceColors(object_json);
+
+        if (settings.sphereImpostors && !object_json.ellipsoids) {
+          let impostor_colors = colors;
+          if (!impostor_colors) {
+            const color = new THREE.Color("#52afb0");
+            impostor_colors = new Float32Array(count * 3);
+            for (let i = 0; i < count; i++) {
+              color.toArray(impostor_colors, i * 3);
+            }
+          }
+          obj.add(
+            Simple3DScene.makeSphereImpostors(
+              positions,
+              impostor_colors,
+              radii.map(radius => radius * settings.sphereScale)
+            )
+          );
+          return obj;
+        }
+
+        // unit sphere, scaled by the radius of each instance
+        const geom = new THREE.SphereBufferGeometry(
+          settings.sphereScale,
+          settings.sphereSegments,
+          settings.sphereSegments
+        );
+        const mat = this.makeMaterial(colors ? "#ffffff" : undefined);
+
+        const rotations = object_json.ellipsoids
+          ? Simple3DScene.decodeArray(object_json.ellipsoids.rotations)
+          : null;
+        const scales = object_json.ellipsoids
+          ? Simple3DScene.decodeArray(object_json.ellipsoids.scales)
+          : null;
+        const matrices = [];
+        for (let i = 0; i < count; i++) {
+          const position = new THREE.Vector3().fromArray(positions, i * 3);
+          const quaternion = new THREE.Quaternion();
+          const scale = new THREE.Vector3(radii[i], radii[i], radii[i]);
+          if (rotations) {
+            Simple3DScene.getEllipsoidQuaternion(quaternion, rotations, i, count);
+            scale.multiply(new THREE.Vector3().fromArray(scales, i * 3));
+          }
+          matrices.push(new THREE.Matrix4().compose(position, quaternion, scale));
+        }
+
+        obj.add(Simple3DScene.makeInstances(geom, mat, matrices, colors));
+
+        return obj;
+      }
+      case "instancedCylinders": {
+        const positionPairs = Simple3DScene.decodeArray(
+          object_json.positionPairs
+        );
+        const count = positionPairs.length / 6;
+        const radii = Simple3DScene.getInstanceRadii(object_json, count);
+        const colors = Simple3DScene.getInstanceColors(object_json);
+
+        // unit cylinder along y, scaled to the radius and length of each
+        // instance
+        const geom = new THREE.CylinderBufferGeometry(
+          settings.cylinderScale,
+          settings.cylinderScale,
+          1.0,
+          settings.cylinderSegments
+        );
+        const mat = this.makeMaterial(colors ? "#ffffff" : undefined);
+
+        const vec_y = new THREE.Vector3(0, 1, 0);
+        const vec_a = new THREE.Vector3();
+        const vec_b = new THREE.Vector3();
+
+        const matrices = [];
+        for (let i = 0; i < count; i++) {
+          vec_a.fromArray(positionPairs, i * 6);
+          vec_b.fromArray(positionPairs, i * 6 + 3);
+          const vec_rel = vec_b.sub(vec_a);
+          const length = vec_rel.length();
+          const midpoint = vec_a.clone().add(vec_rel.clone().multiplyScalar(0.5));
+          const quaternion = new THREE.Quaternion().setFromUnitVectors(
+            vec_y,
+            vec_rel.normalize()
+          );
+          const scale = new THREE.Vector3(radii[i], length, radii[i]);
+          matrices.push(new THREE.Matrix4().compose(midpoint, quaternion, scale));
+        }
+
+        obj.add(Simple3DScene.makeInstances(geom, mat, matrices, colors));
 
         return obj;
       }
       case "cubes": {
         const geom = new THREE.BoxBufferGeometry(
-          object_json.width * this.settings.sphereScale,
-          object_json.width * this.settings.sphereScale,
-          object_json.width * this.settings.sphereScale
+          object_json.width * settings.sphereScale,
+          object_json.width * settings.sphereScale,
+          object_json.width * settings.sphereScale
         );
         const mat = this.makeMaterial(object_json.color);
 
-        object_json.positions.forEach(function(position) {
+        const positions = Simple3DScene.decodeArray(object_json.positions);
+
+        for (let i = 0; i < positions.length; i += 3) {
           const mesh = new THREE.Mesh(geom, mat);
-          mesh.position.set(...position);
+          mesh.position.set(positions[i], positions[i + 1], positions[i + 2]);
           obj.add(mesh);
-        });
+        }
 
         return obj;
       }
       case "lines": {
-        const verts = new THREE.Float32BufferAttribute(
-          [].concat.apply([], object_json.positions),
+        const verts = new THREE.BufferAttribute(
+          Simple3DScene.decodeArray(object_json.positions),
           3
         );
         const geom = new THREE.BufferGeometry();
@@ -363,20 +729,20 @@ export default class Simple3DScene {
         return obj;
       }
       case "surface": {
-        const verts = new THREE.Float32BufferAttribute(
-          [].concat.apply([], object_json.positions),
+        const verts = new THREE.BufferAttribute(
+          Simple3DScene.decodeArray(object_json.positions),
           3
         );
         const geom = new THREE.BufferGeometry();
         geom.addAttribute("position", verts);
 
         const opacity =
-          object_json.opacity || this.settings.defaultSurfaceOpacity;
+          object_json.opacity || settings.defaultSurfaceOpacity;
         const mat = this.makeMaterial(object_json.color, opacity);
 
         if (object_json.normals) {
-          const normals = new THREE.Float32BufferAttribute(
-            [].concat.apply([], object_json.normals),
+          const normals = new THREE.BufferAttribute(
+            Simple3DScene.decodeArray(object_json.normals),
             3
           );
           geom.addAttribute("normal", normals);
@@ -396,11 +762,27 @@ export default class Simple3DScene {
         return obj;
       }
       case "convex": {
-        const points = object_json.positions.map(p => new THREE.Vector3(...p));
-        const geom = new THREE.ConvexBufferGeometry(points);
+        const positions = Simple3DScene.decodeArray(object_json.positions);
+        // merged primitives contain several hulls, see Scene.merge_primitives
+        const hullSizes = object_json.hullSizes || [positions.length / 3];
+
+        const geoms = [];
+        let offset = 0;
+        hullSizes.forEach(function(hullSize) {
+          const points = [];
+          for (let i = offset; i < offset + hullSize * 3; i += 3) {
+            points.push(new THREE.Vector3().fromArray(positions, i));
+          }
+          geoms.push(new THREE.ConvexBufferGeometry(points));
+          offset += hullSize * 3;
+        });
+        const geom =
+          geoms.length === 1
+            ? geoms[0]
+            : THREE.BufferGeometryUtils.mergeBufferGeometries(geoms);
 
         const opacity =
-          object_json.opacity || this.settings.defaultSurfaceOpacity;
+          object_json.opacity || settings.defaultSurfaceOpacity;
         const mat = this.makeMaterial(object_json.color, opacity);
         if (opacity) {
           mat.transparent = true;
@@ -424,16 +806,16 @@ export default class Simple3DScene {
 
         // body
         const geom_cyl = new THREE.CylinderBufferGeometry(
-          radius * this.settings.cylinderScale,
-          radius * this.settings.cylinderScale,
+          radius * settings.cylinderScale,
+          radius * settings.cylinderScale,
           1.0,
-          this.settings.cylinderSegments
+          settings.cylinderSegments
         );
         // head
         const geom_head = new THREE.ConeBufferGeometry(
-            headWidth* this.settings.cylinderScale,
-            headLength* this.settings.cylinderScale,
-            this.settings.cylinderSegments);
+            headWidth* settings.cylinderScale,
+            headLength* settings.cylinderScale,
+            settings.cylinderSegments);
 
         const mat = this.makeMaterial(object_json.color);
 
@@ -442,13 +824,17 @@ export default class Simple3DScene {
         const quaternion = new THREE.Quaternion();
         const quaternion_head = new THREE.Quaternion();
 
-        object_json.positionPairs.forEach(function(positionPair) {
+        const positionPairs = Simple3DScene.decodeArray(
+          object_json.positionPairs
+        );
+
+        for (let i = 0; i < positionPairs.length; i += 6) {
           // the following is technically correct but could be optimized?
 
           const mesh = new THREE.Mesh(geom_cyl, mat);
-          const vec_a = new THREE.Vector3(...positionPair[0]);
-          const vec_b = new THREE.Vector3(...positionPair[1]);
-          const vec_head = new THREE.Vector3(...positionPair[1]);
+          const vec_a = new THREE.Vector3().fromArray(positionPairs, i);
+          const vec_b = new THREE.Vector3().fromArray(positionPairs, i + 3);
+          const vec_head = new THREE.Vector3().fromArray(positionPairs, i + 3);
           const vec_rel = vec_b.sub(vec_a);
 
           // scale cylinder to correct length
@@ -471,7 +857,7 @@ export default class Simple3DScene {
           quaternion_head.setFromUnitVectors(vec_y, vec_rel.normalize());
           mesh_head.setRotationFromQuaternion(quaternion_head);
           obj.add(mesh_head);
-        });
+        }
         return obj;
       }
       case "labels": {
@@ -533,12 +919,67 @@ export default class Simple3DScene {
     this.renderScene();
   }
 
+  static decodeArray(value) {
+    // geometry is either sent as nested lists (Scene.to_json) or as a
+    // base64-encoded typed array with a small header (Scene.to_binary),
+    // in both cases return a flat typed array suitable for a BufferAttribute
+    if (value && value.offset) {
+      // quantized array with value = quantized * scale + offset for each
+      // component, see quantize_array
+      const quantized = Simple3DScene.decodeArray(
+        value.typedArray
+          ? { typedArray: value.typedArray, data: value.data }
+          : value.values
+      );
+      const num_components = value.offset.length;
+      const decoded = new Float32Array(quantized.length);
+      for (let i = 0; i < quantized.length; i++) {
+        const component = i % num_components;
+        decoded[i] =
+          quantized[i] * value.scale[component] + value.offset[component];
+      }
+      return decoded;
+    }
+    if (value && value.typedArray) {
+      const binary = window.atob(value.data);
+      const bytes = new Uint8Array(binary.length);
+      for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+      }
+      return new TYPED_ARRAYS[value.typedArray](bytes.buffer);
+    }
+    const flat = [];
+    (function flatten(arr) {
+      arr.forEach(function(item) {
+        if (Array.isArray(item)) {
+          flatten(item);
+        } else {
+          flat.push(item);
+        }
+      });
+    })(value || []);
+    return new Float32Array(flat);
+  }
+
   static removeObjectByName(scene, name) {
     // name is not necessarily unique, make this recursive ?
     const object = scene.getObjectByName(name);
     if (typeof object !== "undefined") {
+        Simple3DScene.disposeObject(object);
         scene.remove(object);
     }
   }
 
+  static disposeObject(object) {
+    // free GPU resources of an object that is about to be removed
+    object.traverse(function(child) {
+      if (child.geometry) {
+        child.geometry.dispose();
+      }
+      if (child.material) {
+        child.material.dispose();
+      }
+    });
+  }
+
 }
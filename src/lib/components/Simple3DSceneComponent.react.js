@@ -31,7 +31,16 @@ export default class Simple3DSceneComponent extends Component {
 		}
 
 		if (nextProps.data !== this.props.data) {
-		    this.scene.addToScene(nextProps.data);
+		    if (nextProps.data.patch) {
+		        if (!this.scene.applyPatch(nextProps.data)) {
+		            // the patch is for a scene that was never displayed
+		            this.props.setProps({
+		                fullSceneRequest: (nextProps.fullSceneRequest || 0) + 1
+		            });
+		        }
+		    } else {
+		        this.scene.addToScene(nextProps.data);
+		    }
 			this.scene.toggleVisibility(this.props.toggleVisibility)
 		}
 
@@ -96,6 +105,12 @@ Simple3DSceneComponent.propTypes = {
      */
     downloadRequest: PropTypes.object,
 
+    /**
+	 * Incremented when the full scene is needed, because an update of the
+	 * scene could not be applied as a patch
+     */
+    fullSceneRequest: PropTypes.number,
+
 	/**
 	 * Dash-assigned callback that should be called whenever any of the
 	 * properties change
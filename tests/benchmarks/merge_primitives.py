@@ -0,0 +1,116 @@
+"""
+Benchmark for Scene.merge_primitives: reports the number of primitives (each
+of which is one material in Simple3DScene) and the number of draw calls that
+Simple3DScene would issue for a scene, before and after merging, for a few
+typical structures.
+
+Usage: python tests/benchmarks/merge_primitives.py
+"""
+
+import os
+import warnings
+from copy import deepcopy
+from time import perf_counter
+
+from pymatgen.core import Structure, Lattice
+from pymatgen.io.vasp import Chgcar
+
+from crystal_toolkit.components.structure import StructureMoleculeComponent
+from crystal_toolkit.core.scene import Scene
+
+warnings.filterwarnings("ignore")
+
+module_dir = os.path.dirname(os.path.abspath(__file__))
+
+# number of draw calls issued per primitive by Simple3DScene.js, as a function
+# of the primitive, arrows are drawn as a cylinder and a cone, and convex
+# hulls as a mesh and its edges
+DRAW_CALLS = {
+    "spheres": lambda p: len(p.positions),
+    "cubes": lambda p: len(p.positions),
+    "cylinders": lambda p: len(p.positionPairs),
+    "arrows": lambda p: 2 * len(p.positionPairs),
+    "lines": lambda p: 1,
+    "surface": lambda p: 1,
+    "convex": lambda p: 2,
+}
+
+
+def count_primitives_and_draw_calls(scene):
+    n_primitives, n_draw_calls = 0, 0
+    for item in scene.contents:
+        if isinstance(item, Scene):
+            primitives, draw_calls = count_primitives_and_draw_calls(item)
+            n_primitives += primitives
+            n_draw_calls += draw_calls
+        elif getattr(item, "type", None) in DRAW_CALLS:
+            n_primitives += 1
+            n_draw_calls += DRAW_CALLS[item.type](item)
+    return n_primitives, n_draw_calls
+
+
+def get_structures():
+
+    gan = Structure.from_spacegroup(
+        "P6_3mc",
+        Lattice.hexagonal(3.22, 5.24),
+        ["Ga", "N"],
+        [[1 / 3, 2 / 3, 0], [1 / 3, 2 / 3, 3 / 8]],
+    )
+    nacl = Structure.from_spacegroup(
+        "Fm-3m", Lattice.cubic(5.69), ["Na", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]]
+    )
+    srtio3 = Structure.from_spacegroup(
+        "Pm-3m",
+        Lattice.cubic(3.905),
+        ["Sr", "Ti", "O"],
+        [[0, 0, 0], [0.5, 0.5, 0.5], [0.5, 0.5, 0]],
+    )
+    chgcar = Chgcar.from_file(
+        os.path.join(module_dir, "..", "test_files", "chgcar.vasp")
+    )
+
+    return {
+        "GaN": gan,
+        "GaN 4x4x4": gan * (4, 4, 4),
+        "NaCl 3x3x3": nacl * (3, 3, 3),
+        "SrTiO3 4x4x4": srtio3 * (4, 4, 4),
+        "CHGCAR test file": chgcar.structure,
+    }
+
+
+def main():
+
+    print(
+        f"{'structure':<20}{'sites':>8}{'primitives':>22}{'draw calls':>22}"
+        f"{'merge time / ms':>18}"
+    )
+
+    for name, structure in get_structures().items():
+
+        graph = StructureMoleculeComponent._preprocess_input_to_graph(
+            structure, bonding_strategy="MinimumDistanceNN"
+        )
+        scene, _ = StructureMoleculeComponent.get_scene_and_legend(
+            graph, show_compass=False
+        )
+
+        primitives_before, draw_calls_before = count_primitives_and_draw_calls(scene)
+
+        scene = deepcopy(scene)
+        start = perf_counter()
+        merged = Scene(scene.name, contents=Scene.merge_primitives(scene.contents))
+        merge_time = (perf_counter() - start) * 1000
+
+        primitives_after, draw_calls_after = count_primitives_and_draw_calls(merged)
+
+        print(
+            f"{name:<20}{len(structure):>8}"
+            f"{primitives_before:>11} → {primitives_after:<8}"
+            f"{draw_calls_before:>11} → {draw_calls_after:<8}"
+            f"{merge_time:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark for Scene serialization, comparing the previous implementation of
+Scene.to_json (dataclasses.asdict followed by a recursive remove_defaults)
+with the single-pass serializer, both to a dict (as passed to Dash) and to
+JSON bytes, for synthetic 1k and 10k atom scenes built in the same way as
+StructureGraph.get_scene.
+
+Usage: python tests/benchmarks/scene_serialization.py
+"""
+
+from dataclasses import asdict
+from io import BytesIO
+from json import dumps
+from time import perf_counter
+
+import numpy as np
+
+from crystal_toolkit.core.scene import Scene, Spheres, Cylinders, Convex
+
+COLORS = ["#ff0000", "#00ff00", "#0000ff", "#ffff00", "#00ffff"]
+
+
+def make_scene(n_atoms, seed=0):
+
+    rng = np.random.RandomState(seed)
+    positions = rng.rand(n_atoms, 3) * n_atoms ** (1 / 3) * 2.5
+    neighbors = rng.randint(0, n_atoms, size=(n_atoms, 4))
+
+    atoms, bonds, polyhedra = [], [], []
+    for idx, position in enumerate(positions):
+        color = COLORS[idx % len(COLORS)]
+        atoms.append(Spheres(positions=[position], color=color, radius=0.5))
+        for neighbor in neighbors[idx]:
+            midpoint = (position + positions[neighbor]) / 2
+            bonds.append(Cylinders(positionPairs=[[position, midpoint]], color=color))
+        if idx % 4 == 0:
+            polyhedra.append(Convex(positions=positions[neighbors[idx]], color=color))
+
+    return Scene(
+        "benchmark",
+        contents=[
+            Scene("atoms", contents=atoms),
+            Scene("bonds", contents=bonds),
+            Scene("polyhedra", contents=polyhedra),
+        ],
+    )
+
+
+def legacy_to_json(scene):
+    """
+    Scene.to_json as previously implemented.
+    """
+
+    merged_scene = Scene(
+        name=scene.name,
+        contents=scene.merge_primitives(scene.contents),
+        origin=scene.origin,
+    )
+
+    def remove_defaults(scene_dict):
+        trimmed_dict = {}
+        for k, v in scene_dict.items():
+            if isinstance(v, dict):
+                v = remove_defaults(v)
+            elif isinstance(v, np.ndarray):
+                trimmed_dict[k] = v.tolist()
+            elif isinstance(v, list):
+                trimmed_dict[k] = [
+                    remove_defaults(item) if isinstance(item, dict) else item
+                    for item in v
+                ]
+            elif v is not None:
+                trimmed_dict[k] = v
+        return trimmed_dict
+
+    return remove_defaults(asdict(merged_scene))
+
+
+def time_ms(func, scene, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        func(scene)
+        times.append(perf_counter() - start)
+    return min(times) * 1000
+
+
+# merging primitives is the same for every method, so it is excluded from the
+# timings by serializing scenes that have already been merged
+TO_DICT = {
+    "asdict + remove_defaults": legacy_to_json,
+    "to_json": lambda s: s.to_json(),
+    "to_binary": lambda s: s.to_binary(),
+}
+
+TO_BYTES = {
+    "asdict + remove_defaults + json.dumps": lambda s: dumps(
+        legacy_to_json(s)
+    ).encode(),
+    "write_json": lambda s: s.write_json(BytesIO()),
+    "write_json(encoding='binary')": lambda s: s.write_json(
+        BytesIO(), encoding="binary"
+    ),
+}
+
+
+def main():
+
+    for n_atoms in (1000, 10000):
+
+        scene = make_scene(n_atoms)
+        start = perf_counter()
+        scene = Scene(scene.name, contents=Scene.merge_primitives(scene.contents))
+        print(
+            f"{n_atoms} atoms, merging primitives: "
+            f"{(perf_counter() - start) * 1000:.1f} ms"
+        )
+
+        for methods in (TO_DICT, TO_BYTES):
+            baseline = None
+            for name, method in methods.items():
+                t = time_ms(method, scene)
+                baseline = baseline or t
+                print(f"  {name:<40}{t:>10.1f} ms{baseline / t:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from pymatgen.core import Lattice, Structure
+from pymatgen.analysis.graphs import StructureGraph
+from pymatgen.analysis.local_env import CutOffDictNN
+
+from crystal_toolkit.components.structure import StructureMoleculeComponent
+from crystal_toolkit.core.local_env import KDTreeNN
+
+
+def get_bonds(graph):
+    adjacency = graph.get_adjacency()
+    return sorted(
+        (site, int(neighbor), tuple(image))
+        for site in range(len(graph.structure))
+        for neighbor, image in zip(
+            adjacency.neighbors[adjacency.offsets[site] : adjacency.offsets[site + 1]],
+            adjacency.images[adjacency.offsets[site] : adjacency.offsets[site + 1]],
+        )
+    )
+
+
+def test_kdtree_nn():
+
+    # a small, skewed cell with sites outside of it, so that sites are bonded
+    # to several images of each other and of themselves
+    structure = Structure(
+        Lattice.from_parameters(2.5, 3, 3.2, 80, 95, 110),
+        ["Mg", "O", "Fe"],
+        [[0.1, 0.2, 1.3], [0.5, 0.5, -0.4], [0.9, 0.1, 0.6]],
+    )
+    cut_off_dict = {
+        ("Mg", "O"): 3.1,
+        ("Mg", "Mg"): 2.6,
+        ("O", "Fe"): 2.9,
+        ("Fe", "Fe"): 3.3,
+    }
+
+    expected = StructureGraph.with_local_env_strategy(
+        structure, CutOffDictNN(cut_off_dict)
+    )
+    graph = KDTreeNN(cut_off_dict).get_bonded_structure(structure)
+    assert len(get_bonds(graph)) == 30
+    assert get_bonds(graph) == get_bonds(expected)
+
+    nn_info = KDTreeNN(cut_off_dict).get_nn_info(structure, 1)
+    assert sorted((nn["site_index"], nn["image"]) for nn in nn_info) == sorted(
+        (nn["site_index"], tuple(nn["image"]))
+        for nn in CutOffDictNN(cut_off_dict).get_nn_info(structure, 1)
+    )
+
+    # without cut-offs, sites are bonded by their covalent radii
+    rocksalt = Structure.from_spacegroup(
+        "Fm-3m", Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]]
+    )
+    graph = KDTreeNN(tolerance=0.1).get_bonded_structure(rocksalt)
+    assert [graph.get_coordination_of_site(idx) for idx in range(8)] == [6] * 8
+
+    assert "KDTreeNN" in StructureMoleculeComponent.available_bonding_strategies
+    # large structures are bonded with KDTreeNN, with any custom cut-offs
+    graph = StructureMoleculeComponent._preprocess_input_to_graph(
+        rocksalt * (2, 2, 2),
+        bonding_strategy="CutOffDictNN",
+        bonding_strategy_kwargs={"cut_off_dict": [("Mg", "O", 2.5)]},
+        kdtree_bonding_threshold=16,
+    )
+    assert graph.graph.graph["edge_weight_name"] == "bond_length"
+    assert graph.graph.number_of_edges() == 6 * 64 // 2
+
+
+def test_kdtree_nn_disordered():
+
+    # the first species of the disordered site has no cut-off to O
+    structure = Structure(
+        Lattice.cubic(4.2),
+        [{"Fe": 0.5, "Mg": 0.5}, "O"],
+        [[0, 0, 0], [0.5, 0.5, 0.5]],
+    )
+    structure = Structure.from_spacegroup(
+        "Fm-3m", structure.lattice, structure.species_and_occu, structure.frac_coords
+    )
+    graph = KDTreeNN({("Mg", "O"): 2.5}).get_bonded_structure(structure)
+    assert graph.graph.number_of_edges() == 6 * 8 // 2
+
+    # bonds are the same whether or not a structure is large enough to be
+    # bonded with KDTreeNN
+    for kwargs in ({"cut_off_dict": [("Mg", "O", 2.5)]}, None):
+        small, large = (
+            StructureMoleculeComponent._preprocess_input_to_graph(
+                structure,
+                bonding_strategy="CrystalNN",
+                bonding_strategy_kwargs=kwargs,
+                kdtree_bonding_threshold=threshold,
+            )
+            for threshold in (len(structure), 0)
+        )
+        assert get_bonds(small) == get_bonds(large)
+        assert len(get_bonds(small)) == (48 if kwargs else 0)
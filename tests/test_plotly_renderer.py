@@ -0,0 +1,37 @@
+import numpy as np
+
+from crystal_toolkit.core.scene import Scene, Spheres, Cylinders, Lines
+from crystal_toolkit.helpers.plotly_renderer import get_plotly_traces
+
+
+def test_get_plotly_traces():
+
+    scene = Scene(
+        "test",
+        contents=[
+            Scene(
+                "atoms",
+                contents=[
+                    Spheres(positions=np.random.rand(100, 3), color="#ff0000"),
+                    Spheres(positions=np.random.rand(100, 3), color="#0000ff"),
+                ],
+            ),
+            Scene(
+                "bonds",
+                contents=[
+                    Cylinders(positionPairs=np.random.rand(50, 2, 3), color="#ff0000")
+                ],
+            ),
+            Lines(positions=np.random.rand(10, 3)),
+        ],
+    )
+
+    traces = get_plotly_traces(scene, sphere_segments=8, cylinder_segments=4)
+
+    # one mesh per color, spheres and cylinders of the same color are merged
+    assert [trace.type for trace in traces] == ["mesh3d", "mesh3d", "scatter3d"]
+    assert len(traces[0].i) == 100 * 2 * 8 * 4 + 50 * 2 * 4
+
+    # line segments are separated by NaN
+    assert len(traces[2].x) == 15
+    assert np.isnan(traces[2].x[2])
@@ -0,0 +1,320 @@
+import json
+
+import numpy as np
+from pymatgen import DummySpecie
+from pymatgen.core import Molecule, Structure
+from pymatgen.analysis.graphs import StructureGraph
+from pymatgen.analysis.local_env import MinimumDistanceNN
+
+from scipy.spatial.transform import Rotation
+
+from crystal_toolkit.components.structure import StructureMoleculeComponent
+from crystal_toolkit.core.scene import Scene, Spheres, Surface
+from crystal_toolkit.renderables.lattice import Lattice
+from crystal_toolkit.renderables.moleculegraph import get_covalent_bonds
+from crystal_toolkit.renderables.site import get_ellipsoids, get_polyhedron_hull
+from crystal_toolkit.renderables.structuregraph import get_image_sites_in_range
+
+
+def get_rock_salt_graph():
+    structure = Structure.from_spacegroup(
+        "Fm-3m", Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]]
+    )
+    structure.add_site_property("display_color", [["#ff0000"]] * 4 + [["#0000ff"]] * 4)
+    structure.add_site_property("display_radius", [[0.5]] * 8)
+    return StructureGraph.with_local_env_strategy(structure, MinimumDistanceNN())
+
+
+def test_get_image_sites_in_range():
+
+    frac_coords = [[0, 0, 0], [0.5, 0.5, 0.5], [0.02, 0.5, 0.99]]
+
+    indices, images = get_image_sites_in_range(frac_coords, [[-0.05, 1.05]] * 3)
+    sites = set(zip(indices.tolist(), map(tuple, images.tolist())))
+
+    # the site at the origin is drawn at all 8 corners of the cell
+    assert {image for idx, image in sites if idx == 0} == {
+        (a, b, c) for a in (0, 1) for b in (0, 1) for c in (0, 1)
+    }
+    assert {image for idx, image in sites if idx == 1} == {(0, 0, 0)}
+    assert {image for idx, image in sites if idx == 2} == {
+        (0, 0, 0),
+        (1, 0, 0),
+        (0, 0, -1),
+        (1, 0, -1),
+    }
+
+    # a 2x2x2 supercell has 8 images of every site
+    indices, images = get_image_sites_in_range(
+        np.random.rand(100, 3), [[0, 2], [0, 2], [0, 2]]
+    )
+    assert len(indices) == 800
+    assert set(map(tuple, images.tolist())) == {
+        (a, b, c) for a in (0, 1) for b in (0, 1) for c in (0, 1)
+    }
+
+
+def test_structure_graph_bonds():
+
+    graph = get_rock_salt_graph()
+    scene = graph.get_scene(
+        draw_image_atoms=False, bonded_sites_outside_unit_cell=False
+    )
+    atoms, bonds, polyhedra, unit_cell = scene.contents
+
+    # every site draws half of each of its bonds
+    num_bonds = sum(len(graph.get_connected_sites(idx)) for idx in range(8))
+    assert num_bonds == 48
+    bonds = Scene.merge_primitives(bonds.contents)
+    assert sorted(len(cylinders.positionPairs) for cylinders in bonds) == [24, 24]
+    half_bond_lengths = np.linalg.norm(
+        np.concatenate([c.positionPairs[:, 1] - c.positionPairs[:, 0] for c in bonds]),
+        axis=1,
+    )
+    assert np.allclose(half_bond_lengths, 2.1 / 2)
+
+    # no site has all of its neighbors drawn, so there are no polyhedra
+    assert polyhedra.contents == []
+
+    # sites in a 3x3x3 block of the 5x5x5 sites drawn have all their neighbors
+    scene = graph.get_scene(
+        display_range=[[-0.5, 1.5]] * 3,
+        bonded_sites_outside_unit_cell=False,
+        polyhedra_centers=["Mg", "O"],
+    )
+    polyhedra = Scene.merge_primitives(scene.contents[2].contents)
+    assert len(polyhedra) == 27
+
+    # Mg and O octahedra share vertices with each other's centers, so only
+    # the 14 Mg octahedra are drawn by default
+    scene = graph.get_scene(
+        display_range=[[-0.5, 1.5]] * 3, bonded_sites_outside_unit_cell=False
+    )
+    polyhedra = Scene.merge_primitives(scene.contents[2].contents)
+    assert len(polyhedra) == 14
+    assert all(convex.color == "#ff0000" for convex in polyhedra)
+
+    # lazy scenes have the same contents, with the bonds of each chunk of
+    # sites only calculated once for both bonds and polyhedra
+    calls = []
+    get_bonds = graph._get_bonds
+    graph._get_bonds = lambda *args, **kwargs: calls.append(1) or get_bonds(
+        *args, **kwargs
+    )
+    lazy_scene = graph.get_scene(
+        display_range=[[-0.5, 1.5]] * 3,
+        bonded_sites_outside_unit_cell=False,
+        lazy=True,
+    )
+    chunks = lazy_scene.iter_json_chunks(bounding_boxes=True)
+    assert json.loads(b"".join(chunks)) == scene.to_json(bounding_boxes=True)
+    assert len(calls) == 1
+
+
+def test_structure_graph_adjacency():
+
+    graph = get_rock_salt_graph()
+
+    adjacency = graph.get_adjacency()
+    assert graph.get_adjacency() is adjacency
+    assert np.diff(adjacency.offsets).tolist() == [
+        len(graph.get_connected_sites(idx)) for idx in range(8)
+    ]
+    assert np.allclose(adjacency.distances, 2.1)
+
+    # modifying the graph rebuilds the adjacency
+    u, v, to_jimage = next(iter(graph.graph.edges(data="to_jimage")))
+    graph.break_edge(u, v, to_jimage=to_jimage)
+    assert graph.get_adjacency() is not adjacency
+    assert len(graph.get_adjacency().neighbors) == len(adjacency.neighbors) - 2
+
+    # as does moving a site
+    adjacency = graph.get_adjacency()
+    graph.structure.translate_sites([0], [0.01, 0, 0])
+    assert graph.get_adjacency() is not adjacency
+    assert not np.allclose(graph.get_adjacency().distances, 2.1)
+
+
+def test_polyhedron_hull():
+
+    octahedron = np.concatenate([np.eye(3), -np.eye(3)])
+    triangles, normals, edges = get_polyhedron_hull(octahedron)
+    assert len(triangles) == 8 and len(edges) == 12
+    # faces are wound counter-clockwise seen from outside
+    a, b, c = (octahedron[triangles[:, i]] for i in range(3))
+    assert np.allclose(np.cross(b - a, c - a) / np.sqrt(3), normals)
+    assert np.all(np.einsum("ij,ij->i", normals, a) > 0)
+
+    # diagonals of the square faces of a cube are not edges
+    cube = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)])
+    triangles, normals, edges = get_polyhedron_hull(cube)
+    assert len(triangles) == 12 and len(edges) == 12
+
+    assert get_polyhedron_hull([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]]) is None
+
+
+def test_structure_graph_polyhedra():
+
+    graph = get_rock_salt_graph()
+    scene = graph.get_scene(
+        display_range=[[-0.5, 1.5]] * 3,
+        bonded_sites_outside_unit_cell=False,
+        explicitly_calculate_polyhedra_hull=True,
+        polyhedra_centers=["Mg", "O"],
+    )
+    polyhedra = scene.contents[2].contents
+    surfaces = [p for p in polyhedra if isinstance(p, Surface)]
+    assert sum(len(surface.positions) for surface in surfaces) == 27 * 8 * 3
+    assert all(len(s.normals) == len(s.positions) for s in surfaces)
+
+    # hulls are only computed once per site
+    assert len(graph._get_polyhedron_hulls([])) == 8
+
+
+def test_ellipsoids():
+
+    rotations = Rotation.random(10, random_state=0)
+    semi_axes = np.random.rand(10, 3) + 0.1
+    matrices = np.einsum(
+        "nij,nj,nkj->nik", rotations.as_matrix(), semi_axes**2, rotations.as_matrix()
+    )
+
+    quaternions, scales = get_ellipsoids(matrices, probability_scale=1)
+    assert quaternions.shape == (10, 4)
+    assert np.allclose(
+        np.einsum(
+            "nij,nj,nkj->nik",
+            Rotation.from_quat(quaternions).as_matrix(),
+            scales**2,
+            Rotation.from_quat(quaternions).as_matrix(),
+        ),
+        matrices,
+    )
+
+    graph = get_rock_salt_graph()
+    graph.structure.add_site_property("U", [np.diag([0.01, 0.01, 0.04])] * 8)
+    scene = graph.get_scene(ellipsoid_site_prop="U", instanced=True)
+    (spheres,) = scene.contents[0].contents
+    assert spheres.ellipsoids["rotations"].shape == (len(spheres.positions), 4)
+    assert np.allclose(
+        spheres.ellipsoids["scales"][0], [0.3076, 0.3076, 0.6153], atol=1e-3
+    )
+
+    # quaternions and directions are merged as quaternions
+    (merged,) = Scene.merge_primitives(
+        [
+            Spheres(
+                positions=[[0, 0, 0]],
+                ellipsoids={"rotations": [[0, 0, 0, 1]], "scales": [[1, 1, 2]]},
+            ),
+            Spheres(
+                positions=[[1, 1, 1]],
+                ellipsoids={"rotations": [[0, 0, -1]], "scales": [[1, 1, 2]]},
+            ),
+            Spheres(positions=[[2, 2, 2]]),
+        ]
+    )
+    assert np.allclose(
+        merged.ellipsoids["rotations"], [[0, 0, 0, 1], [1, 0, 0, 0], [0, 0, 0, 1]]
+    )
+
+
+def test_repeats():
+
+    graph = get_rock_salt_graph()
+    display_range = StructureMoleculeComponent._get_repeats_display_range(
+        2, draw_image_atoms=False
+    )
+    scene = graph.get_scene(
+        display_range=display_range, bonded_sites_outside_unit_cell=False
+    )
+
+    supercell = get_rock_salt_graph()
+    supercell.structure.make_supercell(2)
+    supercell = StructureGraph.with_local_env_strategy(
+        supercell.structure, MinimumDistanceNN()
+    )
+    supercell_scene = supercell.get_scene(
+        draw_image_atoms=False, bonded_sites_outside_unit_cell=False
+    )
+
+    # the same atoms and bonds are drawn without bonding the supercell
+    def get_positions(scene):
+        atoms, bonds = scene.contents[0].contents, scene.contents[1].contents
+        return (
+            np.concatenate([atom.positions for atom in atoms]),
+            np.concatenate([bond.positionPairs for bond in bonds]).reshape(-1, 6),
+        )
+
+    for positions, supercell_positions in zip(
+        get_positions(scene), get_positions(supercell_scene)
+    ):
+        assert np.allclose(
+            np.unique(positions.round(6), axis=0),
+            np.unique(supercell_positions.round(6), axis=0),
+        )
+
+
+def test_molecule_graph():
+
+    coords = [
+        [0.0, 0.0, 0.0],
+        [0.63, 0.63, 0.63],
+        [-0.63, -0.63, 0.63],
+        [-0.63, 0.63, -0.63],
+        [0.63, -0.63, -0.63],
+    ]
+    methane = Molecule(["C", "H", "H", "H", "H"], coords)
+
+    bonds, distances = get_covalent_bonds(methane)
+    assert bonds.tolist() == [[0, 1], [0, 2], [0, 3], [0, 4]]
+    assert np.allclose(distances, 0.63 * np.sqrt(3))
+
+    # disordered sites are bonded with the largest radius of their species,
+    # even if the first species has no covalent radius
+    disordered = Molecule(
+        ["C", {DummySpecie("X"): 0.5, "H": 0.5}], [[0, 0, 0], [0, 0, 1.09]]
+    )
+    bonds, _ = get_covalent_bonds(disordered)
+    assert bonds.tolist() == [[0, 1]]
+
+    graph = StructureMoleculeComponent._preprocess_input_to_graph(
+        methane, covalent_bonding_threshold=0
+    )
+    assert graph.graph.number_of_edges() == 4
+
+    scene, legend = StructureMoleculeComponent.get_scene_and_legend(
+        graph, instanced_primitives=False
+    )
+    atoms, bonds = scene.contents
+    assert [len(atom.positions) for atom in atoms.contents] == [1, 4]
+    # each bond is drawn in two halves, in the colors of the sites
+    assert sum(len(bond.positionPairs) for bond in bonds.contents) == 8
+
+
+def test_site_collection_scene():
+
+    graph = get_rock_salt_graph()
+    structure = graph.structure
+
+    scene = structure.get_scene()
+    assert [c.name for c in scene.contents] == ["atoms", "unit_cell"]
+
+    # the same atoms are drawn as for the graph
+    def get_positions(scene):
+        (atoms,) = Scene.merge_primitives(scene.contents[0].contents)
+        return np.unique(atoms.positions.round(6), axis=0)
+
+    graph_scene = graph.get_scene(bonded_sites_outside_unit_cell=False, instanced=True)
+    assert np.allclose(
+        get_positions(structure.get_scene(instanced=True)),
+        get_positions(graph_scene),
+    )
+    assert sum(len(atoms.positions) for atoms in scene.contents[0].contents) == 27
+
+    preview = StructureMoleculeComponent._preprocess_input_to_graph(
+        structure, bonding_strategy="preview"
+    )
+    assert isinstance(preview, Structure)
+    scene, legend = StructureMoleculeComponent.get_scene_and_legend(preview)
+    assert [c.name for c in scene.contents] == ["atoms", "unit_cell", "compass"]
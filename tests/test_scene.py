@@ -0,0 +1,329 @@
+import json
+
+import numpy as np
+import pytest
+
+from crystal_toolkit.core.scene import (
+    Scene,
+    Spheres,
+    Cylinders,
+    Lines,
+    Convex,
+    InstancedSpheres,
+    InstancedCylinders,
+    decode_typed_array,
+    diff_scene_json,
+    content_hash,
+    split_instanced_json,
+)
+
+
+def test_list_inputs_are_stored_as_arrays():
+
+    spheres = Spheres(positions=[[0, 0, 0], [1, 1, 1]])
+    assert isinstance(spheres.positions, np.ndarray)
+    assert spheres.positions.shape == (2, 3)
+
+    cylinders = Cylinders(positionPairs=[[[0, 0, 0], [1, 1, 1]]])
+    assert cylinders.positionPairs.shape == (1, 2, 3)
+
+    lines = Lines(positions=[])
+    assert lines.positions.shape == (0, 3)
+
+
+def test_to_json_and_merge():
+
+    scene = Scene(
+        "test",
+        contents=[
+            Spheres(positions=[[0, 0, 0]], color="#ff0000", radius=0.5),
+            Spheres(positions=np.array([[1, 1, 1]]), color="#ff0000", radius=0.5),
+            Spheres(positions=[[2, 2, 2]], color="#0000ff", radius=0.5),
+        ],
+    )
+
+    scene_json = scene.to_json()
+    spheres = [c for c in scene_json["contents"] if c["type"] == "spheres"]
+
+    assert len(spheres) == 2
+    assert spheres[0]["positions"] == [[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]]
+
+
+def test_to_binary():
+
+    positions = np.random.rand(100, 3)
+    scene = Scene("test", contents=[Spheres(positions=positions, radius=0.5)])
+
+    encoded = scene.to_binary()["contents"][0]["positions"]
+    assert encoded["typedArray"] == "Float32Array"
+    assert encoded["shape"] == [100, 3]
+
+    decoded = decode_typed_array(encoded)
+    assert np.allclose(decoded, positions, atol=1e-6)
+
+
+def test_merge_primitives():
+
+    spheres = Scene.merge_primitives(
+        [
+            Spheres(
+                positions=[[0, 0, 0]],
+                ellipsoids={"rotations": [[1, 0, 0]], "scales": [[1, 2, 3]]},
+            ),
+            Spheres(positions=[[1, 1, 1], [2, 2, 2]]),
+            Spheres(positions=[[3, 3, 3]], visible=False),
+        ]
+    )
+    assert len(spheres) == 2
+    assert spheres[0].ellipsoids["scales"].tolist() == [
+        [1, 2, 3],
+        [1, 1, 1],
+        [1, 1, 1],
+    ]
+
+    lines = Scene.merge_primitives(
+        [
+            Lines(positions=[[0, 0, 0], [1, 1, 1]], dashSize=1),
+            Lines(positions=[[0, 0, 0], [2, 2, 2]], dashSize=1),
+            Lines(positions=[[0, 0, 0], [3, 3, 3]]),
+        ]
+    )
+    assert [len(l.positions) for l in lines] == [4, 2]
+
+    convex = Scene.merge_primitives(
+        [Convex(positions=np.random.rand(n, 3), color="#ff0000") for n in (4, 6)]
+    )
+    assert [len(c.positions) for c in convex] == [4, 6]
+    assert all(c.hullSizes is None for c in convex)
+
+
+def test_serialization():
+
+    scene = Scene(
+        "test",
+        contents=[
+            Spheres(
+                positions=[[0, 0, 0]],
+                color="#ff0000",
+                ellipsoids={"rotations": [[1, 0, 0]], "scales": [[1, 2, 3]]},
+            ),
+            Scene(
+                "bonds", contents=[Cylinders(positionPairs=[[[0, 0, 0], [1, 1, 1]]])]
+            ),
+        ],
+    )
+
+    scene_json = scene.to_json()
+    assert "radius" not in scene_json["contents"][0]
+    assert scene_json["contents"][0]["ellipsoids"]["scales"] == [[1.0, 2.0, 3.0]]
+
+    assert json.loads(scene.to_json_bytes()) == scene_json
+    assert json.loads(scene.to_json_bytes(encoding="binary")) == scene.to_binary()
+
+
+def test_diff_scene_json():
+
+    def make_scene(bond_color):
+        return Scene(
+            "test",
+            contents=[
+                Scene("atoms", contents=[Spheres(positions=[[0, 0, 0]])]),
+                Scene(
+                    "bonds",
+                    contents=[
+                        Cylinders(
+                            positionPairs=[[[0, 0, 0], [1, 1, 1]]], color=bond_color
+                        )
+                    ],
+                ),
+            ],
+        ).to_json()
+
+    old_scene_json = make_scene("#000000")
+    new_scene_json = make_scene("#ffffff")
+
+    old_scene_json["hash"], new_scene_json["hash"] = "old", "new"
+
+    patch = diff_scene_json(old_scene_json, new_scene_json)
+    assert patch["added"] == [] and patch["removed"] == []
+    assert [change["path"] for change in patch["changed"]] == [["bonds"]]
+    # patches can only be applied to the scene they were computed from
+    assert patch["base"] == "old" and patch["hash"] == "new"
+
+    new_scene_json["contents"].pop(0)
+    patch = diff_scene_json(old_scene_json, new_scene_json)
+    assert patch["removed"] == [["atoms"]]
+
+    assert diff_scene_json(old_scene_json, Scene("other").to_json()) is None
+
+
+def test_instance_primitives():
+
+    primitives = Scene.instance_primitives(
+        [
+            Spheres(positions=[[0, 0, 0]], color="#ff0000", radius=0.5),
+            Spheres(positions=[[1, 1, 1], [2, 2, 2]], color="#0000ff"),
+            Spheres(positions=[[3, 3, 3]], phiStart=0, phiEnd=np.pi),
+            Cylinders(positionPairs=[[[0, 0, 0], [1, 1, 1]]], color="#00ff00"),
+        ]
+    )
+
+    spheres, cylinders, partial_sphere = primitives
+    assert isinstance(spheres, InstancedSpheres)
+    assert spheres.colors.tolist() == [[1, 0, 0], [0, 0, 1], [0, 0, 1]]
+    assert spheres.radii.tolist() == [0.5, 1, 1]
+    assert isinstance(cylinders, InstancedCylinders)
+    assert isinstance(partial_sphere, Spheres)
+
+    scene_json = Scene("test", contents=primitives).to_json()
+    assert [c["type"] for c in scene_json["contents"]] == [
+        "instancedSpheres",
+        "instancedCylinders",
+        "spheres",
+    ]
+
+
+def test_bounding_box():
+
+    spheres = Spheres(positions=[[0, 0, 0], [1, 2, 3]], radius=0.5)
+    cylinders = Cylinders(positionPairs=[[[0, 0, 0], [-1, 0, 0]]])
+    scene = Scene("test", contents=[spheres, Scene("bonds", contents=[cylinders])])
+
+    assert scene.bounding_box.tolist() == [[-1, -0.5, -0.5], [1.5, 2.5, 3.5]]
+
+    # bounding boxes are recomputed on modification, also of nested Scenes,
+    # but not when other Scenes are built
+    bounding_box = scene.bounding_box
+    Scene("other", contents=[Spheres(positions=[[0, 0, 0]])])
+    assert scene.bounding_box is bounding_box
+    spheres.positions = [[0, 0, 0], [10, 10, 10]]
+    assert scene.bounding_box.tolist() == [[-1, -0.5, -0.5], [10.5, 10.5, 10.5]]
+    cylinders.positionPairs = [[[0, 0, 0], [-2, 0, 0]]]
+    assert scene.bounding_box.tolist() == [[-2, -0.5, -0.5], [10.5, 10.5, 10.5]]
+    cylinders.positionPairs = [[[0, 0, 0], [-1, 0, 0]]]
+
+    assert scene.to_json(bounding_boxes=True)["bbox"] == [
+        [-1, -0.5, -0.5],
+        [10.5, 10.5, 10.5],
+    ]
+
+    near = scene.get_primitives_near([-0.5, 0.1, 0], 0.2)
+    assert len(near) == 1
+    assert near[0][0] is cylinders and near[0][1].tolist() == [0]
+
+
+def test_content_hash():
+
+    def make_scene():
+        return Scene(
+            "test",
+            contents=[
+                Spheres(positions=[[0, 0, 0]], color="#ff0000"),
+                Scene(
+                    "bonds",
+                    contents=[Cylinders(positionPairs=[[[0, 0, 0], [1, 1, 1]]])],
+                ),
+            ],
+        )
+
+    scene = make_scene()
+    assert scene.content_hash == make_scene().content_hash
+    assert content_hash(scene.contents[0]) == content_hash(make_scene().contents[0])
+
+    scene.contents[1].contents[0].color = "#0000ff"
+    assert scene.content_hash != make_scene().content_hash
+
+    scene.contents[1].contents[0].color = None
+    assert scene.content_hash == make_scene().content_hash
+
+    scene.contents.append(Lines(positions=[[0, 0, 0], [1, 1, 1]]))
+    assert scene.content_hash != make_scene().content_hash
+
+
+def test_split_instanced_json():
+
+    spheres = [
+        Spheres(positions=[[0, 0, 0], [1, 1, 1]], color="#ff0000", radius=0.5),
+        Spheres(positions=[[2, 2, 2]], color="#0000ff", radius=0.5),
+    ]
+    instanced = Scene("test", Scene.instance_primitives(spheres)).to_json()
+
+    expected = [
+        {
+            "type": "spheres",
+            "positions": [[0, 0, 0], [1, 1, 1]],
+            "color": "#ff0000",
+            "radius": 0.5,
+        },
+        {
+            "type": "spheres",
+            "positions": [[2, 2, 2]],
+            "color": "#0000ff",
+            "radius": 0.5,
+        },
+    ]
+    assert split_instanced_json(instanced["contents"][0]) == expected
+
+    # typed arrays and quantized arrays are decoded
+    scene = Scene("test", Scene.instance_primitives(spheres))
+    for encoded in (
+        scene.to_binary()["contents"][0],
+        scene.to_json(precision="int16")["contents"][0],
+    ):
+        split = split_instanced_json(encoded)
+        assert [s["color"] for s in split] == ["#ff0000", "#0000ff"]
+        assert [s["radius"] for s in split] == [0.5, 0.5]
+        for primitive, expected_primitive in zip(split, expected):
+            assert np.allclose(
+                primitive["positions"], expected_primitive["positions"], atol=1e-4
+            )
+
+
+def test_precision():
+
+    positions = np.random.rand(100, 3) * 10
+    scene = Scene("test", contents=[Spheres(positions=positions)])
+
+    rounded = scene.to_json(precision=2)["contents"][0]["positions"]
+    assert np.allclose(rounded, positions, atol=0.005)
+
+    for encoded in (
+        scene.to_json(precision="int16")["contents"][0]["positions"],
+        scene.to_binary(precision="int16")["contents"][0]["positions"],
+    ):
+        decoded = decode_typed_array(encoded)
+        assert decoded.shape == (100, 3)
+        assert np.allclose(decoded, positions, atol=10 / 65535)
+
+
+def test_streaming():
+
+    def make_scene(lazy):
+        def iter_spheres():
+            for idx in range(10):
+                yield Spheres(positions=[[idx, 0, 0]], color="#ff0000")
+                yield Scene("empty")
+
+        contents = iter_spheres() if lazy else list(iter_spheres())
+        return Scene("test", contents=[Scene("atoms", contents=contents)])
+
+    scene_json = make_scene(lazy=False).to_json(bounding_boxes=True)
+    chunks = list(make_scene(lazy=True).iter_json_chunks(bounding_boxes=True))
+    assert json.loads(b"".join(chunks)) == scene_json
+
+    # lazy contents are not consumed before the scene is written
+    scene = make_scene(lazy=True)
+    assert scene.bounding_box is None
+    with pytest.raises(ValueError):
+        scene.content_hash
+    chunks = list(scene.iter_json_chunks(bounding_boxes=True))
+    assert json.loads(b"".join(chunks)) == scene_json
+
+    chunks = list(make_scene(lazy=True).iter_json_chunks(chunk_size=64))
+    assert len(chunks) > 1
+
+    merged = list(
+        Scene.iter_merged_primitives(make_scene(True).contents[0].contents, 4)
+    )
+    spheres = [p for p in merged if isinstance(p, Spheres)]
+    assert [len(s.positions) for s in spheres] == [4, 4, 2]
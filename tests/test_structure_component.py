@@ -0,0 +1,312 @@
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from dash.exceptions import PreventUpdate
+from pymatgen.core import Lattice, Structure
+from pymatgen.analysis.graphs import StructureGraph
+from pymatgen.analysis.local_env import MinimumDistanceNN
+
+from crystal_toolkit.components.structure import StructureMoleculeComponent
+from crystal_toolkit.core.mpcomponent import MPComponent
+from crystal_toolkit.core.scene import Scene, Spheres, Cylinders
+
+
+class SlowNN(MinimumDistanceNN):
+    """
+    A bonding strategy that takes far too long.
+    """
+
+    def get_nn_info(self, structure, n):
+        time.sleep(60)
+        return super().get_nn_info(structure, n)
+
+
+def test_graph_cache_key():
+
+    get_key = StructureMoleculeComponent._get_graph_cache_key
+
+    structure = Structure(Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    same_structure = Structure(
+        Lattice.cubic(4.2 + 1e-9), ["Mg", "O"], [[1, -0.0, 0], [0.5, 0.5, 0.5]]
+    )
+    assert get_key(structure) == get_key(same_structure)
+
+    assert get_key(structure) != get_key(structure, bonding_strategy="JmolNN")
+    assert get_key(structure) != get_key(structure, unit_cell_choice="primitive")
+
+    structure.add_site_property("magmom", [1, 0])
+    assert get_key(structure) != get_key(same_structure)
+
+
+def test_decode_cache(monkeypatch):
+
+    monkeypatch.setattr(MPComponent, "decode_cache_min_bytes", 0)
+    monkeypatch.setattr(MPComponent, "_decode_cache", OrderedDict())
+    monkeypatch.setattr(MPComponent, "_decode_cache_hashes", {})
+    monkeypatch.setattr(MPComponent, "_decode_cache_bytes", 0)
+
+    structure = Structure(Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    graph = StructureGraph.with_local_env_strategy(structure, MinimumDistanceNN())
+    data = MPComponent.to_data(graph)
+
+    graph = MPComponent.from_data_cached(data)
+    assert MPComponent.from_data_cached(data) is graph
+
+    # only from_data_cached() shares decoded objects, modifying an object
+    # from from_data() does not affect the next decode
+    decoded = MPComponent.from_data(data)
+    assert decoded is not graph
+    decoded.structure.translate_sites([0], [0.1, 0, 0])
+    decoded.break_edge(*next(iter(decoded.graph.edges(data="to_jimage"))))
+    decoded = MPComponent.from_data(data)
+    assert decoded.structure == graph.structure
+    assert len(decoded.graph.edges()) == len(graph.graph.edges())
+
+    calls = []
+    for _ in range(2):
+        MPComponent.derived_from_data(graph, "key", lambda: calls.append(1))
+    assert len(calls) == 1
+
+    # scenes are drawn without modifying the shared graph
+    StructureMoleculeComponent.get_scene_and_legend(graph)
+    assert "display_color" not in graph.structure.site_properties
+
+    # least recently used objects are evicted first
+    monkeypatch.setattr(MPComponent, "decode_cache_max_bytes", len(data) + 1)
+    other_data = MPComponent.to_data(structure)
+    MPComponent.from_data_cached(other_data)
+    assert MPComponent.from_data_cached(data) is not graph
+
+
+def test_update_graph_cache(monkeypatch):
+
+    class DictCache(dict):
+        def set(self, key, value, timeout=None):
+            self[key] = value
+
+    structure = Structure(Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    component = StructureMoleculeComponent(structure, bonding_strategy="preview")
+    cache = DictCache()
+    monkeypatch.setattr(StructureMoleculeComponent, "graph_cache_stats", Counter())
+
+    bonded = []
+    preprocess = StructureMoleculeComponent._preprocess_input_to_graph
+
+    def count_bonding(*args, **kwargs):
+        bonded.append(kwargs["bonding_strategy_kwargs"])
+        return preprocess(*args, **kwargs)
+
+    monkeypatch.setattr(
+        StructureMoleculeComponent,
+        "_preprocess_input_to_graph",
+        staticmethod(count_bonding),
+    )
+
+    def update_graph(bonding_strategy_kwargs):
+        options = {
+            "bonding_strategy": "MinimumDistanceNN",
+            "bonding_strategy_kwargs": bonding_strategy_kwargs,
+        }
+        return component._update_graph(
+            MPComponent.to_data(options),
+            "input",
+            MPComponent.to_data(structure),
+            None,
+            cache,
+        )
+
+    graph_data, *_ = update_graph(None)
+    assert bonded == [None] and len(cache) == 1
+    assert isinstance(MPComponent.from_data(graph_data), StructureGraph)
+
+    # the same structure and options are found in the cache without bonding
+    assert update_graph(None)[0] == graph_data
+    assert bonded == [None]
+    assert component.graph_cache_stats == {"hits": 1, "misses": 1}
+
+    # but other options are bonded again
+    update_graph({"cutoff": 3.0})
+    assert bonded == [None, {"cutoff": 3.0}] and len(cache) == 2
+    assert component.graph_cache_stats == {"hits": 1, "misses": 2}
+
+
+def test_bonding_job(monkeypatch):
+
+    class DictCache(dict):
+        def set(self, key, value, timeout=None):
+            self[key] = value
+
+    structure = Structure(Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    component = StructureMoleculeComponent(structure, bonding_strategy="preview")
+    monkeypatch.setattr(StructureMoleculeComponent, "progressive_bonding_threshold", 0)
+    monkeypatch.setattr(StructureMoleculeComponent, "bonding_time_budget", 5)
+
+    def update_graph(cache, bonding_strategy, bonding_job=None, polling=False):
+        options = {
+            "bonding_strategy": bonding_strategy,
+            "bonding_strategy_kwargs": None,
+        }
+        return component._update_graph(
+            MPComponent.to_data(options),
+            "input",
+            MPComponent.to_data(structure),
+            bonding_job,
+            cache,
+            polling=polling,
+        )
+
+    def poll(cache, bonding_job):
+        for _ in range(100):
+            try:
+                return update_graph(cache, "unused", bonding_job, polling=True)
+            except PreventUpdate:
+                time.sleep(0.1)
+        raise TimeoutError
+
+    # without a registered cache the result of a background job could not
+    # be read back, so bonds are calculated straight away
+    graph_data, bonding_job, poll_disabled, status = update_graph(
+        DictCache(), "MinimumDistanceNN"
+    )
+    assert isinstance(MPComponent.from_data(graph_data), StructureGraph)
+    assert bonding_job is None and poll_disabled and not status
+
+    # the atoms are drawn straight away, and the bonds once they are ready
+    cache = DictCache()
+    monkeypatch.setattr(MPComponent, "cache", cache)
+    preview, job, poll_disabled, status = update_graph(cache, "MinimumDistanceNN")
+    assert isinstance(MPComponent.from_data(preview), Structure)
+    assert not poll_disabled and status
+    graph_data, bonding_job, poll_disabled, status = poll(cache, job)
+    graph = MPComponent.from_data(graph_data)
+    assert isinstance(graph, StructureGraph)
+    assert len(graph.graph.edges()) == 8
+    assert bonding_job is None and poll_disabled and not status
+
+    # finished jobs are re-submitted if their graph drops out of the cache
+    del cache[MPComponent.from_data(job)["key"]]
+    _, bonding_job, poll_disabled, _ = update_graph(cache, "MinimumDistanceNN")
+    assert not poll_disabled
+    graph_data, _, _, _ = poll(cache, bonding_job)
+    assert isinstance(MPComponent.from_data(graph_data), StructureGraph)
+
+    # a job that takes longer than the time budget is killed, and the bonds
+    # are calculated with the fallback strategy in the background instead
+    monkeypatch.setattr(StructureMoleculeComponent, "bonding_time_budget", 1)
+    monkeypatch.setitem(
+        StructureMoleculeComponent.available_bonding_strategies,
+        "SlowNN",
+        SlowNN,
+    )
+    cache = DictCache()
+    started = time.time()
+    _, bonding_job, _, _ = update_graph(cache, "SlowNN")
+    graph_data, _, poll_disabled, status = poll(cache, bonding_job)
+    assert time.time() - started < 5
+    graph = MPComponent.from_data(graph_data)
+    assert isinstance(graph, StructureGraph) and poll_disabled
+    assert "KDTreeNN" in status
+    assert MPComponent.from_data(bonding_job)["key"] not in cache
+
+
+def test_kdtree_bonding(monkeypatch):
+
+    class DictCache(dict):
+        def set(self, key, value, timeout=None):
+            self[key] = value
+
+    structure = Structure.from_spacegroup(
+        "Fm-3m", Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]]
+    )
+    component = StructureMoleculeComponent(structure, bonding_strategy="preview")
+    monkeypatch.setattr(StructureMoleculeComponent, "kdtree_bonding_threshold", 4)
+    cache = DictCache()
+
+    def update_graph(bonding_strategy):
+        options = {
+            "bonding_strategy": bonding_strategy,
+            "bonding_strategy_kwargs": None,
+        }
+        return component._update_graph(
+            MPComponent.to_data(options),
+            "input",
+            MPComponent.to_data(structure),
+            None,
+            cache,
+        )
+
+    # large structures are bonded with KDTreeNN instead of CrystalNN, which
+    # is reported also when the graph is found in the cache
+    for _ in range(2):
+        graph_data, _, _, status = update_graph("CrystalNN")
+        graph = MPComponent.from_data(graph_data)
+        assert graph.graph.graph["edge_weight_name"] == "bond_length"
+        assert "KDTreeNN" in status and "CrystalNN" in status
+    assert len(cache) == 1
+
+    # other strategies are used as chosen
+    graph_data, _, _, status = update_graph("MinimumDistanceNN")
+    graph = MPComponent.from_data(graph_data)
+    assert graph.graph.graph["edge_weight_name"] != "bond_length"
+    assert not status
+
+
+def test_lod_hints():
+
+    get_lod_hints = StructureMoleculeComponent._get_lod_hints
+
+    def make_scene(num_spheres, num_cylinders=0):
+        return Scene(
+            "test",
+            contents=[
+                Spheres(positions=np.zeros((num_spheres, 3))),
+                Cylinders(positionPairs=np.zeros((num_cylinders, 2, 3))),
+            ],
+        )
+
+    # small scenes are drawn at full quality
+    assert get_lod_hints(make_scene(10, 10)) is None
+    assert get_lod_hints(make_scene(5_000), triangle_budget=None) is None
+
+    # segments are lowered until the scene fits in the triangle budget
+    assert get_lod_hints(make_scene(5_000)) == {
+        "cylinderSegments": 4,
+        "sphereSegments": 8,
+    }
+
+    # spheres are drawn as impostors above the impostor threshold...
+    assert get_lod_hints(make_scene(30_000, 1_000)) == {
+        "cylinderSegments": 8,
+        "sphereImpostors": True,
+    }
+    assert get_lod_hints(make_scene(30_000), impostor_threshold=None) == {
+        "cylinderSegments": 3,
+        "sphereSegments": 6,
+    }
+    # ...or if the budget cannot be met otherwise
+    assert get_lod_hints(make_scene(15_000), triangle_budget=100_000) == {
+        "cylinderSegments": 3,
+        "sphereImpostors": True,
+    }
+
+    # lazy scenes are not counted, but given the estimated counts
+    assert get_lod_hints(
+        Scene("test", contents=iter([])), counts={"spheres": 30_000}
+    ) == {"cylinderSegments": 8, "sphereImpostors": True}
+
+
+def test_ellipsoid_site_prop():
+
+    structure = Structure(Lattice.cubic(4.2), ["Mg", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    structure.add_site_property("U", [np.diag([0.01, 0.01, 0.04])] * 2)
+    structure.add_site_property("magmom", [1, 0])
+    assert StructureMoleculeComponent._get_ellipsoid_site_props(structure) == ["U"]
+
+    component = StructureMoleculeComponent(
+        structure, bonding_strategy="preview", ellipsoid_site_prop="U"
+    )
+    assert component.initial_display_options["ellipsoid_site_prop"] == "U"
+    atoms = component.initial_scene_data["contents"][0]["contents"]
+    assert atoms and all("ellipsoids" in atom for atom in atoms)